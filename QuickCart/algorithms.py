@@ -1,3 +1,24 @@
+import time
+from array import array
+from bisect import bisect_right
+from itertools import accumulate
+from math import gcd
+import numpy as np
+
+# Weights are rounded to 1/KNAPSACK_SCALE kg for the dynamic-programming knapsack
+KNAPSACK_SCALE = 100
+
+# Largest table (orders x capacity steps) the automatic engine choice still solves by DP
+KNAPSACK_DP_MAX_CELLS = 100_000_000
+
+# Default wall-clock budget for the branch-and-bound knapsack, in seconds
+KNAPSACK_TIME_BUDGET = 1.0
+
+# Default approximation factor for the FPTAS knapsack
+DEFAULT_FPTAS_EPSILON = 0.05
+
+KNAPSACK_ENGINES = ('dp', 'branch_and_bound', 'fptas')
+
 def merge_sort(orders, key='urgency'):
     """
     Merge sort implementation for sorting orders by urgency and membership
@@ -57,134 +78,585 @@ def merge(left, right, key):
     
     return result
 
-def knapsack(orders, max_capacity):
+def knapsack(orders, max_capacity, stats=None):
     """
     0/1 Knapsack algorithm for packing optimization
-    
+
+    Uses a single rolling value array instead of an (n+1) x capacity table,
+    and records each item's take/skip decisions as packed bits so the
+    selection can still be reconstructed. Weights are divided by their GCD
+    to shrink the capacity axis, items heavier than the truck are skipped
+    and, when everything left fits, no DP runs at all.
+
     Args:
         orders: List of order dictionaries with 'weight' and 'value' keys
         max_capacity: Maximum weight capacity of the delivery vehicle
-        
+        stats: Optional dictionary that receives 'states', the number of
+               dynamic-programming cells evaluated
+
     Returns:
         List of selected order indices and total value
     """
     # Handle empty orders list
     if not orders:
         return [], 0
-    
-    n = len(orders)
-    
+
     # Validate input data
     for order in orders:
         if not isinstance(order.get('weight'), (int, float)) or not isinstance(order.get('value'), (int, float)):
             # If we have invalid data, return empty selection
             return [], 0
-    
-    # Scale weights to integers to avoid floating point issues
-    # We'll use 100 as a scaling factor to preserve 2 decimal places
-    scale_factor = 100
-    scaled_max_capacity = int(max_capacity * scale_factor)
-    
-    # Store scaled weights for each order
-    scaled_weights = []
-    for order in orders:
-        # Convert to int to ensure we're using integer indices
-        scaled_weights.append(int(order['weight'] * scale_factor))
-    
-    # Initialize DP table: dp[i][w] = max value that can be obtained with first i items and capacity w
-    # +1 because we need to include capacity of 0 and item count of 0
-    dp = [[0 for _ in range(scaled_max_capacity + 1)] for _ in range(n + 1)]
-    
-    # Fill the DP table
-    for i in range(1, n + 1):
-        for w in range(scaled_max_capacity + 1):
-            # Current order's weight and value
-            weight = scaled_weights[i-1]
-            value = orders[i-1]['value']
-            
-            if weight <= w:
-                # Max of (not taking current item, taking current item)
-                dp[i][w] = max(dp[i-1][w], dp[i-1][w-weight] + value)
-            else:
-                # Can't take current item if it exceeds capacity
-                dp[i][w] = dp[i-1][w]
-    
-    # Find which orders were selected
+
+    # Scale weights to integers (10 g steps) to avoid floating point issues
+    capacity = int(round(max_capacity * KNAPSACK_SCALE))
+
     selected = []
-    w = scaled_max_capacity
-    for i in range(n, 0, -1):
-        if i > 0 and w >= 0 and dp[i][w] != dp[i-1][w]:
-            selected.append(i-1)  # The order at index i-1 was selected
-            w -= scaled_weights[i-1]
-            # Ensure w doesn't go negative
-            if w < 0:
-                w = 0
-    
-    selected.reverse()  # To maintain the original order
-    
+    candidates = []
+    for i, order in enumerate(orders):
+        weight = int(round(order['weight'] * KNAPSACK_SCALE))
+        if order['value'] <= 0 or weight > capacity:
+            # Worthless or too heavy for the truck on its own
+            continue
+        if weight <= 0:
+            # Weightless orders always fit
+            selected.append(i)
+            continue
+        candidates.append((i, weight, order['value']))
+
+    # Fast path: everything that is left fits in the truck
+    if sum(weight for _, weight, _ in candidates) <= capacity:
+        selected.extend(i for i, _, _ in candidates)
+        selected.sort()
+        return selected, sum(orders[i]['value'] for i in selected)
+
+    # Any reachable load is a multiple of the GCD of the weights
+    divisor = 0
+    for _, weight, _ in candidates:
+        divisor = gcd(divisor, weight)
+    capacity //= divisor
+    if stats is not None:
+        stats['states'] = len(candidates) * (capacity + 1)
+
+    # dp[w] = max value that can be obtained with capacity w using the items seen so far
+    dp = np.zeros(capacity + 1, dtype=np.float64)
+
+    # decisions[k] holds one bit per capacity >= weight: was item k taken at that capacity?
+    decisions = []
+    weights = []
+    for i, weight, value in candidates:
+        weight //= divisor
+        with_item = dp[:capacity + 1 - weight] + value
+        take = with_item > dp[weight:]
+        dp[weight:] = np.where(take, with_item, dp[weight:])
+        decisions.append(np.packbits(take))
+        weights.append(weight)
+
+    # Find which orders were selected by walking the decisions backwards
+    w = capacity
+    for k in range(len(candidates) - 1, -1, -1):
+        weight = weights[k]
+        if w >= weight:
+            offset = w - weight
+            if decisions[k][offset >> 3] & (0x80 >> (offset & 7)):
+                selected.append(candidates[k][0])
+                w -= weight
+
+    selected.sort()  # To maintain the original order
+
     # Calculate the total value of selected items
     total_value = sum(orders[i]['value'] for i in selected)
-    
+
     return selected, total_value
 
+def _knapsack_items(orders, max_capacity):
+    """
+    Split orders into those always taken (weightless) and real candidates, at full weight precision
+
+    Returns:
+        (indices always selected, candidates as (index, weight, value)), or
+        None when an order has no numeric weight or value
+    """
+    selected = []
+    candidates = []
+    for i, order in enumerate(orders):
+        weight, value = order.get('weight'), order.get('value')
+        if not isinstance(weight, (int, float)) or not isinstance(value, (int, float)):
+            return None
+        if value <= 0 or weight > max_capacity + 1e-9:
+            continue
+        if weight <= 0:
+            selected.append(i)
+            continue
+        candidates.append((i, float(weight), value))
+    return selected, candidates
+
+def _dantzig(weights, values, prefix_weights, prefix_values, k, room):
+    """
+    Dantzig upper bound on the value items k.. can add within `room`
+
+    Items are in decreasing value density: whole items are taken while they
+    fit and the first one that doesn't contributes the fraction that does.
+    """
+    j = bisect_right(prefix_weights, prefix_weights[k] + room, lo=k) - 1
+    bound = prefix_values[j] - prefix_values[k]
+    if j < len(weights):
+        bound += (room - (prefix_weights[j] - prefix_weights[k])) * values[j] / weights[j]
+    return bound
+
+def _density_order(candidates):
+    """Candidates by decreasing value per kg, with prefix sums of their weights and values"""
+    items = sorted(candidates, key=lambda item: item[2] / item[1], reverse=True)
+    weights = [weight for _, weight, _ in items]
+    values = [value for _, _, value in items]
+    return items, weights, values, list(accumulate(weights, initial=0.0)), list(accumulate(values, initial=0.0))
+
+def _greedy_fill(weights, values, capacity):
+    """Take items in density order whenever they still fit; returns (taken positions, value, room left)"""
+    taken = []
+    room = capacity
+    total = 0.0
+    for k, weight in enumerate(weights):
+        if weight <= room + 1e-9:
+            taken.append(k)
+            room -= weight
+            total += values[k]
+    return taken, total, room
+
+def knapsack_branch_and_bound(orders, max_capacity, time_budget=KNAPSACK_TIME_BUDGET):
+    """
+    Anytime 0/1 knapsack by depth-first branch-and-bound
+
+    Works on the exact weights, so its cost depends on how hard the
+    instance is rather than on the capacity or the weight precision. Orders
+    are explored in decreasing value density, taking each order before
+    leaving it out, and a branch is pruned once its Dantzig bound (the
+    fractional knapsack over the orders still open) cannot beat the best
+    selection found so far. The search starts from the greedy selection and
+    stops at the time budget, returning the best selection found and an
+    upper bound on the optimum: the largest bound of any branch not yet
+    explored, or the selection's own value when the search completed.
+
+    Args:
+        orders: List of order dictionaries with 'weight' and 'value' keys
+        max_capacity: Maximum weight capacity of the delivery vehicle
+        time_budget: Wall-clock budget in seconds
+
+    Returns:
+        List of selected order indices, their total value and an upper
+        bound on the best total value
+    """
+    items = _knapsack_items(orders, max_capacity) if orders else None
+    if items is None:
+        return [], 0, 0
+    selected, candidates = items
+
+    # Fast path: everything that is left fits in the truck
+    if sum(weight for _, weight, _ in candidates) <= max_capacity + 1e-9:
+        selected.extend(i for i, _, _ in candidates)
+        selected.sort()
+        total_value = sum(orders[i]['value'] for i in selected)
+        return selected, total_value, total_value
+
+    deadline = time.perf_counter() + time_budget
+    items, weights, values, prefix_weights, prefix_values = _density_order(candidates)
+    n = len(items)
+    capacity = float(max_capacity)
+
+    # Incumbent: the greedy selection, as a linked chain of taken positions
+    taken, best_value, _ = _greedy_fill(weights, values, capacity)
+    best_chain = None
+    for k in taken:
+        best_chain = (k, best_chain)
+
+    # Open branches: (next position, room left, value so far, chain of taken positions)
+    stack = [(0, capacity, 0.0, None)]
+    nodes = 0
+    complete = True
+    while stack:
+        nodes += 1
+        if not nodes & 1023 and time.perf_counter() >= deadline:
+            complete = False
+            break
+
+        k, room, value, chain = stack.pop()
+        if value + _dantzig(weights, values, prefix_weights, prefix_values, k, room) <= best_value + 1e-9:
+            continue
+
+        # Dive: take each order that fits, leaving the branch without it for later
+        while k < n:
+            if weights[k] <= room + 1e-9:
+                stack.append((k + 1, room, value, chain))
+                room -= weights[k]
+                value += values[k]
+                chain = (k, chain)
+                k += 1
+            else:
+                k += 1
+                if value + _dantzig(weights, values, prefix_weights, prefix_values, k, room) <= best_value + 1e-9:
+                    break
+
+        if value > best_value + 1e-9:
+            best_value, best_chain = value, chain
+
+    upper_bound = best_value
+    if not complete:
+        for k, room, value, _ in stack:
+            upper_bound = max(upper_bound, value + _dantzig(weights, values, prefix_weights, prefix_values, k, room))
+
+    base_value = sum(orders[i]['value'] for i in selected)
+    while best_chain is not None:
+        k, best_chain = best_chain
+        selected.append(items[k][0])
+    selected.sort()
+
+    total_value = sum(orders[i]['value'] for i in selected)
+    return selected, total_value, max(total_value, base_value + upper_bound)
+
+def knapsack_fptas(orders, max_capacity, epsilon=DEFAULT_FPTAS_EPSILON, stats=None):
+    """
+    0/1 knapsack within a factor (1 - epsilon) of the optimum, in time polynomial in n and 1/epsilon
+
+    Values rather than weights are rounded: each order's value is divided
+    by K = epsilon * LB / m and truncated, where LB is the better of the
+    greedy selection and the most valuable single order, and m is the most
+    orders any load can hold (the lightest ones that fit together). A
+    dynamic programme over these scaled values finds the lightest load for
+    every reachable total. Weights stay exact, and the table has at most
+    UB / K + 1 columns (UB the Dantzig bound, at most 2 * LB), i.e.
+    O(m / epsilon), whatever the capacity. Truncation loses less than K per
+    selected order, so the selection is worth at least OPT - epsilon * LB.
+
+    Args:
+        orders: List of order dictionaries with 'weight' and 'value' keys
+        max_capacity: Maximum weight capacity of the delivery vehicle
+        epsilon: Largest fraction of the optimum the selection may lose (0 < epsilon < 1)
+        stats: Optional dictionary that receives 'states', the number of
+               dynamic-programming cells evaluated
+
+    Returns:
+        List of selected order indices, their total value and an upper
+        bound on the best total value
+    """
+    if not 0 < epsilon < 1:
+        raise ValueError("epsilon must be between 0 and 1")
+
+    items = _knapsack_items(orders, max_capacity) if orders else None
+    if items is None:
+        return [], 0, 0
+    selected, candidates = items
+
+    # Fast path: everything that is left fits in the truck
+    if sum(weight for _, weight, _ in candidates) <= max_capacity + 1e-9:
+        selected.extend(i for i, _, _ in candidates)
+        selected.sort()
+        total_value = sum(orders[i]['value'] for i in selected)
+        return selected, total_value, total_value
+
+    items, weights, values, prefix_weights, prefix_values = _density_order(candidates)
+    n = len(items)
+    capacity = float(max_capacity)
+    _, greedy_value, _ = _greedy_fill(weights, values, capacity)
+    lower_bound = max(greedy_value, max(values))
+    upper_bound = _dantzig(weights, values, prefix_weights, prefix_values, 0, capacity)
+
+    # No load holds more orders than the lightest ones that fit together
+    most = bisect_right(list(accumulate(sorted(weights))), capacity + 1e-9)
+    scale = epsilon * lower_bound / max(most, 1)
+    profits = [int(value // scale) for value in values]
+    size = int(upper_bound // scale) + 1
+    if stats is not None:
+        stats['states'] = n * (size + 1)
+
+    # lightest[p] = least weight reaching scaled value exactly p with the items seen so far
+    lightest = np.full(size + 1, np.inf)
+    lightest[0] = 0.0
+    decisions = []
+    for k in range(n):
+        profit = profits[k]
+        if profit == 0:
+            decisions.append(None)
+            continue
+        with_item = lightest[:size + 1 - profit] + weights[k]
+        take = with_item < lightest[profit:]
+        lightest[profit:] = np.where(take, with_item, lightest[profit:])
+        decisions.append(np.packbits(take))
+
+    # Best reachable scaled value, then walk the decisions backwards
+    p = int(np.flatnonzero(lightest <= capacity + 1e-9)[-1])
+    taken = set()
+    for k in range(n - 1, -1, -1):
+        if decisions[k] is not None and p >= profits[k]:
+            offset = p - profits[k]
+            if decisions[k][offset >> 3] & (0x80 >> (offset & 7)):
+                taken.add(k)
+                p -= profits[k]
+
+    # Orders too cheap to register after scaling go in if they still fit
+    room = capacity - sum(weights[k] for k in taken)
+    for k in range(n):
+        if k not in taken and weights[k] <= room + 1e-9:
+            taken.add(k)
+            room -= weights[k]
+
+    base_value = sum(orders[i]['value'] for i in selected)
+    selected.extend(items[k][0] for k in taken)
+    selected.sort()
+    total_value = sum(orders[i]['value'] for i in selected)
+    # Optimum <= selection + m * K, and never above the Dantzig bound
+    bound = base_value + min(upper_bound, total_value - base_value + epsilon * lower_bound)
+    return selected, total_value, max(total_value, bound)
+
+def choose_knapsack_engine(orders, max_capacity):
+    """
+    Knapsack engine for an input: the exact DP while its table stays small, branch-and-bound beyond
+
+    The DP works on weights rounded to KNAPSACK_SCALE steps; orders weighed
+    more finely than that, or a table of more than KNAPSACK_DP_MAX_CELLS
+    cells (orders x capacity steps, after dividing out the weights' GCD),
+    go to the anytime branch-and-bound instead.
+
+    Returns:
+        'dp' or 'branch_and_bound'
+    """
+    capacity = int(round(max_capacity * KNAPSACK_SCALE))
+    divisor = 0
+    count = 0
+    for order in orders:
+        weight = order.get('weight')
+        if not isinstance(weight, (int, float)) or weight <= 0 or weight > max_capacity:
+            continue
+        scaled = weight * KNAPSACK_SCALE
+        if abs(scaled - round(scaled)) > 1e-6:
+            return 'branch_and_bound'
+        divisor = gcd(divisor, int(round(scaled)))
+        count += 1
+    if divisor and count * (capacity // divisor + 1) > KNAPSACK_DP_MAX_CELLS:
+        return 'branch_and_bound'
+    return 'dp'
+
+class IncrementalKnapsack:
+    """
+    0/1 knapsack over an item set that changes one item at a time
+
+    Adding an item is one O(capacity) update of the rolling value array plus
+    a packed decision row, exactly like a step of knapsack(). Removing an
+    item only retires its row: while the reconstructed selection doesn't use
+    a retired item it is still optimal for the remaining items (it is
+    feasible and as good as the optimum with the item). Reconstruction that
+    does pick a retired item, or too many retired rows, triggers a rebuild.
+
+    Weights use the fixed 10 g grid (no GCD reduction), since the divisor
+    would change as items come and go.
+    """
+
+    SCALE = KNAPSACK_SCALE
+
+    def __init__(self, max_capacity):
+        self.max_capacity = max_capacity
+        self.capacity = int(round(max_capacity * self.SCALE))
+        self.rebuilds = 0
+        self._items = {}
+        self._free = {}
+        self._reset_table()
+
+    def _reset_table(self):
+        self._dp = np.zeros(self.capacity + 1, dtype=np.float64)
+        self._rows = []       # (key, weight, value, packed decisions) in insertion order
+        self._row_of = {}     # live key -> row index
+        self._retired = 0
+        self._selection = None
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def keys(self):
+        return self._items.keys()
+
+    def _add_row(self, key, weight, value):
+        with_item = self._dp[:self.capacity + 1 - weight] + value
+        take = with_item > self._dp[weight:]
+        self._dp[weight:] = np.where(take, with_item, self._dp[weight:])
+        self._row_of[key] = len(self._rows)
+        self._rows.append((key, weight, value, np.packbits(take)))
+
+    def add(self, key, weight, value):
+        """Add (or replace) an item; O(capacity)"""
+        if key in self._items:
+            self.remove(key)
+
+        scaled = int(round(weight * self.SCALE))
+        self._items[key] = (scaled, value)
+        if value <= 0 or scaled > self.capacity:
+            # Worthless or too heavy on its own: never selected
+            return
+        if scaled <= 0:
+            # Weightless items always fit
+            self._free[key] = value
+            if self._selection is not None:
+                keys, total = self._selection
+                self._selection = (keys + [key], total + value)
+            return
+
+        self._add_row(key, scaled, value)
+        self._selection = None
+
+    def remove(self, key):
+        """Remove an item; O(1) unless the current selection used it"""
+        if self._items.pop(key, None) is None:
+            return
+
+        if key in self._free:
+            value = self._free.pop(key)
+            if self._selection is not None:
+                keys, total = self._selection
+                self._selection = ([k for k in keys if k != key], total - value)
+            return
+
+        if self._row_of.pop(key, None) is None:
+            return
+        self._retired += 1
+
+        if self._selection is not None and key in self._selection[0]:
+            self._selection = None
+
+        # Retired rows still cost memory and reconstruction steps; compact them away
+        if self._retired > max(len(self._row_of), 32):
+            self.rebuild()
+
+    def rebuild(self, from_items=False):
+        """
+        Recompute the table from the live items; O(n * capacity)
+
+        Args:
+            from_items: Rebuild from the item set itself rather than the
+                        current rows of the table
+        """
+        if from_items:
+            live = [(key, weight, value) for key, (weight, value) in self._items.items()
+                    if key not in self._free and 0 < weight <= self.capacity and value > 0]
+        else:
+            # A removed and re-added key has an old row too; only its current row is live
+            live = [(key, weight, value) for index, (key, weight, value, _) in enumerate(self._rows)
+                    if self._row_of.get(key) == index]
+        self._reset_table()
+        for key, weight, value in live:
+            self._add_row(key, weight, value)
+        self.rebuilds += 1
+
+    def _reconstruct(self):
+        selected = []
+        w = self.capacity
+        for k in range(len(self._rows) - 1, -1, -1):
+            key, weight, _, decisions = self._rows[k]
+            if w >= weight:
+                offset = w - weight
+                if decisions[offset >> 3] & (0x80 >> (offset & 7)):
+                    if self._row_of.get(key) != k:
+                        return None
+                    selected.append(key)
+                    w -= weight
+        return selected
+
+    def solution(self):
+        """
+        Current optimal selection
+
+        Returns:
+            (list of selected keys, total value)
+        """
+        if self._selection is None:
+            selected = self._reconstruct()
+            if selected is None:
+                # The table's optimum relies on a removed item
+                self.rebuild()
+                selected = self._reconstruct()
+            if selected is None:
+                # The rows themselves are inconsistent; recompute from the items
+                self.rebuild(from_items=True)
+                selected = self._reconstruct()
+
+            selected.extend(self._free)
+            total = sum(self._items[key][1] for key in selected)
+            self._selection = (selected, total)
+
+        keys, total = self._selection
+        return list(keys), total
+
 def tsp_dynamic_programming(distances):
     """
     Traveling Salesman Problem using Dynamic Programming for route optimization
-    
+
+    Iterative Held-Karp over an array-backed table, so there is no recursion
+    limit and no per-state dict overhead. Still O(2^n * n^2), so callers
+    should only use it for small runs (see routing.solve_route).
+
     Args:
         distances: Matrix of distances between locations
-        
+
     Returns:
         Optimal route and total distance
     """
     n = len(distances)
-    
-    # Initialize DP table: dp[mask][i] = min distance to visit all vertices in mask and end at vertex i
-    # mask is a bitmask representing visited vertices
-    all_visited = (1 << n) - 1  # All vertices visited
-    dp = {}
-    
-    # Function to solve TSP recursively with memoization
-    def solve(mask, pos):
-        if mask == all_visited:
-            return distances[pos][0]  # Return to starting point (0)
-        
-        if (mask, pos) in dp:
-            return dp[(mask, pos)]
-        
-        ans = float('inf')
-        for next_pos in range(n):
-            if (mask & (1 << next_pos)) == 0:  # If next_pos is not visited
-                new_ans = distances[pos][next_pos] + solve(mask | (1 << next_pos), next_pos)
-                ans = min(ans, new_ans)
-        
-        dp[(mask, pos)] = ans
-        return ans
-    
-    # Start from vertex 0 with only vertex 0 visited
-    min_distance = solve(1, 0)  # 1 is the bitmask for vertex 0 visited
-    
-    # Reconstruct the path
-    path = [0]  # Start from vertex 0
-    mask = 1  # Only vertex 0 is visited initially
-    pos = 0
-    
-    for _ in range(n-1):
-        next_vertex = None
-        min_cost = float('inf')
-        
-        for next_pos in range(n):
-            if (mask & (1 << next_pos)) == 0:  # If next_pos is not visited
-                cost = distances[pos][next_pos] + dp.get((mask | (1 << next_pos), next_pos), float('inf'))
-                if cost < min_cost:
-                    min_cost = cost
-                    next_vertex = next_pos
-        
-        if next_vertex is not None:
-            path.append(next_vertex)
-            mask |= (1 << next_vertex)
-            pos = next_vertex
-    
+
+    if n <= 1:
+        return [0, 0], 0
+    if n == 2:
+        return [0, 1, 0], distances[0][1] + distances[1][0]
+
+    # Vertex 0 is the fixed start, so subsets only range over vertices 1..n-1
+    # dp[mask * m + j] = min distance from 0 visiting every vertex in mask, ending at vertex j + 1
+    m = n - 1
+    full = (1 << m) - 1
+    inf = float('inf')
+    dp = array('d', [inf]) * ((1 << m) * m)
+    parent = array('b', [-1]) * ((1 << m) * m)
+
+    for j in range(m):
+        dp[(1 << j) * m + j] = distances[0][j + 1]
+
+    # Masks are visited in increasing order, so every subset is final before it is extended
+    for mask in range(1, full + 1):
+        base = mask * m
+        for j in range(m):
+            cost = dp[base + j]
+            if cost == inf:
+                continue
+            row = distances[j + 1]
+            for k in range(m):
+                if mask & (1 << k):
+                    continue
+                next_mask = mask | (1 << k)
+                new_cost = cost + row[k + 1]
+                index = next_mask * m + k
+                if new_cost < dp[index]:
+                    dp[index] = new_cost
+                    parent[index] = j
+
+    # Close the tour back to the starting point
+    min_distance = inf
+    last = 0
+    base = full * m
+    for j in range(m):
+        cost = dp[base + j] + distances[j + 1][0]
+        if cost < min_distance:
+            min_distance = cost
+            last = j
+
+    # Reconstruct the path by walking the parent table backwards
+    path = []
+    mask = full
+    pos = last
+    while pos != -1:
+        path.append(pos + 1)
+        previous = parent[mask * m + pos]
+        mask &= ~(1 << pos)
+        pos = previous
+
+    path.append(0)
+    path.reverse()
     path.append(0)  # Return to start
-    
+
     return path, min_distance
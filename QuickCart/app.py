@@ -2,13 +2,12 @@ import os
 import logging
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import DeclarativeBase
 from werkzeug.middleware.proxy_fix import ProxyFix
 from flask_wtf.csrf import CSRFProtect
 
-# Configure logging
-logging.basicConfig(level=logging.DEBUG)
-
 # Create database base class
 class Base(DeclarativeBase):
     pass
@@ -19,35 +18,174 @@ db = SQLAlchemy(model_class=Base)
 # Initialize CSRF protection
 csrf = CSRFProtect()
 
-# Create Flask app
-app = Flask(__name__)
-app.secret_key = os.environ.get("SESSION_SECRET", "quickcart_dev_key")
-app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)
+def configure_logging():
+    """Log at LOG_LEVEL (INFO by default); DEBUG logs every request's internals"""
+    logging.basicConfig(level=os.environ.get("LOG_LEVEL", "INFO").upper())
 
-# Initialize CSRF protection
-csrf.init_app(app)
+# Request threads per worker process; gunicorn.conf.py uses the same setting
+DEFAULT_THREADS = 4
+
+# Applied to every new SQLite connection
+SQLITE_PRAGMAS = (
+    "journal_mode=WAL",       # readers no longer block the writer (and vice versa)
+    "synchronous=NORMAL",     # fsync at checkpoints rather than every commit; safe with WAL
+    "mmap_size=268435456",    # read pages through a 256 MB memory map
+    "cache_size=-65536",      # 64 MB page cache per connection
+    "busy_timeout=5000",      # wait up to 5 s for the write lock instead of failing
+)
+
+def engine_options(database_uri, threads=None):
+    """
+    Connection pool settings for the database backend
+
+    Each worker process gets its own pool, sized to its request threads so
+    a request never waits for a connection, with a little overflow for
+    background work. Instead of pinging before every checkout
+    (pool_pre_ping), connections are recycled before servers or firewalls
+    drop them and handed out last-in-first-out so idle ones age out; a
+    connection that fails anyway raises once and invalidates the rest of
+    the pool. Postgres connections also send TCP keepalives. Every value
+    can be overridden with DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT
+    and DB_POOL_RECYCLE.
+
+    Args:
+        database_uri: SQLAlchemy database URL
+        threads: Request threads per worker (GUNICORN_THREADS by default)
+
+    Returns:
+        Dictionary for SQLALCHEMY_ENGINE_OPTIONS
+    """
+    threads = threads or int(os.environ.get("GUNICORN_THREADS", DEFAULT_THREADS))
+    url = make_url(database_uri)
+
+    if url.get_backend_name() == "sqlite":
+        if url.database in (None, "", ":memory:"):
+            # Flask-SQLAlchemy shares one connection (StaticPool) for in-memory databases
+            return {}
+        # Only one writer at a time, so a large pool just queues on the write lock
+        options = {"pool_size": threads, "max_overflow": 2, "pool_timeout": 10, "pool_recycle": -1}
+    else:
+        options = {
+            "pool_size": threads,
+            "max_overflow": max(2, threads // 2),
+            "pool_timeout": 10,
+            "pool_recycle": 1800,
+            "pool_use_lifo": True,
+        }
+        if url.get_backend_name() == "postgresql":
+            options["connect_args"] = {
+                "connect_timeout": 5,
+                "keepalives": 1,
+                "keepalives_idle": 60,
+                "keepalives_interval": 10,
+                "keepalives_count": 3,
+                "application_name": "quickcart",
+            }
+
+    for option, variable in (("pool_size", "DB_POOL_SIZE"), ("max_overflow", "DB_MAX_OVERFLOW"),
+                             ("pool_timeout", "DB_POOL_TIMEOUT"), ("pool_recycle", "DB_POOL_RECYCLE")):
+        if os.environ.get(variable):
+            options[option] = int(os.environ[variable])
+    return options
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for pragma in SQLITE_PRAGMAS:
+        cursor.execute(f"PRAGMA {pragma}")
+    cursor.close()
+
+def configure_engine(engine):
+    """Apply the SQLite PRAGMAs to each new connection of a SQLite engine"""
+    if engine.dialect.name == "sqlite":
+        event.listen(engine, "connect", _set_sqlite_pragmas)
+
+def create_app(config=None):
+    """
+    Create and configure the Flask app
+
+    Building the app does no database work: tables, schema upgrades and the
+    sample data are created by `flask --app main init-db` (see database.py),
+    once per deployment rather than in every worker. Modules that need
+    numpy are only imported when an optimization first runs.
+
+    Args:
+        config: Optional dictionary of settings applied over the defaults
+                (e.g. SQLALCHEMY_DATABASE_URI for tests and benchmarks)
 
-# Configure SQLite database
-app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get("DATABASE_URL", "sqlite:///quickcart.db")
-app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
-    "pool_recycle": 300,
-    "pool_pre_ping": True,
-}
-app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    Returns:
+        The Flask app
+    """
+    app = Flask(__name__)
+    app.secret_key = os.environ.get("SESSION_SECRET", "quickcart_dev_key")
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)
 
-# Initialize the app with the extension
-db.init_app(app)
+    # Configure the database (SQLite by default, Postgres through DATABASE_URL)
+    app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get("DATABASE_URL", "sqlite:///quickcart.db")
+    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
 
-with app.app_context():
-    # Import models to ensure tables are created
+    # Settings read by the extensions below, overridable from the environment
+    app.config["METRICS_SERVER_TIMING"] = os.environ.get("METRICS_SERVER_TIMING") == "1"
+    app.config["METRICS_TOKEN"] = os.environ.get("METRICS_TOKEN")
+    app.config["PROFILE_SAMPLE_RATE"] = float(os.environ.get("PROFILE_SAMPLE_RATE", "0"))
+    app.config["PROFILE_MODE"] = os.environ.get("PROFILE_MODE", "cprofile")
+    app.config["PROFILE_TOKEN"] = os.environ.get("PROFILE_TOKEN")
+    app.config["CART_STORE"] = os.environ.get("CART_STORE", "database")
+    app.config["OPTIMIZATION_WORKERS"] = int(os.environ.get("OPTIMIZATION_WORKERS", "0")) or None
+
+    if config:
+        app.config.update(config)
+    app.config.setdefault("SQLALCHEMY_ENGINE_OPTIONS", engine_options(app.config["SQLALCHEMY_DATABASE_URI"]))
+
+    # Initialize the extensions
+    csrf.init_app(app)
+    db.init_app(app)
+
+    # Import models so their tables are registered with the metadata
     import models
-    from database import init_db
-    
-    # Create database tables
-    db.create_all()
-    
-    # Initialize database with sample data if needed
-    init_db()
-
-# Import routes after database is initialized
-from routes import *
+
+    # Configure the order details cache tiers
+    from cache import order_cache
+    order_cache.init_app(app)
+
+    # Request, SQL, template, solver and cache metrics on /metrics (needs METRICS_TOKEN)
+    from metrics import metrics
+    with app.app_context():
+        configure_engine(db.engine)
+        metrics.init_app(app, db.engine)
+
+    # Opt-in request profiling (PROFILE_SAMPLE_RATE, or X-Profile from delivery users)
+    from profiling import profiler
+    profiler.init_app(app)
+
+    # Configure server-side cart storage (CART_STORE: 'database' or 'memory')
+    from cart import cart_store
+    cart_store.init_app(app)
+
+    # Configure the optimization job runner (process pool by default)
+    from jobs import job_runner
+    job_runner.init_app(app)
+
+    # Bump the shared catalog version when product details change
+    from catalog import catalog
+    catalog.install()
+
+    # Live order feed for the delivery dashboards (FEED_* settings)
+    from order_feed import order_feed
+    order_feed.init_app(app)
+
+    # Keep process-wide order state in step with committed status changes
+    from order_events import order_events
+    from dispatch import dispatch_queue
+    from spatial import order_index
+    from reoptimize import reoptimizer
+    order_events.install()
+    for subscriber in (dispatch_queue, order_index, reoptimizer, order_feed):
+        order_events.subscribe(subscriber.handle_status_changes)
+
+    # Views and CLI commands
+    from routes import register_routes
+    from database import register_commands
+    register_routes(app)
+    register_commands(app)
+
+    return app
@@ -0,0 +1,11 @@
+"""
+Benchmarks for the QuickCart algorithms and views
+
+    python -m benchmarks.algorithms_benchmark   micro-benchmarks per algorithm
+    python -m benchmarks.endpoint_benchmark     Flask views against a temporary SQLite database
+    python -m benchmarks.compare A.json B.json  ratios between two result files
+    python -m benchmarks.knapsack_benchmark     packing knapsack against the original table DP
+    python -m benchmarks.startup_benchmark      cold worker boot time in fresh processes
+    python -m benchmarks.load_test --serve      concurrent customers and dispatchers against a server
+    python -m benchmarks.zone_benchmark         zoned route solving against the number of pool processes
+"""
@@ -0,0 +1,112 @@
+"""
+Micro-benchmarks of the order, packing and routing algorithms
+
+Run from the QuickCart directory:
+
+    python -m benchmarks.algorithms_benchmark --scales 10 100 1000 10000 --output results/algorithms.json
+
+Each benchmark has a largest scale it is run at; exponential algorithms
+(exact TSP) and quadratic ones (distance matrices, routes) are reported as
+skipped beyond it instead of running for hours.
+"""
+import argparse
+from algorithms import merge_sort, knapsack, tsp_dynamic_programming
+from dispatch import DispatchQueue
+from distance import distance_matrix
+from packing import pack_fleet
+from routing import solve_route, EXACT_MAX_LOCATIONS
+from vrp import solve_vrp
+from benchmarks.generators import generate_orders, generate_locations, distances_for
+from benchmarks.harness import measure, write_results, print_table
+
+DEFAULT_SCALES = [10, 100, 1000, 10000]
+
+# Fleet of the sample data in database.create_sample_vehicles
+SAMPLE_FLEET = [
+    {'name': 'Truck 1', 'capacity': 100},
+    {'name': 'Truck 2', 'capacity': 100},
+    {'name': 'Van 1', 'capacity': 60},
+    {'name': 'Van 2', 'capacity': 60},
+    {'name': 'Bike 1', 'capacity': 15},
+]
+
+
+def _orders(scale, seed):
+    return generate_orders(scale, seed, status_mix={'pending': 1.0})
+
+
+def _distances(scale, seed):
+    # The warehouse plus one stop per order
+    return distances_for(generate_locations(scale + 1, seed))
+
+
+def _dispatch(orders):
+    queue = DispatchQueue()
+    queue.load(orders)
+    return [queue.pop_next() for _ in range(len(orders))]
+
+
+# name -> (largest scale, setup(scale, seed) -> args, function)
+BENCHMARKS = {
+    'merge_sort': (100000, lambda scale, seed: (_orders(scale, seed),), merge_sort),
+    'dispatch_queue': (100000, lambda scale, seed: (_orders(scale, seed),), _dispatch),
+    'knapsack': (100000, lambda scale, seed: (_orders(scale, seed), 100), knapsack),
+    'pack_fleet': (100000, lambda scale, seed: (_orders(scale, seed), SAMPLE_FLEET), pack_fleet),
+    'tsp_dynamic_programming': (EXACT_MAX_LOCATIONS - 1, lambda scale, seed: (_distances(scale, seed),),
+                                tsp_dynamic_programming),
+    'solve_route': (2000, lambda scale, seed: (_distances(scale, seed),), solve_route),
+    'solve_vrp': (2000, lambda scale, seed: (_orders(scale, seed), SAMPLE_FLEET, _distances(scale, seed)),
+                  solve_vrp),
+    'distance_matrix': (5000, lambda scale, seed: (generate_locations(scale + 1, seed),), distance_matrix),
+}
+
+
+def run(scales, names=None, seed=42, repeat=3, trace_memory=True):
+    """
+    Run the selected benchmarks at each scale
+
+    Args:
+        scales: Numbers of orders (or stops) to benchmark
+        names: Benchmark names from BENCHMARKS, default all
+        seed: Seed for the synthetic data
+        repeat: Timed runs per measurement
+        trace_memory: Also measure peak memory with tracemalloc
+
+    Returns:
+        List of result dictionaries
+    """
+    results = []
+    for name in names or BENCHMARKS:
+        max_scale, setup, func = BENCHMARKS[name]
+        for scale in scales:
+            if scale > max_scale:
+                results.append({'name': name, 'scale': scale, 'skipped': True,
+                                'reason': f'above the largest scale ({max_scale})'})
+                continue
+
+            args = setup(scale, seed)
+            measurement, _ = measure(func, *args, repeat=repeat, trace_memory=trace_memory)
+            results.append({'name': name, 'scale': scale, **measurement})
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--scales', type=int, nargs='+', default=DEFAULT_SCALES)
+    parser.add_argument('--only', nargs='+', choices=sorted(BENCHMARKS), help='benchmarks to run')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--no-memory', action='store_true', help='skip the tracemalloc runs')
+    parser.add_argument('--output', help="write JSON results to this file ('-' for stdout)")
+    args = parser.parse_args()
+
+    results = run(args.scales, args.only, args.seed, args.repeat, not args.no_memory)
+    print_table(results)
+
+    if args.output:
+        write_results(args.output, 'algorithms', results,
+                      scales=args.scales, seed=args.seed, repeat=args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""
+Compare two benchmark result files, e.g. from the parent commit and the current one
+
+Run from the QuickCart directory:
+
+    python -m benchmarks.compare results/before.json results/after.json --threshold 1.2
+
+Exits with status 1 when any benchmark got slower (or used more memory) by
+more than the threshold factor.
+"""
+import argparse
+import json
+import sys
+
+
+def load_results(path):
+    """Results of a file written by harness.write_results, keyed by (name, scale)"""
+    with open(path, encoding='utf-8') as handle:
+        document = json.load(handle)
+    return {
+        (result['name'], result['scale']): result
+        for result in document['results']
+        if not result.get('skipped')
+    }
+
+
+def compare(before, after, threshold=1.2, min_seconds=0.001):
+    """
+    Ratios of after/before for every benchmark present in both runs
+
+    Timings below min_seconds are too noisy to flag as regressions.
+
+    Returns:
+        List of (name, scale, time ratio, memory ratio or None, regressed) tuples
+    """
+    rows = []
+    for key in sorted(before.keys() & after.keys(), key=lambda key: (key[0], key[1])):
+        old, new = before[key], after[key]
+        time_ratio = new['seconds'] / old['seconds'] if old['seconds'] > 0 else 1.0
+
+        memory_ratio = None
+        if old.get('peak_bytes') and new.get('peak_bytes') is not None:
+            memory_ratio = new['peak_bytes'] / old['peak_bytes']
+
+        regressed = (time_ratio > threshold and new['seconds'] >= min_seconds) or \
+                    (memory_ratio is not None and memory_ratio > threshold)
+        rows.append((key[0], key[1], time_ratio, memory_ratio, regressed))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('before')
+    parser.add_argument('after')
+    parser.add_argument('--threshold', type=float, default=1.2,
+                        help='flag ratios above this factor (default 1.2)')
+    args = parser.parse_args()
+
+    rows = compare(load_results(args.before), load_results(args.after), args.threshold)
+
+    print(f"{'benchmark':<52} {'scale':>8} {'time x':>8} {'memory x':>9}")
+    for name, scale, time_ratio, memory_ratio, regressed in rows:
+        memory = f'{memory_ratio:>9.2f}' if memory_ratio is not None else f"{'-':>9}"
+        flag = '  REGRESSION' if regressed else ''
+        print(f"{name:<52} {scale:>8} {time_ratio:>8.2f} {memory}{flag}")
+
+    if any(row[-1] for row in rows):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,185 @@
+"""
+End-to-end timings of the customer and delivery views through the Flask test client
+
+Run from the QuickCart directory:
+
+    python -m benchmarks.endpoint_benchmark --scales 100 1000 10000 --output results/endpoints.json
+
+The app runs against a temporary SQLite database that is grown to each
+scale in turn (smallest first), so the sample users, products and vehicles
+from init_db are present alongside the synthetic orders. Optimization jobs
+run inline so their solve time is part of the request; cold requests start
+without cached results, warm ones may be served from the job result cache.
+"""
+import argparse
+import logging
+import os
+import shutil
+import tempfile
+from datetime import datetime
+from benchmarks.generators import generate_orders, generate_products
+from benchmarks.harness import measure, write_results, print_table
+
+DEFAULT_SCALES = [100, 1000, 10000]
+
+# (role, path, largest scale); the route view solves every processing order at once
+ENDPOINTS = [
+    ('customer', '/customer/dashboard', None),
+    ('customer', '/customer/products', None),
+    ('customer', '/customer/api/products', None),
+    ('delivery', '/delivery/dashboard', None),
+    ('delivery', '/delivery/api/orders?status=pending', None),
+    ('delivery', '/delivery/order_optimization', None),
+    ('delivery', '/delivery/packing_optimization', None),
+    ('delivery', '/delivery/packing_optimization?mode=fleet', None),
+    ('delivery', '/delivery/route_optimization', 5000),
+    ('delivery', '/delivery/nearby_orders?k=10', None),
+    ('delivery', '/delivery/order_details/1', None),
+]
+
+SAMPLE_LOGINS = {
+    'customer': {'email': 'customer@example.com', 'password': 'password123', 'role': 'customer'},
+    'delivery': {'email': 'delivery@example.com', 'password': 'password123', 'role': 'delivery'},
+}
+
+
+def _load_app(database_path):
+    """Build the app against the benchmark database and create its tables and sample data"""
+    from app import create_app
+    from database import init_database
+
+    # Solve optimization jobs within the request so the timings include them
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{database_path}',
+        'WTF_CSRF_ENABLED': False,
+        'OPTIMIZATION_EXECUTOR': 'inline',
+    })
+    with app.app_context():
+        init_database()
+    return app
+
+
+def _seed(app, orders, products):
+    """Bulk-insert synthetic orders and products"""
+    from app import db
+    from catalog import catalog
+    from models import Order, Product
+
+    rows = []
+    for order in orders:
+        row = {column: order[column] for column in (
+            'order_id', 'address', 'premium_member', 'delivery_type', 'total_price',
+            'total_weight', 'status', 'lat', 'lng')}
+        row['user_id'] = 1
+        row['created_at'] = datetime.fromisoformat(order['created_at'])
+        rows.append(row)
+
+    with app.app_context():
+        if rows:
+            db.session.execute(db.insert(Order), rows)
+        if products:
+            db.session.execute(db.insert(Product), products)
+            catalog.bump_version()
+        db.session.commit()
+
+
+def _reset_caches():
+    """Drop process-wide state so the first request at a new scale starts cold"""
+    from cache import order_cache
+    from catalog import catalog
+    from dispatch import dispatch_queue
+    from distance import distance_cache
+    from jobs import job_runner
+    from reoptimize import reoptimizer
+    from spatial import order_index
+
+    dispatch_queue.invalidate()
+    order_index.invalidate()
+    distance_cache.clear()
+    order_cache.memory.clear()
+    catalog.invalidate()
+    job_runner.clear()
+    reoptimizer.invalidate()
+
+
+def _get(client, path):
+    response = client.get(path)
+    if response.status_code != 200:
+        raise RuntimeError(f'GET {path} returned {response.status_code}')
+    return len(response.data)
+
+
+def run(scales, seed=42, repeat=3, trace_memory=True):
+    """
+    Time every endpoint at each scale
+
+    Args:
+        scales: Total numbers of orders in the database
+        seed: Seed for the synthetic data
+        repeat: Warm requests per measurement
+        trace_memory: Also measure peak memory of one request with tracemalloc
+
+    Returns:
+        List of result dictionaries
+    """
+    directory = tempfile.mkdtemp(prefix='quickcart-bench-')
+    try:
+        app = _load_app(os.path.join(directory, 'bench.db'))
+        clients = {}
+        for role, credentials in SAMPLE_LOGINS.items():
+            clients[role] = app.test_client()
+            clients[role].post('/login', data=credentials)
+
+        from app import db
+        from models import Order
+        with app.app_context():
+            next_id = (db.session.scalar(db.select(db.func.max(Order.order_id))) or 0) + 1
+
+        results = []
+        seeded = 0
+        for scale in sorted(scales):
+            # Grow the tables to this scale; the catalog grows at a tenth of the orders
+            _seed(app,
+                  generate_orders(scale - seeded, seed + scale, start_id=next_id),
+                  generate_products(scale // 10 - seeded // 10, seed + scale))
+            next_id += scale - seeded
+            seeded = scale
+
+            for role, path, max_scale in ENDPOINTS:
+                name = f'{role} {path}'
+                if max_scale is not None and scale > max_scale:
+                    results.append({'name': name, 'scale': scale, 'skipped': True,
+                                    'reason': f'above the largest scale ({max_scale})'})
+                    continue
+
+                _reset_caches()
+                cold, size = measure(_get, clients[role], path, repeat=1, trace_memory=False)
+                measurement, _ = measure(_get, clients[role], path,
+                                         repeat=repeat, trace_memory=trace_memory)
+                results.append({'name': name, 'scale': scale, 'bytes': size,
+                                'cold_seconds': cold['seconds'], **measurement})
+        return results
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--scales', type=int, nargs='+', default=DEFAULT_SCALES)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--no-memory', action='store_true', help='skip the tracemalloc runs')
+    parser.add_argument('--output', help="write JSON results to this file ('-' for stdout)")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    results = run(args.scales, args.seed, args.repeat, not args.no_memory)
+    print_table(results)
+
+    if args.output:
+        write_results(args.output, 'endpoints', results,
+                      scales=args.scales, seed=args.seed, repeat=args.repeat)
+
+
+if __name__ == '__main__':
+    main()
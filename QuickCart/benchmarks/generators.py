@@ -0,0 +1,115 @@
+"""
+Seeded synthetic data for the benchmarks
+
+Every generator takes a seed, so the same scale always produces the same
+orders, products and locations and results are comparable between commits.
+"""
+import random
+from datetime import datetime, timedelta
+from geocoding import GAZETTEER, WAREHOUSE_LAT, WAREHOUSE_LNG
+
+# Order status mix of a long-running shop: most orders are already out of the door
+DEFAULT_STATUS_MIX = {
+    'pending': 0.3,
+    'processing': 0.1,
+    'shipped': 0.2,
+    'delivered': 0.4,
+}
+
+BASE_TIME = datetime(2025, 1, 1)
+
+
+def generate_locations(count, seed=42, spread=0.5):
+    """
+    Delivery points scattered around the warehouse
+
+    Args:
+        count: Number of locations
+        seed: Random seed
+        spread: Maximum offset from the warehouse in degrees
+
+    Returns:
+        List of {'id', 'lat', 'lng'} dictionaries
+    """
+    rng = random.Random(seed)
+    return [
+        {
+            'id': f'location-{i + 1}',
+            'lat': WAREHOUSE_LAT + rng.uniform(-spread, spread),
+            'lng': WAREHOUSE_LNG + rng.uniform(-spread, spread),
+        }
+        for i in range(count)
+    ]
+
+
+def generate_orders(count, seed=42, status_mix=None, user_ids=(1,), start_id=1):
+    """
+    Orders in the dictionary shape used by the views and optimizers
+
+    Weights lie on a 10 g grid like real cart totals. Addresses name a town
+    from the gazetteer, and coordinates are jittered around it.
+
+    Args:
+        count: Number of orders
+        seed: Random seed
+        status_mix: Mapping of status -> probability (default DEFAULT_STATUS_MIX)
+        user_ids: Customer IDs to spread the orders over
+        start_id: First order ID
+
+    Returns:
+        List of order dictionaries, oldest first
+    """
+    rng = random.Random(seed)
+    status_mix = status_mix or DEFAULT_STATUS_MIX
+    statuses = list(status_mix)
+    status_weights = [status_mix[status] for status in statuses]
+    towns = sorted(GAZETTEER)
+
+    orders = []
+    for i in range(count):
+        town = rng.choice(towns)
+        lat, lng = GAZETTEER[town]
+        weight = rng.randint(20, 1500) / 100
+        price = round(rng.uniform(2, 80), 2)
+        orders.append({
+            'order_id': start_id + i,
+            'user_id': rng.choice(user_ids),
+            'address': f'{rng.randint(1, 200)} Main Street, {town.title()}',
+            'premium_member': rng.random() < 0.3,
+            'delivery_type': 'express' if rng.random() < 0.4 else 'standard',
+            'total_price': price,
+            'total_weight': weight,
+            'weight': weight,
+            'value': price,
+            'status': rng.choices(statuses, status_weights)[0],
+            'created_at': (BASE_TIME + timedelta(minutes=start_id + i)).isoformat(),
+            'lat': lat + rng.uniform(-0.02, 0.02),
+            'lng': lng + rng.uniform(-0.02, 0.02),
+        })
+    return orders
+
+
+def generate_products(count, seed=42):
+    """
+    Catalog entries with the Product model's columns (no product_id)
+
+    Returns:
+        List of product dictionaries
+    """
+    rng = random.Random(seed)
+    return [
+        {
+            'name': f'Product {i + 1}',
+            'description': f'Synthetic benchmark product {i + 1}',
+            'price': round(rng.uniform(0.5, 25), 2),
+            'weight': rng.randint(5, 500) / 100,
+            'stock': rng.randint(0, 500),
+        }
+        for i in range(count)
+    ]
+
+
+def distances_for(locations):
+    """Dense haversine distance matrix (km) for generated locations, as nested lists"""
+    from distance import distance_matrix
+    return distance_matrix(locations).tolist()
@@ -0,0 +1,114 @@
+"""
+Timing, memory measurement and JSON result files shared by the benchmarks
+"""
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+
+def measure(func, *args, repeat=3, trace_memory=True, **kwargs):
+    """
+    Time func(*args, **kwargs), then run it once more under tracemalloc
+
+    tracemalloc slows down allocation-heavy code a lot, so the timed runs are
+    kept separate from the traced one.
+
+    Args:
+        func: Callable to benchmark
+        repeat: Number of timed runs
+        trace_memory: Also measure peak traced memory
+
+    Returns:
+        (measurement dictionary, result of the last timed run)
+    """
+    timings = []
+    result = None
+    for _ in range(max(1, repeat)):
+        started = time.perf_counter()
+        result = func(*args, **kwargs)
+        timings.append(time.perf_counter() - started)
+
+    measurement = {
+        'seconds': statistics.median(timings),
+        'min_seconds': min(timings),
+        'runs': len(timings),
+    }
+
+    if trace_memory:
+        tracemalloc.start()
+        try:
+            func(*args, **kwargs)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        measurement['peak_bytes'] = peak
+
+    return measurement, result
+
+
+def git_revision():
+    """Current commit hash, or None outside a git checkout"""
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment():
+    """Where and when the benchmark ran, stored with the results"""
+    return {
+        'commit': git_revision(),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+    }
+
+
+def write_results(path, suite, results, **settings):
+    """
+    Write benchmark results as JSON
+
+    Args:
+        path: Output file path, or '-' for stdout
+        suite: Name of the benchmark suite
+        results: List of result dictionaries
+        settings: Parameters of the run (scales, seed, ...)
+    """
+    document = {
+        'suite': suite,
+        'environment': environment(),
+        'settings': settings,
+        'results': results,
+    }
+
+    if path == '-':
+        json.dump(document, sys.stdout, indent=2)
+        sys.stdout.write('\n')
+        return
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as handle:
+        json.dump(document, handle, indent=2)
+
+
+def print_table(results):
+    """Human-readable summary of result dictionaries"""
+    print(f"{'benchmark':<52} {'scale':>8} {'seconds':>10} {'peak MiB':>10}")
+    for result in results:
+        if result.get('skipped'):
+            print(f"{result['name']:<52} {result['scale']:>8} {'skipped':>10}")
+            continue
+        peak = result.get('peak_bytes')
+        peak = f'{peak / 2**20:>10.2f}' if peak is not None else f"{'-':>10}"
+        print(f"{result['name']:<52} {result['scale']:>8} {result['seconds']:>10.4f} {peak}")
@@ -0,0 +1,100 @@
+"""
+Memory/time benchmark of the packing knapsack engines and the original 2-D table implementation
+
+Run from the QuickCart directory:
+
+    python -m benchmarks.knapsack_benchmark --sizes 50 200 2000 --capacity 100 1000
+
+Reports the rolling DP, branch-and-bound and FPTAS engines side by side with
+the value each finds and its proven optimality gap. --decimals 4 weighs
+orders to 0.1 g, finer than the DP's 10 g steps, as with precise scales.
+"""
+import argparse
+import random
+from algorithms import knapsack, knapsack_branch_and_bound, knapsack_fptas, DEFAULT_FPTAS_EPSILON
+from benchmarks.harness import measure
+
+
+def legacy_knapsack(orders, max_capacity):
+    """The original (n+1) x (capacity*100+1) list-of-lists implementation, kept for comparison"""
+    if not orders:
+        return [], 0
+
+    n = len(orders)
+    scale_factor = 100
+    scaled_max_capacity = int(max_capacity * scale_factor)
+    scaled_weights = [int(order['weight'] * scale_factor) for order in orders]
+
+    dp = [[0 for _ in range(scaled_max_capacity + 1)] for _ in range(n + 1)]
+
+    for i in range(1, n + 1):
+        for w in range(scaled_max_capacity + 1):
+            weight = scaled_weights[i-1]
+            value = orders[i-1]['value']
+
+            if weight <= w:
+                dp[i][w] = max(dp[i-1][w], dp[i-1][w-weight] + value)
+            else:
+                dp[i][w] = dp[i-1][w]
+
+    selected = []
+    w = scaled_max_capacity
+    for i in range(n, 0, -1):
+        if dp[i][w] != dp[i-1][w]:
+            selected.append(i-1)
+            w -= scaled_weights[i-1]
+
+    selected.reverse()
+    return selected, sum(orders[i]['value'] for i in selected)
+
+
+def generate_orders(count, seed=42, decimals=2):
+    """Pending orders shaped like the packing view's input, weights on a 10 g grid by default"""
+    rng = random.Random(seed)
+    scale = 10 ** decimals
+    return [
+        {
+            'order_id': i + 1,
+            'weight': rng.randint(round(0.2 * scale), 15 * scale) / scale,
+            'value': round(rng.uniform(2, 80), 2),
+        }
+        for i in range(count)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[50, 200, 2000])
+    parser.add_argument('--capacity', type=float, nargs='+', default=[100])
+    parser.add_argument('--decimals', type=int, default=2, help='weight precision in kg decimals')
+    parser.add_argument('--epsilon', type=float, default=DEFAULT_FPTAS_EPSILON)
+    parser.add_argument('--dp-limit', type=float, default=2e8,
+                        help='skip the rolling DP above this many table cells')
+    parser.add_argument('--legacy-limit', type=int, default=200,
+                        help='skip the legacy implementation above this many orders')
+    args = parser.parse_args()
+
+    print(f"{'orders':>8} {'capacity':>9} {'engine':>17} {'seconds':>10} {'peak MiB':>10} {'value':>10} {'gap %':>8}")
+    for capacity in args.capacity:
+        for size in args.sizes:
+            orders = generate_orders(size, decimals=args.decimals)
+            engines = [
+                ('branch_and_bound', lambda orders, capacity: knapsack_branch_and_bound(orders, capacity)),
+                ('fptas', lambda orders, capacity: knapsack_fptas(orders, capacity, args.epsilon)),
+            ]
+            if size * capacity * 100 <= args.dp_limit:
+                engines.insert(0, ('rolling', knapsack))
+            if size <= args.legacy_limit:
+                engines.append(('legacy', legacy_knapsack))
+
+            for name, func in engines:
+                measurement, solution = measure(func, orders, capacity, repeat=1)
+                total_value = solution[1]
+                upper_bound = solution[2] if len(solution) > 2 else total_value
+                gap = (upper_bound - total_value) / upper_bound * 100 if upper_bound else 0.0
+                print(f"{size:>8} {capacity:>9g} {name:>17} {measurement['seconds']:>10.4f} "
+                      f"{measurement['peak_bytes'] / 2**20:>10.2f} {total_value:>10.2f} {gap:>8.3f}")
+
+
+if __name__ == '__main__':
+    main()
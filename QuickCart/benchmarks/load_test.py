@@ -0,0 +1,438 @@
+"""
+Load test: concurrent customers and dispatchers against a running server
+
+Run from the QuickCart directory, against a server that is already up:
+
+    python -m benchmarks.load_test --url http://127.0.0.1:5000 --customers 16 --dispatchers 4 --duration 60
+
+or let it start one on a temporary SQLite database (gunicorn with
+gunicorn.conf.py when it is installed, the development server otherwise):
+
+    python -m benchmarks.load_test --serve --duration 30 --output results/load.json
+
+Every virtual user is a separate session that logs in through the login
+form, picking up CSRF tokens from the pages it loads, then runs a
+weighted mix of actions in a closed loop (optionally with think time)
+until the duration is up. Customers browse the product grid, add to their
+cart, view it and check out; dispatchers load the dashboard and the
+order, packing and route optimization pages. By default each customer
+registers its own account so carts don't collide; --shared-accounts
+makes all of them use the seeded customer. Dispatchers share the seeded
+delivery user.
+
+Reported per endpoint: requests, throughput, p50/p95/p99 latency and the
+error rate (connection errors and 4xx/5xx). Optimization pages that come
+back 202 (solve still running) count as served; orders refused for lack
+of stock count as rejected, not as errors.
+"""
+import argparse
+import http.cookiejar
+import json
+import math
+import os
+import random
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import defaultdict
+from benchmarks.harness import write_results
+
+SAMPLE_LOGINS = {
+    'customer': {'email': 'customer@example.com', 'password': 'password123'},
+    'delivery': {'email': 'delivery@example.com', 'password': 'password123'},
+}
+
+# (action, weight); each action is a method of the virtual user
+CUSTOMER_MIX = [('browse', 40), ('add_to_cart', 30), ('view_cart', 15), ('place_order', 15)]
+DISPATCHER_MIX = [('dashboard', 30), ('order_optimization', 25), ('packing', 25), ('route', 20)]
+
+ADDRESSES = ['12 Main Road, Karur', '4 Bazaar Street, Kulithalai', '88 Station Road, Namakkal',
+             '7 Temple Street, Erode', '21 Market Road, Dindigul', '3 Bypass Road, Trichy']
+
+CSRF_PATTERNS = (
+    re.compile(r'<meta name="csrf-token" content="([^"]+)"'),
+    re.compile(r'name="csrf_token" type="hidden" value="([^"]+)"'),
+    re.compile(r'type="hidden" name="csrf_token" value="([^"]+)"'),
+)
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    """Report redirects instead of following them, so each request is timed on its own"""
+
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+class Recorder:
+    """Latencies and outcomes per endpoint, shared by all virtual users"""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.rejected = defaultdict(int)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+        self._lock = threading.Lock()
+
+    def record(self, endpoint, seconds, status, error=False, rejected=False):
+        with self._lock:
+            self.latencies[endpoint].append(seconds)
+            self.statuses[endpoint][str(status)] += 1
+            if error:
+                self.errors[endpoint] += 1
+            if rejected:
+                self.rejected[endpoint] += 1
+
+    def results(self, duration):
+        """One result dictionary per endpoint plus an 'all' row"""
+        with self._lock:
+            endpoints = {endpoint: list(latencies) for endpoint, latencies in self.latencies.items()}
+        endpoints['all'] = [latency for latencies in endpoints.values() for latency in latencies]
+
+        results = []
+        for endpoint in sorted(endpoints, key=lambda name: (name == 'all', name)):
+            latencies = sorted(endpoints[endpoint])
+            if endpoint == 'all':
+                errors, rejected = sum(self.errors.values()), sum(self.rejected.values())
+                statuses = {}
+                for counts in self.statuses.values():
+                    for status, count in counts.items():
+                        statuses[status] = statuses.get(status, 0) + count
+            else:
+                errors, rejected = self.errors[endpoint], self.rejected[endpoint]
+                statuses = dict(self.statuses[endpoint])
+            results.append({
+                'name': endpoint,
+                'requests': len(latencies),
+                'throughput': len(latencies) / duration if duration else 0.0,
+                'p50': _percentile(latencies, 50),
+                'p95': _percentile(latencies, 95),
+                'p99': _percentile(latencies, 99),
+                'max': latencies[-1] if latencies else None,
+                'errors': errors,
+                'error_rate': errors / len(latencies) if latencies else 0.0,
+                'rejected': rejected,
+                'statuses': statuses,
+            })
+        return results
+
+
+def _percentile(ordered, percent):
+    """Nearest-rank percentile of an already sorted list"""
+    if not ordered:
+        return None
+    rank = max(1, math.ceil(percent / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+class LoadTestError(Exception):
+    """A virtual user could not get started (e.g. its login was refused)"""
+
+
+class VirtualUser:
+    """One browser session: its own cookies and the latest CSRF token it has seen"""
+
+    mix = []
+
+    def __init__(self, base_url, recorder, rng, timeout=30):
+        self.base_url = base_url.rstrip('/')
+        self.recorder = recorder
+        self.rng = rng
+        self.timeout = timeout
+        self.csrf_token = None
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), _NoRedirect())
+
+    def request(self, endpoint, path, form=None, record=True):
+        """
+        Send one request, remember any CSRF token in the response and record its timing
+
+        Args:
+            endpoint: Name the timing is reported under
+            path: Path relative to the base URL
+            form: Form fields for a POST (the CSRF token is added), or None for a GET
+            record: Whether to count the request in the results
+
+        Returns:
+            (status, body, location) where location is the redirect target, if any
+        """
+        data, headers = None, {}
+        if form is not None:
+            form = dict(form, csrf_token=self.csrf_token or '')
+            data = urllib.parse.urlencode(form).encode()
+            headers['X-CSRFToken'] = self.csrf_token or ''
+
+        started = time.perf_counter()
+        try:
+            with self.opener.open(urllib.request.Request(self.base_url + path, data=data, headers=headers),
+                                  timeout=self.timeout) as response:
+                status, body, location = response.status, response.read(), None
+        except urllib.error.HTTPError as e:
+            status, body, location = e.code, e.read(), e.headers.get('Location')
+        except (OSError, urllib.error.URLError):
+            if record:
+                self.recorder.record(endpoint, time.perf_counter() - started, 'connection error', error=True)
+            return None, b'', None
+        elapsed = time.perf_counter() - started
+
+        if b'csrf' in body:
+            text = body.decode('utf-8', 'replace')
+            for pattern in CSRF_PATTERNS:
+                match = pattern.search(text)
+                if match:
+                    self.csrf_token = match.group(1)
+                    break
+
+        if record:
+            rejected = self.rejected(endpoint, status, location)
+            self.recorder.record(endpoint, elapsed, status, error=status >= 400, rejected=rejected)
+        return status, body, location
+
+    def rejected(self, endpoint, status, location):
+        return False
+
+    def login(self, email, password, role):
+        self.request('login page', '/login', record=False)
+        status, _, location = self.request('login', '/login', {
+            'email': email, 'password': password, 'role': role, 'submit': 'Login'})
+        if status != 302 or not location or '/login' in location:
+            raise LoadTestError(f'Login as {email} ({role}) failed with status {status}')
+
+    def register(self, email, password, role):
+        """Create the account if it doesn't exist yet (an existing one is simply reused)"""
+        self.request('register page', '/register', record=False)
+        self.request('register', '/register', {
+            'email': email, 'password': password, 'confirm_password': password,
+            'role': role, 'submit': 'Register'}, record=False)
+
+    def setup(self):
+        pass
+
+    def run(self, deadline, think_time=0.0):
+        actions = [getattr(self, action) for action, _ in self.mix]
+        weights = [weight for _, weight in self.mix]
+        while time.monotonic() < deadline:
+            self.rng.choices(actions, weights)[0]()
+            if think_time:
+                time.sleep(self.rng.expovariate(1 / think_time))
+
+
+class Customer(VirtualUser):
+    mix = CUSTOMER_MIX
+
+    def __init__(self, base_url, recorder, rng, account, **kwargs):
+        super().__init__(base_url, recorder, rng, **kwargs)
+        self.account = account
+        self.product_ids = []
+        self.cart_lines = 0
+
+    def setup(self):
+        if self.account != SAMPLE_LOGINS['customer']:
+            self.register(self.account['email'], self.account['password'], 'customer')
+        self.login(self.account['email'], self.account['password'], 'customer')
+
+        # Product ids to browse from and add to the cart, fetched through the JSON API
+        after = None
+        while True:
+            query = '?limit=100' + (f'&after={after}' if after else '')
+            status, body, _ = self.request('products api', '/customer/api/products' + query, record=False)
+            if status != 200:
+                raise LoadTestError(f'Product listing failed with status {status}')
+            page = json.loads(body.decode('utf-8'))
+            # The listing carries no stock; sold-out products are refused at checkout
+            self.product_ids.extend(product['product_id'] for product in page['products'])
+            after = page.get('next_after')
+            if not after:
+                break
+        if not self.product_ids:
+            raise LoadTestError('No products listed')
+
+    def browse(self):
+        after = self.rng.choice([None] + self.product_ids)
+        self.request('browse', '/customer/products' + (f'?after={after}' if after else ''))
+
+    def add_to_cart(self):
+        status, _, _ = self.request('add_to_cart', '/customer/add_to_cart', {
+            'product_id': self.rng.choice(self.product_ids), 'quantity': self.rng.randint(1, 3)})
+        if status == 200:
+            self.cart_lines += 1
+
+    def view_cart(self):
+        self.request('view_cart', '/customer/cart')
+
+    def place_order(self):
+        if not self.cart_lines:
+            self.add_to_cart()
+            self.view_cart()
+        self.request('place_order', '/customer/place_order', {
+            'address': self.rng.choice(ADDRESSES),
+            'delivery_type': self.rng.choice(['express', 'standard']),
+            'submit': 'Place Order',
+            **({'premium_member': 'y'} if self.rng.random() < 0.3 else {}),
+        })
+        self.cart_lines = 0
+
+    def rejected(self, endpoint, status, location):
+        # A refused checkout (out of stock, empty cart) redirects back to the cart
+        return endpoint == 'place_order' and status == 302 and '/customer/cart' in (location or '')
+
+
+class Dispatcher(VirtualUser):
+    mix = DISPATCHER_MIX
+
+    def setup(self):
+        account = SAMPLE_LOGINS['delivery']
+        self.login(account['email'], account['password'], 'delivery')
+
+    def dashboard(self):
+        self.request('dashboard', '/delivery/dashboard')
+
+    def order_optimization(self):
+        self.request('order_optimization', '/delivery/order_optimization')
+
+    def packing(self):
+        mode = self.rng.choice(['single', 'fleet'])
+        self.request(f'packing ({mode})', f'/delivery/packing_optimization?mode={mode}')
+
+    def route(self):
+        self.request('route', '/delivery/route_optimization')
+
+
+def run(base_url, customers=8, dispatchers=2, duration=30.0, think_time=0.0, shared_accounts=False, seed=0):
+    """
+    Run the load test against a server
+
+    Args:
+        base_url: Server address, e.g. http://127.0.0.1:5000
+        customers: Concurrent virtual customers
+        dispatchers: Concurrent virtual delivery users
+        duration: Seconds of load after every user has logged in
+        think_time: Mean pause between a user's actions in seconds (0 = back to back)
+        shared_accounts: Log every customer in as the seeded customer
+        seed: Random seed for the action mixes
+
+    Returns:
+        (per-endpoint result dictionaries, measured duration in seconds)
+    """
+    recorder = Recorder()
+    users = []
+    for index in range(customers):
+        account = SAMPLE_LOGINS['customer'] if shared_accounts or index == 0 else {
+            'email': f'loadtest-customer-{index}@example.com', 'password': 'password123'}
+        users.append(Customer(base_url, recorder, random.Random(seed * 1000 + index), account))
+    for index in range(dispatchers):
+        users.append(Dispatcher(base_url, recorder, random.Random(seed * 1000 + customers + index)))
+
+    for user in users:
+        user.setup()
+
+    recorder = Recorder()  # don't count the setup requests
+    for user in users:
+        user.recorder = recorder
+
+    started = time.monotonic()
+    deadline = started + duration
+    threads = [threading.Thread(target=user.run, args=(deadline, think_time), daemon=True) for user in users]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+
+    return recorder.results(elapsed), elapsed
+
+
+def _wait_until_up(base_url, process, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise LoadTestError(f'Server exited with status {process.returncode}')
+        try:
+            urllib.request.urlopen(base_url + '/login', timeout=2).close()
+            return
+        except (OSError, urllib.error.URLError):
+            time.sleep(0.25)
+    raise LoadTestError(f'Server did not come up within {timeout} s')
+
+
+def serve(port, directory):
+    """
+    Start a server on a fresh SQLite database in `directory`
+
+    Returns:
+        The server process
+    """
+    app_directory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(directory, 'load.db')}",
+               PORT=str(port), LOG_LEVEL='WARNING')
+    subprocess.run([sys.executable, '-m', 'flask', '--app', 'main', 'init-db'], env=env, check=True,
+                   capture_output=True, cwd=app_directory)
+
+    try:
+        import gunicorn  # noqa: F401
+        command = [sys.executable, '-m', 'gunicorn', '--config', 'gunicorn.conf.py',
+                   '--access-logfile', '', 'main:app']
+    except ImportError:
+        command = [sys.executable, 'main.py']
+    return subprocess.Popen(command, env=env, cwd=app_directory,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def print_results(results, duration):
+    print(f"{'endpoint':<22} {'requests':>9} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'errors':>7} {'rejected':>9}")
+    for result in results:
+        latencies = [f"{result[key] * 1000:>8.1f}" if result[key] is not None else f"{'-':>8}"
+                     for key in ('p50', 'p95', 'p99')]
+        print(f"{result['name']:<22} {result['requests']:>9} {result['throughput']:>8.1f} {' '.join(latencies)} "
+              f"{result['error_rate']:>7.1%} {result['rejected']:>9}")
+    print(f"over {duration:.1f} s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--url', default='http://127.0.0.1:5000', help='server to load (ignored with --serve)')
+    parser.add_argument('--serve', action='store_true', help='start a server on a temporary database')
+    parser.add_argument('--port', type=int, default=5055, help='port for --serve')
+    parser.add_argument('--customers', type=int, default=8)
+    parser.add_argument('--dispatchers', type=int, default=2)
+    parser.add_argument('--duration', type=float, default=30.0, help='seconds of load')
+    parser.add_argument('--think-time', type=float, default=0.0, help='mean pause between actions')
+    parser.add_argument('--shared-accounts', action='store_true',
+                        help='log every customer in as the seeded customer')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="write JSON results to this file ('-' for stdout)")
+    args = parser.parse_args()
+
+    base_url, process, directory = args.url, None, None
+    if args.serve:
+        directory = tempfile.mkdtemp(prefix='quickcart-load-')
+        base_url = f'http://127.0.0.1:{args.port}'
+        process = serve(args.port, directory)
+    try:
+        if process is not None:
+            _wait_until_up(base_url, process)
+        results, duration = run(base_url, args.customers, args.dispatchers, args.duration,
+                                args.think_time, args.shared_accounts, args.seed)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+        if directory is not None:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    print_results(results, duration)
+    if args.output:
+        write_results(args.output, 'load', results, url=base_url, customers=args.customers,
+                      dispatchers=args.dispatchers, duration=args.duration, think_time=args.think_time,
+                      shared_accounts=args.shared_accounts, seed=args.seed)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""
+Cold start-up time of a web worker, measured in fresh interpreter processes
+
+Run from the QuickCart directory:
+
+    python -m benchmarks.startup_benchmark --repeat 10 --output results/startup.json
+
+Each run imports main (building the app the way a gunicorn worker does)
+in a new process against an already initialised temporary SQLite
+database, then serves one request. Reported per run: import/boot time,
+time of the first request, SQL statements issued during boot (should be
+0) and whether numpy was imported at boot.
+"""
+import argparse
+import json
+import logging
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+from benchmarks.harness import write_results, print_table
+
+# Runs in the child process; prints one JSON line
+CHILD = r'''
+import json, sys, time
+started = time.perf_counter()
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+statements = []
+event.listen(Engine, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+import main
+booted = time.perf_counter()
+boot_statements = len(statements)
+numpy_loaded = 'numpy' in sys.modules
+response = main.app.test_client().get('/login')
+served = time.perf_counter()
+print(json.dumps({'boot_seconds': booted - started, 'first_request_seconds': served - booted,
+                  'boot_statements': boot_statements, 'numpy_at_boot': numpy_loaded,
+                  'status': response.status_code}))
+'''
+
+
+def _run_child(env):
+    completed = subprocess.run([sys.executable, '-c', CHILD], env=env, capture_output=True, text=True,
+                               check=True, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def run(repeat=5):
+    """
+    Boot the app `repeat` times in new processes
+
+    Returns:
+        List of result dictionaries (boot and first request)
+    """
+    directory = tempfile.mkdtemp(prefix='quickcart-startup-')
+    try:
+        env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(directory, 'startup.db')}",
+                   LOG_LEVEL='WARNING')
+        subprocess.run([sys.executable, '-m', 'flask', '--app', 'main', 'init-db'], env=env, check=True,
+                       capture_output=True, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+        runs = [_run_child(env) for _ in range(max(1, repeat))]
+        results = []
+        for name, key in (('worker boot (import main)', 'boot_seconds'),
+                          ('first request (GET /login)', 'first_request_seconds')):
+            timings = [run[key] for run in runs]
+            results.append({
+                'name': name,
+                'scale': 1,
+                'seconds': statistics.median(timings),
+                'min_seconds': min(timings),
+                'runs': len(timings),
+                'boot_statements': max(run['boot_statements'] for run in runs),
+                'numpy_at_boot': any(run['numpy_at_boot'] for run in runs),
+            })
+        return results
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', help="write JSON results to this file ('-' for stdout)")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    results = run(args.repeat)
+    print_table(results)
+    print(f"SQL statements during boot: {results[0]['boot_statements']}, "
+          f"numpy imported at boot: {results[0]['numpy_at_boot']}")
+
+    if args.output:
+        write_results(args.output, 'startup', results, repeat=args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""
+Wall-clock scaling of zone-partitioned route solving with the number of pool processes
+
+Run from the QuickCart directory:
+
+    python -m benchmarks.zone_benchmark --stops 300 --workers 1 2 4 8
+
+Stops around the warehouse are split into zones (k-means by default), the
+zones are solved on a fresh process pool of each size, and the wall-clock
+time is compared with the summed per-zone solve time. The whole run solved
+as a single route is reported alongside. With w workers the wall-clock time
+should approach the zone time divided by min(w, cores, zones).
+"""
+import argparse
+import os
+import time
+from benchmarks.generators import generate_locations
+from distance import distance_matrix
+from geocoding import WAREHOUSE_LAT, WAREHOUSE_LNG
+from jobs import JobRunner
+from routing import solve_route
+from zones import partition_zones, zone_matrix, combine_zones
+
+
+def solve_zoned(locations, distances, workers, zone_count=None, zoning='kmeans', drivers=None):
+    """Solve one zoned run on a new pool of `workers` processes; returns the result and wall seconds"""
+    runner = JobRunner(executor='process', max_workers=workers, inline_max_size=-1)
+    # Start the pool processes before timing
+    for future in [runner._get_executor().submit(time.sleep, 0) for _ in range(workers)]:
+        future.result()
+
+    zones = partition_zones(locations, zone_count, zoning)
+    started = time.perf_counter()
+    job = runner.submit_parts(
+        'zoned_routing', 'benchmark', 'routing',
+        lambda: [(zone_matrix(distances, zone), 'auto') for zone in zones],
+        lambda results: combine_zones(zones, results, distances, drivers),
+        size=len(locations) - 1,
+    )
+    job.future.result()
+    elapsed = time.perf_counter() - started
+    runner.shutdown()
+    return job.result, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--stops', type=int, nargs='+', default=[100, 300])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--zones', type=int, help='zones per run (default: one per 12 stops)')
+    parser.add_argument('--zoning', choices=('kmeans', 'sweep'), default='kmeans')
+    parser.add_argument('--drivers', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{os.cpu_count()} CPUs")
+    print(f"{'stops':>6} {'workers':>8} {'zones':>6} {'wall s':>8} {'zone s':>8} {'speedup':>8} {'km':>10}")
+    for stops in args.stops:
+        locations = [{'id': 'warehouse', 'lat': WAREHOUSE_LAT, 'lng': WAREHOUSE_LNG}] + generate_locations(stops)
+        distances = distance_matrix(locations)
+
+        started = time.perf_counter()
+        single = solve_route(distances)
+        print(f"{stops:>6} {'single':>8} {1:>6} {time.perf_counter() - started:>8.3f} "
+              f"{'':>8} {'':>8} {single['distance']:>10.1f}")
+
+        baseline = None
+        for workers in args.workers:
+            result, elapsed = solve_zoned(locations, distances, workers, args.zones, args.zoning, args.drivers)
+            baseline = baseline or elapsed
+            print(f"{stops:>6} {workers:>8} {len(result['zones']):>6} {elapsed:>8.3f} "
+                  f"{result['solve_seconds']:>8.3f} {baseline / elapsed:>7.2f}x {result['distance']:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,312 @@
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from app import db
+from models import HashTable, Order, OrderItem, Product
+from metrics import metrics
+
+# Defaults for the in-memory tier; override with ORDER_CACHE_MAX_ENTRIES / ORDER_CACHE_TTL
+DEFAULT_MAX_ENTRIES = 10000
+DEFAULT_TTL = 30  # seconds
+
+# Session.info key for in-memory writes waiting for their transaction to commit
+_PENDING_KEY = 'order_cache_pending'
+
+
+class MemoryTier:
+    """
+    In-process LRU cache with a per-entry time-to-live
+
+    The TTL bounds how long a worker can serve details that another worker
+    has since changed in the shared backend.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class DatabaseBackend:
+    """Shared tier in the hashtable key-value table; writes join the caller's transaction"""
+
+    def get_many(self, keys):
+        return HashTable.get_many(keys)
+
+    def set_many(self, values):
+        HashTable.insert_many(values)
+
+
+class FileBackend:
+    """
+    Shared tier as one JSON file per order on local disk
+
+    Files are spread over subdirectories by the stable hash so no directory
+    grows too large, and written atomically via rename. Writes happen
+    immediately rather than with the database transaction.
+    """
+
+    def __init__(self, directory, shards=256):
+        self.directory = directory
+        self.shards = shards
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        if not re.fullmatch(r'[A-Za-z0-9_-]+', key):
+            raise ValueError(f"Invalid order cache key: {key!r}")
+        shard = f'{shard_of(key, self.shards):03d}'
+        return os.path.join(self.directory, shard, f'{key}.json')
+
+    def get_many(self, keys):
+        values = {}
+        for key in keys:
+            try:
+                with open(self._path(key), encoding='utf-8') as handle:
+                    values[key] = json.load(handle)
+            except FileNotFoundError:
+                continue
+            except (OSError, ValueError):
+                logging.warning("Unreadable order cache file for %s", key)
+        return values
+
+    def set_many(self, values):
+        for key, value in values.items():
+            path = self._path(key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            handle, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+            with os.fdopen(handle, 'w', encoding='utf-8') as temp_file:
+                json.dump(value, temp_file)
+            os.replace(temp_path, path)
+
+
+def shard_of(key, shards):
+    """Stable shard number (CRC32) for a cache key, identical across processes and restarts unlike hash()"""
+    return zlib.crc32(str(key).encode('utf-8')) % shards
+
+
+def load_order_details(order_ids):
+    """
+    Build order details from the orders tables, for orders missing from the cache
+
+    Args:
+        order_ids: Iterable of order IDs
+
+    Returns:
+        Dictionary of order_id -> details in the same shape place_order stores
+    """
+    order_ids = [int(order_id) for order_id in order_ids if str(order_id).isdigit()]
+    if not order_ids:
+        return {}
+
+    orders = Order.query.filter(Order.order_id.in_(order_ids)).all()
+    items = db.session.execute(
+        db.select(OrderItem.order_id, OrderItem.product_id, Product.name,
+                  OrderItem.quantity, OrderItem.price)
+        .join(Product, Product.product_id == OrderItem.product_id)
+        .where(OrderItem.order_id.in_(order_ids))
+    ).all()
+
+    items_by_order = {}
+    for order_id, product_id, name, quantity, price in items:
+        items_by_order.setdefault(order_id, []).append({
+            'product_id': str(product_id),
+            'name': name,
+            'quantity': quantity,
+            'price': price
+        })
+
+    return {
+        order.order_id: {
+            'order_id': order.order_id,
+            'user_id': order.user_id,
+            'address': order.address,
+            'premium_member': order.premium_member,
+            'delivery_type': order.delivery_type,
+            'total_price': order.total_price,
+            'total_weight': order.total_weight,
+            'status': order.status,
+            'created_at': order.created_at.isoformat(),
+            'items': items_by_order.get(order.order_id, [])
+        }
+        for order in orders
+    }
+
+
+class OrderDetailsCache:
+    """
+    Order details cache: in-memory LRU/TTL tier in front of a shared backend
+
+    Lookups try memory, then the backend (one indexed query or file read),
+    then rebuild from the orders tables; what they find is kept in memory
+    only, so a read never writes to the database. Writes go to the backend
+    at once (with the database backend as part of the caller's
+    transaction, so callers commit once for the order and its cache entry)
+    and reach the in-memory tier only when that transaction commits, so a
+    rollback leaves memory untouched.
+    """
+
+    BACKENDS = ('database', 'file', 'none')
+
+    def __init__(self, memory=None, backend=None):
+        self.memory = memory or MemoryTier()
+        self.backend = backend if backend is not None else DatabaseBackend()
+        self.hits = 0
+        self.misses = 0
+        self._installed = False
+
+    def init_app(self, app):
+        """Configure tiers from ORDER_CACHE_* settings"""
+        self.install()
+        self.memory = MemoryTier(
+            max_entries=int(app.config.get('ORDER_CACHE_MAX_ENTRIES', DEFAULT_MAX_ENTRIES)),
+            ttl=float(app.config.get('ORDER_CACHE_TTL', DEFAULT_TTL))
+        )
+
+        backend = app.config.get('ORDER_CACHE_BACKEND', 'database')
+        if backend == 'file':
+            directory = app.config.get('ORDER_CACHE_DIR') or os.path.join(app.instance_path, 'order_cache')
+            self.backend = FileBackend(directory)
+        elif backend == 'none':
+            self.backend = None
+        else:
+            self.backend = DatabaseBackend()
+
+    def install(self):
+        """Register the session listeners that apply in-memory writes on commit (once per process)"""
+        if self._installed:
+            return
+        event.listen(Session, 'after_commit', self._after_commit)
+        event.listen(Session, 'after_rollback', self._after_rollback)
+        self._installed = True
+
+    def _after_commit(self, session):
+        for key, value in session.info.pop(_PENDING_KEY, {}).items():
+            self.memory.set(key, value)
+
+    def _after_rollback(self, session):
+        session.info.pop(_PENDING_KEY, None)
+
+    def get(self, order_id):
+        """Details for one order, or None if the order does not exist"""
+        return self.get_many([order_id]).get(str(order_id))
+
+    def get_many(self, order_ids):
+        """Details for several orders as {str(order_id): details}, touching each tier once"""
+        return self._lookup(order_ids, remember=True)
+
+    def _lookup(self, order_ids, remember):
+        """
+        Details from the first tier that has them
+
+        Args:
+            order_ids: Order IDs to look up
+            remember: Keep what the backend and the orders tables return in
+                      memory; off while the caller's transaction has
+                      uncommitted changes to these orders
+        """
+        keys = [str(order_id) for order_id in order_ids]
+        found = {}
+        missing = []
+
+        for key in keys:
+            value = self.memory.get(key)
+            if value is None:
+                missing.append(key)
+            else:
+                found[key] = value
+        self.hits += len(found)
+        metrics.cache_lookup('order_details_memory', hits=len(found), misses=len(missing))
+
+        if missing and self.backend is not None:
+            stored = self.backend.get_many(missing)
+            for key, value in stored.items():
+                key = str(key)
+                if remember:
+                    self.memory.set(key, value)
+                found[key] = value
+            self.hits += len(stored)
+            missing = [key for key in missing if key not in found]
+            metrics.cache_lookup('order_details_backend', hits=len(stored), misses=len(missing))
+
+        if missing:
+            self.misses += len(missing)
+            loaded = {str(order_id): details
+                      for order_id, details in load_order_details(missing).items()}
+            if remember:
+                for key, value in loaded.items():
+                    self.memory.set(key, value)
+            found.update(loaded)
+
+        return found
+
+    def put(self, order_id, details):
+        """Store details for one order"""
+        self.put_many({order_id: details})
+
+    def put_many(self, details_by_order_id):
+        """Store details for several orders: the backend now, memory once the transaction commits"""
+        values = {str(order_id): details for order_id, details in details_by_order_id.items()}
+        if not values:
+            return
+        if self.backend is not None:
+            self.backend.set_many(values)
+        db.session.info.setdefault(_PENDING_KEY, {}).update(values)
+
+    def update_many(self, order_ids, **fields):
+        """Change fields (e.g. status) on cached details for several orders"""
+        # Copies, so the dicts held by the in-memory tier keep their committed values
+        details = {key: dict(value, **fields)
+                   for key, value in self._lookup(order_ids, remember=False).items()}
+        self.put_many(details)
+        return details
+
+    def update(self, order_id, **fields):
+        """Change fields on the cached details of one order"""
+        return self.update_many([order_id], **fields).get(str(order_id))
+
+    def invalidate(self, order_id):
+        """Drop an order from the in-memory tier"""
+        self.memory.delete(str(order_id))
+
+
+# Shared cache used by the views
+order_cache = OrderDetailsCache()
@@ -0,0 +1,217 @@
+import json
+import threading
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from app import db
+from models import StoredCart
+from catalog import catalog
+
+
+class Cart:
+    """
+    A customer's cart: product_id -> quantity, with running totals
+
+    Only product IDs and quantities are stored; names, prices and weights
+    come from the product catalog. Totals are adjusted by each change rather
+    than re-summed over every line, and remember the catalog version they
+    were priced at: once the catalog has moved on, reprice() re-sums them
+    from the current prices.
+    """
+
+    def __init__(self, user_id, lines=None, total_price=0.0, total_weight=0.0, catalog_version=None):
+        self.user_id = user_id
+        self.lines = dict(lines or {})
+        self.total_price = total_price
+        self.total_weight = total_weight
+        self.catalog_version = catalog_version
+
+    def __len__(self):
+        return len(self.lines)
+
+    def __bool__(self):
+        return bool(self.lines)
+
+    def quantity(self, product_id):
+        return self.lines.get(product_id, 0)
+
+    def set_quantity(self, product, quantity):
+        """
+        Set a line's quantity (0 removes it) and adjust the totals
+
+        Args:
+            product: ProductInfo of the line's product
+            quantity: New quantity
+        """
+        delta = quantity - self.lines.get(product.product_id, 0)
+        if quantity > 0:
+            self.lines[product.product_id] = quantity
+        else:
+            self.lines.pop(product.product_id, None)
+
+        self.total_price = round(self.total_price + delta * product.price, 2)
+        self.total_weight = round(self.total_weight + delta * product.weight, 3)
+        if not self.lines:
+            self.total_price = self.total_weight = 0.0
+
+    def add(self, product, quantity):
+        """Add to a line's quantity"""
+        self.set_quantity(product, self.lines.get(product.product_id, 0) + quantity)
+
+    def reprice(self, snapshot):
+        """
+        Re-sum the totals from current prices if the catalog changed since they were computed
+
+        Args:
+            snapshot: Current CatalogSnapshot
+        """
+        if self.catalog_version == snapshot.version:
+            return
+        products = snapshot.by_id
+        priced = [(products[product_id], quantity) for product_id, quantity in self.lines.items()
+                  if product_id in products]
+        self.total_price = round(sum(product.price * quantity for product, quantity in priced), 2)
+        self.total_weight = round(sum(product.weight * quantity for product, quantity in priced), 3)
+        self.catalog_version = snapshot.version
+
+    def clear(self):
+        self.lines = {}
+        self.total_price = self.total_weight = 0.0
+
+    def items(self, catalog):
+        """
+        Cart lines with product details for display and checkout
+
+        Args:
+            catalog: ProductCatalog to read product details from
+
+        Returns:
+            List of dictionaries with product_id, name, price, weight and quantity
+        """
+        products = catalog.get_many(self.lines)
+        return [
+            {
+                'product_id': product_id,
+                'name': products[product_id].name,
+                'price': products[product_id].price,
+                'weight': products[product_id].weight,
+                'quantity': quantity
+            }
+            for product_id, quantity in self.lines.items()
+            if product_id in products
+        ]
+
+
+class MemoryCartStore:
+    """
+    Carts in this process's memory
+
+    Fast, but carts are lost on restart and not shared between worker
+    processes; use it for a single-process deployment or development.
+    A save with commit=False is held in the session and applied only when
+    the caller's transaction commits, like a database cart.
+    """
+
+    def __init__(self):
+        self._carts = {}
+        self._lock = threading.Lock()
+        self._pending_key = f'memory_carts_{id(self)}'
+        event.listen(Session, 'after_commit', self._after_commit)
+        event.listen(Session, 'after_rollback', self._after_rollback)
+
+    def _after_commit(self, session):
+        for cart in session.info.pop(self._pending_key, {}).values():
+            self._store(cart)
+
+    def _after_rollback(self, session):
+        session.info.pop(self._pending_key, None)
+
+    def load(self, user_id):
+        with self._lock:
+            cart = self._carts.get(user_id)
+            if cart is None:
+                return Cart(user_id)
+            return Cart(user_id, cart.lines, cart.total_price, cart.total_weight, cart.catalog_version)
+
+    def save(self, cart, commit=True):
+        if commit:
+            self._store(cart)
+        else:
+            copy = Cart(cart.user_id, cart.lines, cart.total_price, cart.total_weight, cart.catalog_version)
+            db.session.info.setdefault(self._pending_key, {})[cart.user_id] = copy
+
+    def _store(self, cart):
+        with self._lock:
+            if cart:
+                self._carts[cart.user_id] = Cart(cart.user_id, cart.lines, cart.total_price, cart.total_weight,
+                                                 cart.catalog_version)
+            else:
+                self._carts.pop(cart.user_id, None)
+
+
+class DatabaseCartStore:
+    """Carts as one row per customer in the carts table, committed immediately unless commit=False"""
+
+    def load(self, user_id):
+        stored = db.session.get(StoredCart, user_id)
+        if stored is None:
+            return Cart(user_id)
+        lines = {int(product_id): quantity for product_id, quantity in json.loads(stored.lines).items()}
+        return Cart(user_id, lines, stored.total_price, stored.total_weight, stored.catalog_version)
+
+    def save(self, cart, commit=True):
+        stored = db.session.get(StoredCart, cart.user_id)
+        if not cart:
+            if stored is not None:
+                db.session.delete(stored)
+        else:
+            if stored is None:
+                stored = StoredCart(user_id=cart.user_id)
+                db.session.add(stored)
+            stored.lines = json.dumps(cart.lines)
+            stored.total_price = cart.total_price
+            stored.total_weight = cart.total_weight
+            stored.catalog_version = cart.catalog_version
+        if commit:
+            db.session.commit()
+
+
+class CartStore:
+    """Server-side cart storage keyed by user ID, with a pluggable backend"""
+
+    BACKENDS = ('database', 'memory')
+
+    def __init__(self, backend=None):
+        self.backend = backend or DatabaseCartStore()
+
+    def init_app(self, app):
+        """Choose the backend from CART_STORE ('database' or 'memory')"""
+        backend = app.config.get('CART_STORE', 'database')
+        if backend not in self.BACKENDS:
+            raise ValueError(f"Unknown cart store: {backend}")
+        self.backend = MemoryCartStore() if backend == 'memory' else DatabaseCartStore()
+
+    def get(self, user_id):
+        """The user's cart (empty if they have none), with totals at current catalog prices"""
+        cart = self.backend.load(user_id)
+        if cart:
+            cart.reprice(catalog.snapshot())
+        return cart
+
+    def save(self, cart):
+        """Store a changed cart; empty carts are deleted"""
+        self.backend.save(cart)
+
+    def clear(self, user_id, commit=True):
+        """
+        Empty the user's cart
+
+        Args:
+            user_id: Customer whose cart to empty
+            commit: Commit at once; False leaves it to the caller's transaction
+                    (checkout empties the cart together with placing the order)
+        """
+        self.backend.save(Cart(user_id), commit=commit)
+
+
+# Shared store used by the customer views
+cart_store = CartStore()
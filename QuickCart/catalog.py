@@ -0,0 +1,186 @@
+import threading
+import time
+from bisect import bisect_right
+from collections import namedtuple
+from types import MappingProxyType
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from app import db
+from models import Product, CatalogVersion
+from metrics import metrics
+
+# Immutable view of a product row
+ProductInfo = namedtuple('ProductInfo', ['product_id', 'name', 'description', 'price', 'weight'])
+
+# Seconds between checks of the shared version stamp; other workers' catalog
+# changes show up within this interval
+VERSION_CHECK_INTERVAL = 5
+
+# Product columns shown to customers; changing one of them bumps the catalog version.
+# Stock is left out of the snapshot altogether so checkouts don't invalidate the
+# catalog on every order; checkout reads it live.
+DETAIL_COLUMNS = ('name', 'description', 'price', 'weight')
+
+_SESSION_KEY = 'catalog_changed'
+
+
+class CatalogSnapshot:
+    """
+    Immutable copy of the product table at one catalog version
+
+    Rendered product grid pages are memoised on the snapshot, so they are
+    thrown away together with it when the version changes.
+    """
+
+    def __init__(self, version, products):
+        self.version = version
+        self.products = tuple(products)
+        self.by_id = MappingProxyType({product.product_id: product for product in self.products})
+        self._ids = [product.product_id for product in self.products]
+        self._fragments = {}
+
+    def _start(self, after):
+        return bisect_right(self._ids, after) if after is not None else 0
+
+    def page(self, after=None, limit=20):
+        """
+        One page of products ordered by product_id
+
+        Args:
+            after: Last product_id of the previous page, or None for the first page
+            limit: Page size
+
+        Returns:
+            (products, next_after) where next_after is None on the last page
+        """
+        start = self._start(after)
+        products = self.products[start:start + limit]
+        next_after = products[-1].product_id if start + limit < len(self.products) else None
+        return products, next_after
+
+    def fragment(self, after, limit, render):
+        """
+        Rendered HTML for a page of products, rendered once per snapshot
+
+        Args:
+            after: Last product_id of the previous page, or None
+            limit: Page size
+            render: Function rendering a list of products to HTML
+
+        Returns:
+            The rendered fragment
+        """
+        # Key on the page's start position so arbitrary `after` values share entries
+        key = (self._start(after), limit)
+        html = self._fragments.get(key)
+        if html is None:
+            html = self._fragments[key] = render(self.page(after, limit)[0])
+        return html
+
+
+class ProductCatalog:
+    """
+    In-process product catalog, refreshed when the shared version stamp changes
+
+    Every process keeps an immutable snapshot of the product table and
+    reads the catalog_version row at most once per check interval; commits
+    that change product details bump that row, so all workers reload within
+    the interval (the committing process reloads immediately). Between
+    checks, catalog lookups make no database round trips.
+    """
+
+    def __init__(self, check_interval=VERSION_CHECK_INTERVAL):
+        self.check_interval = check_interval
+        self._snapshot = None
+        self._checked_at = None
+        self._lock = threading.Lock()
+        self._installed = False
+
+    def snapshot(self):
+        """The current CatalogSnapshot"""
+        with self._lock:
+            now = time.monotonic()
+            if self._snapshot is not None and now - self._checked_at <= self.check_interval:
+                metrics.cache_lookup('catalog', hits=1)
+                return self._snapshot
+
+            version = db.session.execute(
+                db.select(CatalogVersion.version).where(CatalogVersion.id == 1)
+            ).scalar() or 0
+            if self._snapshot is None or self._snapshot.version != version:
+                metrics.cache_lookup('catalog', misses=1)
+                rows = db.session.execute(
+                    db.select(Product.product_id, Product.name, Product.description,
+                              Product.price, Product.weight)
+                    .order_by(Product.product_id)
+                ).all()
+                self._snapshot = CatalogSnapshot(version, (ProductInfo(*row) for row in rows))
+            else:
+                metrics.cache_lookup('catalog', hits=1)
+            self._checked_at = now
+            return self._snapshot
+
+    def invalidate(self):
+        """Force a reload from the database on next use"""
+        with self._lock:
+            self._snapshot = None
+
+    def get(self, product_id):
+        """ProductInfo for a product ID, or None"""
+        return self.snapshot().by_id.get(product_id)
+
+    def get_many(self, product_ids):
+        """{product_id: ProductInfo} for the IDs that exist"""
+        products = self.snapshot().by_id
+        return {product_id: products[product_id] for product_id in product_ids if product_id in products}
+
+    def page(self, after=None, limit=20):
+        """One page of products; see CatalogSnapshot.page"""
+        return self.snapshot().page(after, limit)
+
+    def bump_version(self, connection=None):
+        """
+        Mark the catalog as changed for every worker
+
+        Runs in the caller's transaction. The ORM hook calls this on its own;
+        code changing products with Core statements calls it directly and
+        should invalidate() this process's copy after committing.
+        """
+        statement = db.update(CatalogVersion).where(CatalogVersion.id == 1)\
+                      .values(version=CatalogVersion.version + 1)
+        (connection or db.session).execute(statement)
+
+    def install(self):
+        """Register the session listeners that bump the version (once per process)"""
+        if self._installed:
+            return
+        event.listen(Session, 'after_flush', self._after_flush)
+        event.listen(Session, 'after_commit', self._after_commit)
+        event.listen(Session, 'after_rollback', self._after_rollback)
+        self._installed = True
+
+    def _after_flush(self, session, flush_context):
+        changed = any(isinstance(instance, Product) for instance in session.new) or \
+                  any(isinstance(instance, Product) for instance in session.deleted)
+        if not changed:
+            for instance in session.dirty:
+                if isinstance(instance, Product):
+                    attrs = inspect(instance).attrs
+                    if any(attrs[column].history.has_changes() for column in DETAIL_COLUMNS):
+                        changed = True
+                        break
+
+        if changed and not session.info.get(_SESSION_KEY):
+            self.bump_version(session.connection())
+            session.info[_SESSION_KEY] = True
+
+    def _after_commit(self, session):
+        if session.info.pop(_SESSION_KEY, None):
+            self.invalidate()
+
+    def _after_rollback(self, session):
+        session.info.pop(_SESSION_KEY, None)
+
+
+# Shared catalog used by the customer views
+catalog = ProductCatalog()
@@ -0,0 +1,140 @@
+from app import db
+from models import Order, OrderItem, Product
+from cache import order_cache
+from cart import cart_store
+
+
+class CheckoutError(Exception):
+    """The cart can't be ordered as it is; `problems` lists one message per bad line"""
+
+    def __init__(self, problems):
+        super().__init__('; '.join(problems))
+        self.problems = problems
+
+
+def _lock_stock(lines):
+    """
+    Take the ordered quantities off stock with one conditional UPDATE
+
+    Each product is only decremented while it still has enough stock, so two
+    checkouts racing for the last units can't both succeed; the loser sees
+    fewer rows updated than it has lines. No table locks are taken.
+
+    Returns:
+        True if every line was decremented
+    """
+    quantity = db.case(lines, value=Product.product_id)
+    result = db.session.execute(
+        db.update(Product)
+        .where(Product.product_id.in_(list(lines)), Product.stock >= quantity)
+        .values(stock=Product.stock - quantity)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == len(lines)
+
+
+def checkout_cart(user_id, lines, address, premium_member, delivery_type, coordinates=(None, None)):
+    """
+    Create an order for a cart in a single transaction
+
+    Stock for all lines is checked with one query, the items are bulk
+    inserted, stock is decremented atomically, the order details are
+    written through to the order cache and the customer's cart is emptied,
+    all committed together. Prices and weights come from the products
+    table, not the cached catalog.
+
+    Args:
+        user_id: Customer placing the order
+        lines: {product_id: quantity}
+        address: Delivery address
+        premium_member: Whether the customer is a premium member
+        delivery_type: 'express' or 'standard'
+        coordinates: (lat, lng) of the address, geocoded by the caller
+
+    Returns:
+        Order details dictionary, as stored in the order cache
+
+    Raises:
+        CheckoutError: A product is missing or out of stock (nothing is written
+                       and the cart is kept)
+    """
+    lines = {int(product_id): quantity for product_id, quantity in lines.items() if quantity > 0}
+    if not lines:
+        raise CheckoutError(['Your cart is empty'])
+
+    products = {row.product_id: row for row in db.session.execute(
+        db.select(Product.product_id, Product.name, Product.price, Product.weight, Product.stock)
+        .where(Product.product_id.in_(list(lines)))
+    )}
+
+    problems = []
+    for product_id, quantity in lines.items():
+        product = products.get(product_id)
+        if product is None:
+            problems.append(f'Product {product_id} is no longer available')
+        elif product.stock < quantity:
+            problems.append(f'Only {product.stock} {product.name} left in stock')
+    if problems:
+        raise CheckoutError(problems)
+
+    total_price = round(sum(products[product_id].price * quantity for product_id, quantity in lines.items()), 2)
+    total_weight = round(sum(products[product_id].weight * quantity for product_id, quantity in lines.items()), 3)
+
+    order_id = None
+    try:
+        order = Order(
+            user_id=user_id,
+            address=address,
+            premium_member=premium_member,
+            delivery_type=delivery_type,
+            total_price=total_price,
+            total_weight=total_weight,
+            status='pending',
+            lat=coordinates[0],
+            lng=coordinates[1]
+        )
+        db.session.add(order)
+        db.session.flush()  # To get the order ID
+        order_id = order.order_id
+
+        items = [{
+            'order_id': order.order_id,
+            'product_id': product_id,
+            'quantity': quantity,
+            'price': products[product_id].price
+        } for product_id, quantity in lines.items()]
+        db.session.execute(db.insert(OrderItem), items)
+
+        if not _lock_stock(lines):
+            # Another checkout took the stock between the check and the update
+            raise CheckoutError(['Some items sold out while you were checking out'])
+
+        order_details = {
+            'order_id': order.order_id,
+            'user_id': order.user_id,
+            'address': order.address,
+            'premium_member': order.premium_member,
+            'delivery_type': order.delivery_type,
+            'total_price': order.total_price,
+            'total_weight': order.total_weight,
+            'status': order.status,
+            'created_at': order.created_at.isoformat(),
+            'items': [{
+                'product_id': str(item['product_id']),
+                'name': products[item['product_id']].name,
+                'quantity': item['quantity'],
+                'price': item['price']
+            } for item in items]
+        }
+        order_cache.put(order.order_id, order_details)
+        cart_store.clear(user_id, commit=False)
+
+        # The dispatch queue, spatial index and optimizers follow via the status change hook
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        if order_id is not None:
+            order_cache.invalidate(order_id)
+        raise
+
+    return order_details
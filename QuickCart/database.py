@@ -1,8 +1,94 @@
 from app import db
-from models import User, Product, Order, OrderItem
+from models import User, Product, Order, OrderItem, Vehicle, CatalogVersion, OrderVersion, HashTable
 from werkzeug.security import generate_password_hash
+from sqlalchemy import inspect, text
+import click
 import logging
 
+# Indexes earlier versions created that no query needs any more, by table
+OBSOLETE_INDEXES = {
+    'orders': ('ix_orders_status',),  # covered by ix_orders_status_created_at
+}
+
+def init_database():
+    """Create missing tables, apply schema upgrades and add the sample data; safe to re-run"""
+    db.create_all()
+    
+    # Add columns that are missing from tables created by older versions
+    upgrade_schema()
+    remove_legacy_cache_rows()
+    backfill_order_coordinates()
+    
+    # Initialize database with sample data if needed
+    init_db()
+
+def register_commands(app):
+    """Add the database CLI commands to the app"""
+    @app.cli.command('init-db')
+    def init_db_command():
+        """Create or upgrade the database schema and load the sample data"""
+        init_database()
+        click.echo('Database initialized')
+
+def upgrade_schema():
+    """Add columns and indexes introduced after a table was first created (create_all only creates missing tables)"""
+    inspector = inspect(db.engine)
+    
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            if not column.nullable and column.server_default is None:
+                logging.warning("Cannot add NOT NULL column %s.%s automatically", table.name, column.name)
+                continue
+            
+            column_type = column.type.compile(dialect=db.engine.dialect)
+            with db.engine.begin() as connection:
+                connection.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+            logging.info("Added column %s.%s", table.name, column.name)
+        
+        # Indexes declared on the models are also only created with new tables
+        existing_indexes = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing_indexes:
+                index.create(db.engine, checkfirst=True)
+                logging.info("Created index %s", index.name)
+        
+        # Extra indexes only cost writes
+        for name in OBSOLETE_INDEXES.get(table.name, ()):
+            if name in existing_indexes:
+                with db.engine.begin() as connection:
+                    connection.execute(text(f'DROP INDEX {name}'))
+                logging.info("Dropped index %s", name)
+
+def remove_legacy_cache_rows():
+    """
+    Delete the bucket_N rows of the old chained hash table from the order cache table
+
+    The cache is now keyed by order ID, so those rows are never read. The
+    old next_id column stays: it is nullable and unused, and SQLite can't
+    drop a foreign-key column without rebuilding the whole table.
+    """
+    removed = db.session.execute(
+        db.delete(HashTable).where(HashTable.key.like('bucket%'))
+    ).rowcount
+    db.session.commit()
+    if removed:
+        logging.info("Removed %d legacy order cache rows", removed)
+
+def backfill_order_coordinates():
+    """Geocode orders that were placed before coordinates were stored"""
+    from geocoding import ensure_coordinates
+    
+    orders = Order.query.filter(db.or_(Order.lat.is_(None), Order.lng.is_(None))).all()
+    if ensure_coordinates(orders):
+        db.session.commit()
+        logging.info("Stored coordinates for %d existing orders", len(orders))
+
 def init_db():
     """Initialize the database with sample data if it's empty"""
     if User.query.count() == 0:
@@ -15,6 +101,20 @@ def init_db():
         create_sample_products()
         
         logging.info("Database initialization complete!")
+    
+    # Vehicles were added later, so older databases may have users but no fleet
+    if Vehicle.query.count() == 0:
+        create_sample_vehicles()
+    
+    # The catalog version stamp that product caches compare against
+    if db.session.get(CatalogVersion, 1) is None:
+        db.session.add(CatalogVersion(id=1, version=1))
+        db.session.commit()
+    
+    # The order version stamp that live dashboards compare against
+    if db.session.get(OrderVersion, 1) is None:
+        db.session.add(OrderVersion(id=1, version=1))
+        db.session.commit()
 
 def create_sample_users():
     """Create sample users for testing"""
@@ -123,3 +223,19 @@ def create_sample_products():
     
     db.session.commit()
     logging.info("Sample products created")
+
+def create_sample_vehicles():
+    """Create the sample delivery fleet"""
+    vehicles = [
+        {'name': 'Truck 1', 'capacity': 100},
+        {'name': 'Truck 2', 'capacity': 100},
+        {'name': 'Van 1', 'capacity': 60},
+        {'name': 'Van 2', 'capacity': 60},
+        {'name': 'Bike 1', 'capacity': 15}
+    ]
+    
+    for vehicle_data in vehicles:
+        db.session.add(Vehicle(**vehicle_data))
+    
+    db.session.commit()
+    logging.info("Sample vehicles created")
@@ -0,0 +1,191 @@
+import heapq
+import threading
+from bisect import bisect_left, insort
+
+
+def urgency_key(order):
+    """
+    Composite urgency of an order, smallest first
+
+    Express before standard, premium before regular within the same delivery
+    type, then oldest first. The order ID breaks remaining ties so keys are
+    unique.
+
+    Args:
+        order: Order dictionary with 'delivery_type', 'premium_member',
+               'created_at' (ISO string) and 'order_id'
+
+    Returns:
+        Tuple usable as a heap key
+    """
+    return (
+        0 if order['delivery_type'] == 'express' else 1,
+        0 if order['premium_member'] else 1,
+        order['created_at'],
+        order['order_id'],
+    )
+
+
+class DispatchQueue:
+    """
+    Priority queue of orders keyed by precomputed urgency
+
+    Push, removal and pop-next are O(log n); removals and re-prioritised
+    orders leave stale heap entries behind that are skipped lazily and
+    compacted once they outnumber the live ones. An optional ordered snapshot
+    is kept up to date with binary-search inserts and deletes, so reading the
+    whole backlog in order never needs a full re-sort.
+    """
+
+    def __init__(self, keep_snapshot=True):
+        self.keep_snapshot = keep_snapshot
+        self._heap = []
+        self._entries = {}
+        self._snapshot = [] if keep_snapshot else None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, order_id):
+        return order_id in self._entries
+
+    def load(self, orders):
+        """Replace the queue contents in O(n) (plus one sort for the snapshot)"""
+        self._entries = {order['order_id']: (urgency_key(order), order) for order in orders}
+        self._heap = [(key, order_id) for order_id, (key, _) in self._entries.items()]
+        heapq.heapify(self._heap)
+        if self.keep_snapshot:
+            self._snapshot = sorted(self._heap)
+
+    def push(self, order):
+        """Add an order, or re-prioritise it if it is already queued"""
+        order_id = order['order_id']
+        self.remove(order_id)
+
+        key = urgency_key(order)
+        self._entries[order_id] = (key, order)
+        heapq.heappush(self._heap, (key, order_id))
+        if self._snapshot is not None:
+            insort(self._snapshot, (key, order_id))
+
+    def remove(self, order_id):
+        """Drop an order (e.g. it left the pending status); returns it or None"""
+        entry = self._entries.pop(order_id, None)
+        if entry is None:
+            return None
+
+        key, order = entry
+        if self._snapshot is not None:
+            position = bisect_left(self._snapshot, (key, order_id))
+            if position < len(self._snapshot) and self._snapshot[position] == (key, order_id):
+                del self._snapshot[position]
+
+        # The heap entry stays behind; rebuild once stale entries dominate
+        if len(self._heap) > 2 * len(self._entries) + 32:
+            self._heap = [(key, oid) for oid, (key, _) in self._entries.items()]
+            heapq.heapify(self._heap)
+        return order
+
+    def _discard_stale(self):
+        while self._heap:
+            key, order_id = self._heap[0]
+            entry = self._entries.get(order_id)
+            if entry is not None and entry[0] == key:
+                return
+            heapq.heappop(self._heap)
+
+    def peek(self):
+        """Most urgent order without removing it, or None"""
+        self._discard_stale()
+        if not self._heap:
+            return None
+        return self._entries[self._heap[0][1]][1]
+
+    def pop_next(self):
+        """Remove and return the most urgent order, or None"""
+        self._discard_stale()
+        if not self._heap:
+            return None
+        _, order_id = self._heap[0]
+        return self.remove(order_id)
+
+    def snapshot(self):
+        """All queued orders, most urgent first"""
+        if self._snapshot is None:
+            keys = sorted((key, order_id) for order_id, (key, _) in self._entries.items())
+        else:
+            keys = self._snapshot
+        return [self._entries[order_id][1] for _, order_id in keys]
+
+
+# Order fields kept in the queue and shown on the order optimization page
+QUEUE_FIELDS = ('order_id', 'user_id', 'address', 'premium_member', 'delivery_type',
+                'total_price', 'total_weight', 'created_at')
+
+
+class PendingDispatchQueue:
+    """
+    Process-wide dispatch queue of pending orders
+
+    Loaded from the database on first use and kept in step by the Order.status
+    change hook. Before each use the shared order version stamp is read (one
+    primary-key lookup): if a version this process didn't apply has been
+    committed since the load, another worker changed orders and the queue is
+    reloaded.
+    """
+
+    def __init__(self):
+        self._queue = DispatchQueue()
+        self._version = None  # order version the queue is known to reflect
+        self._local_versions = set()  # versions applied by the change hook since then
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def _ensure_loaded(self):
+        from order_events import order_events
+        from repository import optimizer_orders
+
+        # Read before loading: a change committed during the load shows up as newer next time
+        version = order_events.current_version()
+        current = (self._loaded and version is not None and self._version is not None and all(
+            applied in self._local_versions for applied in range(self._version + 1, version + 1)))
+        if not current:
+            self._queue.load(optimizer_orders('pending'))
+            self._loaded = True
+        self._version = version
+        self._local_versions = {applied for applied in self._local_versions
+                                if version is None or applied > version}
+
+    def invalidate(self):
+        """Force a reload from the database on next use"""
+        with self._lock:
+            self._loaded = False
+
+    def handle_status_changes(self, changes):
+        """Apply committed status changes (order_events subscriber)"""
+        with self._lock:
+            if not self._loaded:
+                return
+            for change in changes:
+                if change.new_status == 'pending':
+                    self._queue.push({key: change.order[key] for key in QUEUE_FIELDS})
+                else:
+                    self._queue.remove(change.order_id)
+                if change.version is not None:
+                    self._local_versions.add(change.version)
+
+    def snapshot(self):
+        """Pending orders, most urgent first"""
+        with self._lock:
+            self._ensure_loaded()
+            return self._queue.snapshot()
+
+    def pop_next(self):
+        """Take the most urgent pending order off the queue"""
+        with self._lock:
+            self._ensure_loaded()
+            return self._queue.pop_next()
+
+
+# Shared queue used by the delivery views
+dispatch_queue = PendingDispatchQueue()
@@ -0,0 +1,169 @@
+import hashlib
+import logging
+import re
+import threading
+from collections import OrderedDict
+
+# Warehouse location (Karur, Tamil Nadu); unknown addresses are placed around it
+WAREHOUSE_LAT = 10.9601
+WAREHOUSE_LNG = 78.0766
+
+# Known places for the offline geocoder: name -> (lat, lng)
+GAZETTEER = {
+    'karur': (10.9601, 78.0766),
+    'kulithalai': (10.9357, 78.4241),
+    'aravakurichi': (10.7746, 77.9076),
+    'namakkal': (11.2189, 78.1674),
+    'erode': (11.3410, 77.7172),
+    'dindigul': (10.3673, 77.9803),
+    'tiruchirappalli': (10.7905, 78.7047),
+    'trichy': (10.7905, 78.7047),
+    'salem': (11.6643, 78.1460),
+    'tiruppur': (11.1085, 77.3411),
+    'coimbatore': (11.0168, 76.9558),
+    'madurai': (9.9252, 78.1198),
+    'thanjavur': (10.7870, 79.1378),
+    'vellore': (12.9165, 79.1325),
+    'tirunelveli': (8.7139, 77.7567),
+    'chennai': (13.0827, 80.2707),
+}
+
+
+def normalize_address(address):
+    """Lower-case an address and collapse punctuation and whitespace"""
+    return ' '.join(re.sub(r'[^a-z0-9]+', ' ', (address or '').lower()).split())
+
+
+def _stable_offsets(text):
+    """Two deterministic values in [-1, 1) derived from the text"""
+    digest = hashlib.sha1(text.encode('utf-8')).digest()
+    first = int.from_bytes(digest[:4], 'big') / 2**32
+    second = int.from_bytes(digest[4:8], 'big') / 2**32
+    return first * 2 - 1, second * 2 - 1
+
+
+class Geocoder:
+    """Base class for geocoders; subclasses turn an address into (lat, lng)"""
+
+    def geocode(self, address):
+        """
+        Look up the coordinates of an address
+
+        Args:
+            address: Free-form delivery address
+
+        Returns:
+            (lat, lng) tuple, or None if the address cannot be located
+        """
+        raise NotImplementedError
+
+
+class OfflineGeocoder(Geocoder):
+    """
+    Local stand-in geocoder that needs no network access
+
+    Addresses naming a known town are placed in that town, spread by a few
+    kilometres so different streets don't collapse onto one point. Anything
+    else lands within ~10 km of the warehouse. The same address always maps
+    to the same coordinates.
+    """
+
+    def __init__(self, gazetteer=None, town_spread=0.02, default_spread=0.1):
+        self.gazetteer = gazetteer if gazetteer is not None else GAZETTEER
+        self.town_spread = town_spread
+        self.default_spread = default_spread
+
+    def geocode(self, address):
+        normalized = normalize_address(address)
+        if not normalized:
+            return None
+
+        lat_offset, lng_offset = _stable_offsets(normalized)
+        words = normalized.split()
+
+        # Prefer the last place mentioned, since addresses end with the town
+        for word in reversed(words):
+            if word in self.gazetteer:
+                lat, lng = self.gazetteer[word]
+                if normalized == word:
+                    return lat, lng
+                return lat + lat_offset * self.town_spread, lng + lng_offset * self.town_spread
+
+        return (WAREHOUSE_LAT + lat_offset * self.default_spread,
+                WAREHOUSE_LNG + lng_offset * self.default_spread)
+
+
+class CachingGeocoder(Geocoder):
+    """Wraps another geocoder with an in-process LRU cache of results"""
+
+    def __init__(self, geocoder, max_entries=10000):
+        self.geocoder = geocoder
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def geocode(self, address):
+        key = normalize_address(address)
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return self._cache[key]
+
+        result = self.geocoder.geocode(address)
+
+        with self._lock:
+            self.misses += 1
+            self._cache[key] = result
+            if len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+        return result
+
+
+# Geocoder used by the application; swap it with set_geocoder()
+geocoder = CachingGeocoder(OfflineGeocoder())
+
+
+def set_geocoder(new_geocoder, cache=True):
+    """
+    Replace the application geocoder
+
+    Args:
+        new_geocoder: Geocoder instance to use from now on
+        cache: Wrap it in a CachingGeocoder
+    """
+    global geocoder
+    geocoder = CachingGeocoder(new_geocoder) if cache else new_geocoder
+
+
+def geocode_address(address):
+    """Coordinates for an address using the application geocoder"""
+    try:
+        return geocoder.geocode(address)
+    except Exception:
+        logging.exception("Geocoding failed for address %r", address)
+        return None
+
+
+def ensure_coordinates(orders):
+    """
+    Fill in missing coordinates on Order objects, e.g. rows created before geocoding
+
+    The caller is responsible for committing the session.
+
+    Args:
+        orders: Iterable of Order objects
+
+    Returns:
+        Number of orders that were geocoded
+    """
+    updated = 0
+    for order in orders:
+        if order.lat is None or order.lng is None:
+            coordinates = geocode_address(order.address)
+            if coordinates:
+                order.lat, order.lng = coordinates
+                updated += 1
+    return updated
@@ -0,0 +1,50 @@
+"""
+Production serving profile: gunicorn --config gunicorn.conf.py main:app
+
+Run `flask --app main init-db` once before starting the server. Every
+setting can be overridden from the environment (or gunicorn's own
+command-line flags):
+
+    WEB_CONCURRENCY    worker processes (default: 2 x CPUs + 1, at most 8)
+    GUNICORN_THREADS   request threads per worker (default 4); the database
+                       pool of each worker is sized to match (see app.py)
+    PORT / BIND        listen address (default 0.0.0.0:5000)
+    GUNICORN_TIMEOUT   seconds before a silent worker is restarted (default 60)
+"""
+import multiprocessing
+import os
+
+from app import DEFAULT_THREADS
+
+bind = os.environ.get("BIND", f"0.0.0.0:{os.environ.get('PORT', '5000')}")
+
+# Requests mostly wait on the database, so each worker runs a few threads;
+# solver-heavy work goes to the optimization job pool (jobs.py), not here
+worker_class = "gthread"
+workers = int(os.environ.get("WEB_CONCURRENCY", min(2 * multiprocessing.cpu_count() + 1, 8)))
+threads = int(os.environ.get("GUNICORN_THREADS", DEFAULT_THREADS))
+
+# Load the app once in the master and fork workers from it: shared
+# copy-on-write memory and no per-worker import cost. Building the app
+# opens no database connections, so nothing is inherited across the fork.
+preload_app = True
+
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "60"))
+graceful_timeout = 30
+keepalive = 5
+
+# Restart workers now and then so slow leaks can't build up
+max_requests = 2000
+max_requests_jitter = 200
+
+accesslog = "-"
+errorlog = "-"
+loglevel = os.environ.get("LOG_LEVEL", "info").lower()
+
+
+def post_fork(server, worker):
+    """Drop any pooled connections copied from the master; the worker opens its own"""
+    from app import db
+    from main import app
+    with app.app_context():
+        db.engine.dispose(close=False)
@@ -0,0 +1,529 @@
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from dispatch import urgency_key
+from metrics import metrics
+
+# Results kept per worker, keyed by job kind and input fingerprint
+DEFAULT_RESULT_CACHE_SIZE = 64
+
+# Jobs with at most this many orders or stops are solved in the request itself
+DEFAULT_INLINE_MAX_SIZE = 50
+
+# Finished jobs can be polled for this long, in seconds
+DEFAULT_JOB_RETENTION = 600
+
+
+# Job functions run in pool processes, so they take and return plain data only;
+# each fills `stats` with its input size (and capacity/states where it has them).
+# The solver modules (numpy) are imported on first use rather than at start-up.
+
+def run_packing(orders, max_capacity, engine='dp', epsilon=None, stats=None):
+    """
+    Single-vehicle knapsack; returns the selected order IDs and totals
+
+    engine is 'dp' (exact, weights in 10 g steps), 'branch_and_bound'
+    (anytime, exact weights) or 'fptas' (within epsilon of the optimum).
+    The result also carries an upper bound on the best value and the
+    resulting gap, which is 0 for the DP.
+    """
+    from algorithms import knapsack, knapsack_branch_and_bound, knapsack_fptas, DEFAULT_FPTAS_EPSILON
+    if stats is not None:
+        stats.update(size=len(orders), capacity=max_capacity)
+    if engine == 'dp':
+        selected_indices, total_value = knapsack(orders, max_capacity, stats=stats)
+        upper_bound = total_value
+    elif engine == 'branch_and_bound':
+        selected_indices, total_value, upper_bound = knapsack_branch_and_bound(orders, max_capacity)
+    elif engine == 'fptas':
+        selected_indices, total_value, upper_bound = knapsack_fptas(
+            orders, max_capacity, epsilon or DEFAULT_FPTAS_EPSILON, stats=stats)
+    else:
+        raise ValueError(f"Unknown knapsack engine: {engine}")
+    selected = [orders[i] for i in selected_indices]
+    gap = (upper_bound - total_value) / upper_bound if upper_bound > 0 else 0.0
+    return {
+        'selected_order_ids': [order['order_id'] for order in selected],
+        'total_value': total_value,
+        'total_weight': sum(order['weight'] for order in selected),
+        'max_capacity': max_capacity,
+        'engine': engine,
+        'upper_bound': upper_bound,
+        'gap': gap,
+        'optimal': gap <= 1e-9,
+    }
+
+
+def run_fleet_packing(orders, vehicles, strategy, stats=None):
+    """Multi-vehicle packing with pack_fleet"""
+    from packing import pack_fleet
+    if stats is not None:
+        stats.update(size=len(orders), capacity=sum(float(vehicle['capacity']) for vehicle in vehicles))
+    return pack_fleet(orders, vehicles, strategy=strategy)
+
+
+def run_routing(distances, method, stats=None):
+    """Route over a distance matrix with solve_route"""
+    from routing import solve_route
+    if stats is not None:
+        stats['size'] = len(distances)
+    return solve_route(distances, method=method)
+
+
+def run_vehicle_routing(orders, vehicles, distances, time_windows, stats=None):
+    """Capacitated multi-trip routing of the whole fleet with solve_vrp"""
+    from vrp import solve_vrp
+    if stats is not None:
+        stats.update(size=len(orders), capacity=sum(float(vehicle['capacity']) for vehicle in vehicles))
+    return solve_vrp(orders, vehicles, distances, time_windows=time_windows)
+
+
+def run_prioritisation(orders, stats=None):
+    """Orders most urgent first, by the dispatch queue's urgency key"""
+    if stats is not None:
+        stats['size'] = len(orders)
+    return {'order_ids': [order['order_id'] for order in sorted(orders, key=urgency_key)]}
+
+
+JOB_FUNCTIONS = {
+    'packing': run_packing,
+    'fleet': run_fleet_packing,
+    'routing': run_routing,
+    'vehicle_routing': run_vehicle_routing,
+    'prioritisation': run_prioritisation,
+}
+
+
+def _run_job(kind, *args):
+    """Run a job function, timed where it runs; returns (result, stats)"""
+    stats = {}
+    started = time.perf_counter()
+    result = JOB_FUNCTIONS[kind](*args, stats=stats)
+    stats['seconds'] = time.perf_counter() - started
+    return result, stats
+
+
+def input_key(*parts):
+    """
+    Stable fingerprint of a job's inputs
+
+    Args:
+        parts: JSON-serialisable inputs (numpy arrays are hashed by their bytes)
+
+    Returns:
+        Hex digest identifying the input set
+    """
+    digest = hashlib.sha1()
+    for part in parts:
+        if hasattr(part, 'tobytes'):
+            digest.update(part.tobytes())
+        else:
+            digest.update(json.dumps(part, sort_keys=True, default=str).encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def _pool_context():
+    """
+    Start method for pool processes
+
+    The pool is created lazily from a threaded web worker, and forking a
+    process that has other threads can leave the child holding a lock no
+    thread will ever release. Pool processes therefore come from a fork
+    server (a clean single-threaded process started on first use) or, where
+    there is none, are spawned.
+    """
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('forkserver')
+    return multiprocessing.get_context('spawn')
+
+
+class InlineExecutor:
+    """Executor that runs jobs synchronously at submit time (tests, single-threaded setups)"""
+
+    def submit(self, fn, *args):
+        future = Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as error:
+            future.set_exception(error)
+        return future
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        pass
+
+
+class GatheredFuture(Future):
+    """
+    Future over several part futures, resolved with their combined result
+
+    Stands in for a single pool future: it is running once any part has
+    started, cancelling it cancels the parts still queued, and the first
+    part to fail fails it. The stats reported with the result time the
+    whole job, from submission until the last part finished.
+    """
+
+    def __init__(self, parts, combine, size=None):
+        super().__init__()
+        self.parts = parts
+        self._combine = combine
+        self._size = size
+        self._started = time.perf_counter()
+        self._remaining = len(parts)
+        self._parts_lock = threading.Lock()
+        for part in parts:
+            part.add_done_callback(self._part_done)
+        if not parts:
+            self._resolve()
+
+    def running(self):
+        return not self.done() and any(part.running() or part.done() for part in self.parts)
+
+    def cancel(self):
+        # Like a pool future, a job that has started can no longer be cancelled
+        if self.running():
+            return False
+        for part in self.parts:
+            part.cancel()
+        return super().cancel()
+
+    def _part_done(self, part):
+        with self._parts_lock:
+            self._remaining -= 1
+            remaining = self._remaining
+        if self.done():
+            return
+        if not part.cancelled() and part.exception() is not None:
+            for other in self.parts:
+                other.cancel()
+            self._settle(exception=part.exception())
+        elif remaining == 0:
+            self._resolve()
+
+    def _resolve(self):
+        try:
+            result = self._combine([part.result() for part in self.parts])
+        except Exception as error:
+            self._settle(exception=error)
+            return
+        stats = {'seconds': time.perf_counter() - self._started}
+        if self._size is not None:
+            stats['size'] = self._size
+        self._settle(result=(result, stats))
+
+    def _settle(self, result=None, exception=None):
+        with self._parts_lock:
+            if self.done():
+                return
+            if exception is not None:
+                self.set_exception(exception)
+            else:
+                self.set_result(result)
+
+
+class Job:
+    """A submitted optimization job and, once finished, its result"""
+
+    def __init__(self, kind, key, future=None, result=None, cached=False):
+        self.job_id = uuid.uuid4().hex
+        self.kind = kind
+        self.key = key
+        self.future = future
+        self.cached = cached
+        self.cancelled = False
+        self.submitted_at = time.time()
+        self.finished_at = self.submitted_at if cached else None
+        self._result = result
+
+    @property
+    def status(self):
+        """'queued', 'running', 'done', 'failed' or 'cancelled'"""
+        if self.cancelled:
+            return 'cancelled'
+        if self.future is None:
+            return 'done'
+        if self.future.done():
+            if self.future.cancelled():
+                return 'cancelled'
+            return 'failed' if self.future.exception() is not None else 'done'
+        return 'running' if self.future.running() else 'queued'
+
+    @property
+    def finished(self):
+        return self.status in ('done', 'failed', 'cancelled')
+
+    @property
+    def result(self):
+        """The job's result, or None until it is done"""
+        if self.status != 'done':
+            return None
+        if self.future is not None:
+            return self.future.result()[0]
+        return self._result
+
+    @property
+    def error(self):
+        if self.status != 'failed':
+            return None
+        return str(self.future.exception())
+
+    def to_dict(self, include_result=True):
+        data = {
+            'job_id': self.job_id,
+            'kind': self.kind,
+            'status': self.status,
+            'cached': self.cached,
+            'elapsed': (self.finished_at or time.time()) - self.submitted_at,
+        }
+        if self.error:
+            data['error'] = self.error
+        if include_result and self.status == 'done':
+            data['result'] = self.result
+        return data
+
+
+class JobRunner:
+    """
+    Runs packing, routing and prioritisation jobs off the request thread
+
+    Jobs run on a process pool, so a long solve never holds a web worker,
+    and jobs that split into independent parts (route zones) spread them
+    over every pool process (OPTIMIZATION_WORKERS, two by default).
+    Results are cached by job kind and input fingerprint: submitting the
+    same inputs again returns the finished (or still running) job instead of
+    solving twice. A new input set for a kind supersedes, and cancels, the
+    previous job of that kind while it is still queued; a job that has
+    started runs to completion, since a pool process can't be interrupted.
+    Backlog changes cancel nothing by themselves: the next submit carries the
+    new input fingerprint and supersedes the stale job.
+
+    Jobs and results live in the worker process that accepted them; with
+    several web workers a poll can land on a worker that doesn't know the
+    job, which answers 404 and the client resubmits.
+    """
+
+    EXECUTORS = ('process', 'thread', 'inline')
+
+    def __init__(self, executor='process', max_workers=None, inline_max_size=DEFAULT_INLINE_MAX_SIZE,
+                 cache_size=DEFAULT_RESULT_CACHE_SIZE, retention=DEFAULT_JOB_RETENTION):
+        self.executor_type = executor
+        self.max_workers = max_workers
+        self.inline_max_size = inline_max_size
+        self.cache_size = cache_size
+        self.retention = retention
+        self._executor = None
+        self._jobs = {}
+        self._results = OrderedDict()
+        self._active = {}
+        self._latest = {}
+        self._lock = threading.RLock()
+
+    def init_app(self, app):
+        """Configure from the OPTIMIZATION_* settings"""
+        self.shutdown()
+        executor = app.config.get('OPTIMIZATION_EXECUTOR', 'process')
+        if executor not in self.EXECUTORS:
+            raise ValueError(f"Unknown optimization executor: {executor}")
+        self.executor_type = executor
+        self.max_workers = app.config.get('OPTIMIZATION_WORKERS')
+        self.inline_max_size = int(app.config.get('OPTIMIZATION_INLINE_MAX_SIZE', DEFAULT_INLINE_MAX_SIZE))
+        self.cache_size = int(app.config.get('OPTIMIZATION_RESULT_CACHE', DEFAULT_RESULT_CACHE_SIZE))
+
+    def _get_executor(self):
+        if self._executor is None:
+            if self.executor_type == 'inline':
+                self._executor = InlineExecutor()
+            elif self.executor_type == 'thread':
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers or 2)
+            else:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers or min(2, os.cpu_count() or 1),
+                    mp_context=_pool_context()
+                )
+        return self._executor
+
+    def shutdown(self):
+        """Stop the pool; queued jobs are cancelled"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def submit(self, kind, key, *args, size=None):
+        """
+        Submit a job, reusing a cached result or an identical running job
+
+        Args:
+            kind: Job kind from JOB_FUNCTIONS
+            key: Fingerprint of the inputs (see input_key)
+            args: Arguments for the job function
+            size: Number of orders or stops; jobs up to inline_max_size run
+                  at once in the calling thread, where a pool round trip
+                  would cost more than the solve
+
+        Returns:
+            The Job, which may already be done
+        """
+        if kind not in JOB_FUNCTIONS:
+            raise ValueError(f"Unknown job kind: {kind}")
+
+        return self._start(kind, key, size, lambda executor: executor.submit(_run_job, kind, *args))
+
+    def submit_parts(self, kind, key, part_kind, make_parts, combine, size=None):
+        """
+        Submit a job that splits into independent parts solved side by side on the pool
+
+        Cached results, identical running jobs and superseding work as in
+        submit(); the parts are only built when the job actually has to run.
+
+        Args:
+            kind: Name the combined job is cached and reported under
+            key: Fingerprint of the inputs (see input_key)
+            part_kind: Job kind from JOB_FUNCTIONS that solves one part
+            make_parts: Callable returning the argument tuple of every part
+            combine: Callable turning the parts' (result, stats) pairs into the result
+            size: Number of orders or stops in the whole job
+
+        Returns:
+            The Job, which may already be done
+        """
+        if part_kind not in JOB_FUNCTIONS:
+            raise ValueError(f"Unknown job kind: {part_kind}")
+
+        def launch(executor):
+            try:
+                parts = [executor.submit(_run_job, part_kind, *args) for args in make_parts()]
+            except Exception as error:
+                parts = [Future()]
+                parts[0].set_exception(error)
+            return GatheredFuture(parts, combine, size)
+
+        return self._start(kind, key, size, launch)
+
+    def _start(self, kind, key, size, launch):
+        """
+        The cached or running job for these inputs, or a new job launched on the executor
+
+        The new job gets its future before the lock is released, so a poll
+        never sees a registered job without one. Jobs small enough to run
+        inline get a placeholder future and are solved after the lock is
+        released, so other submits and polls don't wait for the solve.
+
+        Args:
+            launch: Callable taking the executor and returning the job's future
+
+        Returns:
+            The Job
+        """
+        with self._lock:
+            self._prune()
+
+            cache_key = (kind, key)
+            if cache_key in self._results:
+                metrics.cache_lookup('job_results', hits=1)
+                self._results.move_to_end(cache_key)
+                job = Job(kind, key, result=self._results[cache_key], cached=True)
+                self._jobs[job.job_id] = job
+                return job
+
+            job = self._active.get(cache_key)
+            if job is not None and not job.finished:
+                metrics.cache_lookup('job_results', hits=1)
+                return job
+            metrics.cache_lookup('job_results', misses=1)
+
+            # A different input set for this kind makes the previous job moot
+            previous = self._latest.get(kind)
+            if previous is not None and previous.key != key:
+                self._cancel(previous)
+
+            inline = size is not None and size <= self.inline_max_size
+            job = Job(kind, key, future=Future() if inline else launch(self._get_executor()))
+            self._jobs[job.job_id] = job
+            self._active[cache_key] = job
+            self._latest[kind] = job
+            job.future.add_done_callback(lambda future: self._finish(job))
+
+        # Running from here on, so a superseding job can no longer cancel it
+        if inline and job.future.set_running_or_notify_cancel():
+            solved = launch(InlineExecutor())
+            if solved.exception() is not None:
+                job.future.set_exception(solved.exception())
+            else:
+                job.future.set_result(solved.result())
+        return job
+
+    def _finish(self, job):
+        with self._lock:
+            job.finished_at = time.time()
+            self._release(job)
+            if job.status != 'done':
+                if job.status == 'failed':
+                    logging.error("Optimization job %s (%s) failed: %s", job.job_id, job.kind, job.error)
+                return
+
+            result, stats = job.future.result()
+            self._results[(job.kind, job.key)] = result
+            self._results.move_to_end((job.kind, job.key))
+            while len(self._results) > self.cache_size:
+                self._results.popitem(last=False)
+
+        metrics.observe_solver(job.kind, **stats)
+
+    def _cancel(self, job):
+        # Only queued jobs can be cancelled; one already running in a pool
+        # process finishes and its result is cached like any other
+        if job.future is not None and job.future.cancel():
+            job.cancelled = True
+            job.finished_at = time.time()
+            self._release(job)
+            return True
+        return False
+
+    def _release(self, job):
+        # A newer job for the same inputs may have taken the slot since
+        if self._active.get((job.kind, job.key)) is job:
+            del self._active[(job.kind, job.key)]
+
+    def _prune(self):
+        cutoff = time.time() - self.retention
+        stale = [job_id for job_id, job in self._jobs.items()
+                 if job.finished_at is not None and job.finished_at < cutoff]
+        for job_id in stale:
+            del self._jobs[job_id]
+
+    def get(self, job_id):
+        """The job with this ID, or None"""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        """
+        Cancel a queued job
+
+        Returns:
+            None if the job does not exist, else whether it was cancelled
+            (False once it has started or finished)
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            return self._cancel(job)
+
+    def clear(self):
+        """Forget cached results and finished jobs"""
+        with self._lock:
+            self._results.clear()
+            self._jobs = {job_id: job for job_id, job in self._jobs.items() if not job.finished}
+
+
+# Shared runner used by the delivery views
+job_runner = JobRunner()
@@ -1,4 +1,13 @@
-from app import app
+import os
+from app import create_app, configure_logging
+
+configure_logging()
+app = create_app()
 
 if __name__ == "__main__":
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    # Development server only; production runs `gunicorn --config gunicorn.conf.py main:app`.
+    # The development server prepares its own database; deployments run `flask --app main init-db` once
+    from database import init_database
+    with app.app_context():
+        init_database()
+    app.run(host='0.0.0.0', port=int(os.environ.get('PORT', 5000)), debug=os.environ.get('FLASK_DEBUG') == '1')
@@ -0,0 +1,298 @@
+import hmac
+import os
+import threading
+import time
+from bisect import bisect_left
+from flask import Response, abort, before_render_template, g, has_request_context, request, template_rendered
+from sqlalchemy import event
+
+# Histogram buckets (upper bounds); +Inf is implied
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+INPUT_SIZE_BUCKETS = (10, 50, 100, 500, 1000, 5000, 10000, 50000)
+
+
+def _format_labels(names, values, *extra):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs.extend(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic total per label combination"""
+
+    kind = 'counter'
+
+    def __init__(self, name, description, labels=()):
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(label, '') for label in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self, *const):
+        """Sample lines; const are preformatted labels added to each, e.g. 'pid="42"'"""
+        with self._lock:
+            values = list(self._values.items())
+        return [f'{self.name}{_format_labels(self.labels, key, *const)} {_format_value(value)}'
+                for key, value in values]
+
+
+class Gauge(Counter):
+    """Last value set per label combination"""
+
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        key = tuple(labels.get(label, '') for label in self.labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram:
+    """Bucketed observations with their sum and count, per label combination"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, description, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(label, '') for label in self.labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            if index < len(self.buckets):
+                entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def render(self, *const):
+        """Sample lines; const are preformatted labels added to each, e.g. 'pid="42"'"""
+        with self._lock:
+            values = [(key, list(counts), total, count) for key, (counts, total, count) in self._values.items()]
+
+        lines = []
+        for key, counts, total, count in values:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                bucket_labels = _format_labels(self.labels, key, *const, 'le="%s"' % _format_value(float(bound)))
+                lines.append(f'{self.name}_bucket{bucket_labels} {cumulative}')
+            bucket_labels = _format_labels(self.labels, key, *const, 'le="+Inf"')
+            lines.append(f'{self.name}_bucket{bucket_labels} {count}')
+            labels = _format_labels(self.labels, key, *const)
+            lines.append(f'{self.name}_sum{labels} {_format_value(total)}')
+            lines.append(f'{self.name}_count{labels} {count}')
+        return lines
+
+
+class Metrics:
+    """
+    Request, SQL, template, solver and cache instrumentation
+
+    Per-route latency, SQL query count/time per request (from SQLAlchemy
+    cursor events) and template render time are recorded around every
+    request; solvers and caches report through observe_solver() and
+    cache_lookup(). Everything is exposed in Prometheus text format on
+    /metrics and, with METRICS_SERVER_TIMING, summarised per response in a
+    Server-Timing header. Recording is a few dictionary updates under a
+    lock, cheap enough to leave on.
+
+    Values are per process, and every sample carries the worker's pid
+    label: with several gunicorn workers a scrape reaches one of them, so
+    dashboards sum over pid (Prometheus keeps each worker's series apart)
+    rather than reading a single scrape as the whole server. Requests are
+    recorded on teardown, so ones whose view raised count as 500s.
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self.server_timing = False
+        self.token = None
+
+        self.request_seconds = self.histogram(
+            'quickcart_request_seconds', 'Request latency by route', ('method', 'route'))
+        self.requests = self.counter(
+            'quickcart_requests_total', 'Requests by route and response status', ('method', 'route', 'status'))
+        self.sql_queries = self.histogram(
+            'quickcart_request_sql_queries', 'SQL statements executed per request', ('route',),
+            QUERY_COUNT_BUCKETS)
+        self.sql_seconds = self.histogram(
+            'quickcart_request_sql_seconds', 'Time spent in SQL per request', ('route',))
+        self.render_seconds = self.histogram(
+            'quickcart_template_render_seconds', 'Template rendering time', ('template',))
+        self.solver_seconds = self.histogram(
+            'quickcart_solver_seconds', 'Optimization solver run time', ('solver',))
+        self.solver_input_size = self.histogram(
+            'quickcart_solver_input_size', 'Orders or stops per solve', ('solver',), INPUT_SIZE_BUCKETS)
+        self.solver_states = self.counter(
+            'quickcart_solver_states_total', 'Dynamic-programming states explored', ('solver',))
+        self.solver_capacity = self.gauge(
+            'quickcart_solver_capacity_kg', 'Vehicle capacity of the latest solve', ('solver',))
+        self.cache_lookups = self.counter(
+            'quickcart_cache_lookups_total', 'Cache lookups by cache and result', ('cache', 'result'))
+
+    def counter(self, name, description, labels=()):
+        return self._register(Counter(name, description, labels))
+
+    def gauge(self, name, description, labels=()):
+        return self._register(Gauge(name, description, labels))
+
+    def histogram(self, name, description, labels=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(name, description, labels, buckets))
+
+    def _register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        """All metrics in Prometheus text exposition format, labelled with this worker's pid"""
+        pid = f'pid="{os.getpid()}"'
+        lines = []
+        for metric in self._metrics:
+            lines.append(f'# HELP {metric.name} {metric.description}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(metric.render(pid))
+        return '\n'.join(lines) + '\n'
+
+    def observe_solver(self, solver, seconds, size=None, capacity=None, states=None):
+        """
+        Record one solver run
+
+        Args:
+            solver: Solver or job kind, e.g. 'packing' or 'routing'
+            seconds: Run time
+            size: Number of orders or stops
+            capacity: Vehicle capacity in kg, for packing
+            states: Dynamic-programming states explored, where known
+        """
+        self.solver_seconds.observe(seconds, solver=solver)
+        if size is not None:
+            self.solver_input_size.observe(size, solver=solver)
+        if capacity is not None:
+            self.solver_capacity.set(capacity, solver=solver)
+        if states:
+            self.solver_states.inc(states, solver=solver)
+        if has_request_context() and 'metrics_solver' in g:
+            g.metrics_solver += seconds
+
+    def cache_lookup(self, cache, hits=0, misses=0):
+        """Record cache hits and misses"""
+        if hits:
+            self.cache_lookups.inc(hits, cache=cache, result='hit')
+        if misses:
+            self.cache_lookups.inc(misses, cache=cache, result='miss')
+
+    def init_app(self, app, engine):
+        """
+        Hook into the app's requests, the engine's statements and template rendering
+
+        Settings: METRICS_SERVER_TIMING adds the Server-Timing header,
+        METRICS_TOKEN requires "Authorization: Bearer <token>" on /metrics.
+        Without a token /metrics answers 404, so the endpoint is never
+        public by accident.
+        """
+        self.server_timing = bool(app.config.get('METRICS_SERVER_TIMING', False))
+        self.token = app.config.get('METRICS_TOKEN')
+
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+        event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+        before_render_template.connect(self._before_render, app)
+        template_rendered.connect(self._after_render, app)
+        app.add_url_rule('/metrics', 'metrics', self.view)
+
+    def view(self):
+        if not self.token:
+            abort(404)
+        supplied = request.headers.get('Authorization', '')
+        if not hmac.compare_digest(supplied, f'Bearer {self.token}'):
+            abort(401)
+        return Response(self.render(), mimetype='text/plain; version=0.0.4')
+
+    def _before_request(self):
+        g.metrics_started = time.perf_counter()
+        g.metrics_queries = 0
+        g.metrics_sql = 0.0
+        g.metrics_render = 0.0
+        g.metrics_solver = 0.0
+        g.metrics_render_started = []
+
+    def _after_request(self, response):
+        if 'metrics_started' not in g:
+            return response
+        g.metrics_status = response.status_code
+
+        if self.server_timing:
+            elapsed = time.perf_counter() - g.metrics_started
+            response.headers['Server-Timing'] = ', '.join([
+                f'db;dur={g.metrics_sql * 1000:.1f};desc="{g.metrics_queries} queries"',
+                f'render;dur={g.metrics_render * 1000:.1f}',
+                f'solver;dur={g.metrics_solver * 1000:.1f}',
+                f'total;dur={elapsed * 1000:.1f}',
+            ])
+        return response
+
+    def _teardown_request(self, error=None):
+        # Runs even when the view raised and after_request was skipped
+        if 'metrics_started' not in g:
+            return
+        elapsed = time.perf_counter() - g.pop('metrics_started')
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        status = 500 if error is not None else g.get('metrics_status', 500)
+
+        self.request_seconds.observe(elapsed, method=request.method, route=route)
+        self.requests.inc(method=request.method, route=route, status=status)
+        self.sql_queries.observe(g.metrics_queries, route=route)
+        self.sql_seconds.observe(g.metrics_sql, route=route)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('metrics_started', []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.get('metrics_started')
+        if not started:
+            return
+        elapsed = time.perf_counter() - started.pop()
+        if has_request_context() and 'metrics_queries' in g:
+            g.metrics_queries += 1
+            g.metrics_sql += elapsed
+
+    def _before_render(self, sender, template, context, **extra):
+        if has_request_context() and 'metrics_render_started' in g:
+            g.metrics_render_started.append(time.perf_counter())
+
+    def _after_render(self, sender, template, context, **extra):
+        if has_request_context() and g.get('metrics_render_started'):
+            elapsed = time.perf_counter() - g.metrics_render_started.pop()
+            g.metrics_render += elapsed
+            self.render_seconds.observe(elapsed, template=template.name or 'string')
+
+
+# Shared instrumentation; app.py installs it
+metrics = Metrics()
@@ -39,16 +39,22 @@ class Product(db.Model):
 
 class Order(db.Model):
     __tablename__ = 'orders'
+    __table_args__ = (
+        # Keyset pagination of order lists: WHERE status = ? ORDER BY created_at, order_id
+        db.Index('ix_orders_status_created_at', 'status', 'created_at', 'order_id'),
+    )
     
     order_id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), nullable=False, index=True)
     address = db.Column(db.String(200), nullable=False)
     premium_member = db.Column(db.Boolean, default=False)
     delivery_type = db.Column(db.String(20), nullable=False)  # 'express' or 'standard'
     total_price = db.Column(db.Float, nullable=False)
     total_weight = db.Column(db.Float, nullable=False)
-    status = db.Column(db.String(20), default='pending')  # 'pending', 'processing', 'shipped', 'delivered'
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    status = db.Column(db.String(20), default='pending')  # 'pending', 'processing', 'shipped', 'delivered'; indexed by ix_orders_status_created_at
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    lat = db.Column(db.Float, nullable=True)  # Geocoded once when the order is placed
+    lng = db.Column(db.Float, nullable=True)
     
     # Relationship with order items
     items = db.relationship('OrderItem', backref='order', lazy=True, cascade="all, delete-orphan")
@@ -62,72 +68,112 @@ class OrderItem(db.Model):
     quantity = db.Column(db.Integer, nullable=False)
     price = db.Column(db.Float, nullable=False)  # Price at the time of order
 
+class Vehicle(db.Model):
+    __tablename__ = 'vehicles'
+    
+    vehicle_id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    capacity = db.Column(db.Float, nullable=False)  # in kg
+    active = db.Column(db.Boolean, nullable=False, default=True)
+    
+    def to_dict(self):
+        return {
+            'vehicle_id': self.vehicle_id,
+            'name': self.name,
+            'capacity': self.capacity
+        }
+
+class StoredCart(db.Model):
+    __tablename__ = 'carts'
+    
+    user_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), primary_key=True)
+    lines = db.Column(db.Text, nullable=False, default='{}')  # JSON {product_id: quantity}
+    total_price = db.Column(db.Float, nullable=False, default=0.0)
+    total_weight = db.Column(db.Float, nullable=False, default=0.0)
+    catalog_version = db.Column(db.Integer, nullable=True)  # catalog version the totals were priced at
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class CatalogVersion(db.Model):
+    __tablename__ = 'catalog_version'
+
+    id = db.Column(db.Integer, primary_key=True)  # single row, id 1
+    version = db.Column(db.Integer, nullable=False, default=0)  # bumped whenever product details change
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class OrderVersion(db.Model):
+    __tablename__ = 'order_version'
+
+    id = db.Column(db.Integer, primary_key=True)  # single row, id 1
+    version = db.Column(db.Integer, nullable=False, default=0)  # bumped whenever an order is placed or changes status
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
 class HashTable(db.Model):
     __tablename__ = 'hashtable'
     
     id = db.Column(db.Integer, primary_key=True)
-    key = db.Column(db.String(100), nullable=False, unique=True)  # order_id as key
+    key = db.Column(db.String(100), nullable=False, unique=True)  # order_id as key, unique index gives O(1)-style lookups
     value = db.Column(db.Text, nullable=False)  # Serialized order details
-    next_id = db.Column(db.Integer, db.ForeignKey('hashtable.id'), nullable=True)  # For chaining in case of collision
-    
-    next_entry = db.relationship('HashTable', remote_side=[id], backref='previous', uselist=False)
+    # Databases created before the keyed cache also have a nullable next_id column
+    # (the old collision chain); it is left in place and unused, see upgrade_schema
     
     @staticmethod
-    def hash_function(key, table_size=100):
-        """Simple hash function for demonstration"""
-        return hash(str(key)) % table_size
+    def _upsert(rows):
+        """Insert or replace rows of {'key', 'value'} in the current transaction"""
+        dialect = db.session.get_bind().dialect.name
+        
+        if dialect in ('sqlite', 'postgresql'):
+            if dialect == 'sqlite':
+                from sqlalchemy.dialects.sqlite import insert
+            else:
+                from sqlalchemy.dialects.postgresql import insert
+            
+            statement = insert(HashTable.__table__)
+            statement = statement.on_conflict_do_update(
+                index_elements=[HashTable.__table__.c.key],
+                set_={'value': statement.excluded.value}
+            )
+            db.session.execute(statement, rows)
+        else:
+            for row in rows:
+                entry = HashTable.query.filter_by(key=row['key']).first()
+                if entry:
+                    entry.value = row['value']
+                else:
+                    db.session.add(HashTable(**row))
     
     @staticmethod
     def insert(order_id, order_details):
-        """Insert an order into the hash table"""
-        key = str(order_id)
-        hash_index = HashTable.hash_function(key)
-        bucket_key = f"bucket_{hash_index}"
-        
-        # Serialize order details
-        value = json.dumps(order_details)
-        
-        # Check if bucket exists
-        existing_entry = HashTable.query.filter_by(key=bucket_key).first()
-        
-        if not existing_entry:
-            # Create new bucket entry
-            entry = HashTable(key=bucket_key, value=value)
-            db.session.add(entry)
-        else:
-            # Handle collision with chaining
-            current = existing_entry
-            while current.next_entry:
-                if current.key == key:
-                    # Update existing entry
-                    current.value = value
-                    break
-                current = current.next_entry
-            else:
-                # Add to end of chain
-                new_entry = HashTable(key=key, value=value)
-                db.session.add(new_entry)
-                current.next_id = new_entry.id
-        
-        db.session.commit()
+        """Insert or update an order in the hash table (committed with the caller's transaction)"""
+        HashTable.insert_many({order_id: order_details})
+    
+    @staticmethod
+    def insert_many(details_by_order_id):
+        """Insert or update several orders with one statement"""
+        rows = [
+            {'key': str(order_id), 'value': json.dumps(order_details)}
+            for order_id, order_details in details_by_order_id.items()
+        ]
+        if rows:
+            HashTable._upsert(rows)
     
     @staticmethod
     def get(order_id):
-        """Get order details from the hash table"""
-        key = str(order_id)
-        hash_index = HashTable.hash_function(key)
-        bucket_key = f"bucket_{hash_index}"
+        """Get order details from the hash table with a single indexed lookup"""
+        value = db.session.execute(
+            db.select(HashTable.value).where(HashTable.key == str(order_id))
+        ).scalar()
         
-        entry = HashTable.query.filter_by(key=bucket_key).first()
-        
-        if not entry:
-            return None
+        return json.loads(value) if value is not None else None
+    
+    @staticmethod
+    def get_many(order_ids):
+        """Get details for several orders with one query, as {order_id: details}"""
+        keys = {str(order_id): order_id for order_id in order_ids}
+        if not keys:
+            return {}
         
-        # Check in the chain
-        current = entry
-        while current:
-            if current.key == key:
-                return json.loads(current.value)
-            current = current.next_entry
+        rows = db.session.execute(
+            db.select(HashTable.key, HashTable.value).where(HashTable.key.in_(keys))
+        ).all()
         
-        return None
+        return {keys[key]: json.loads(value) for key, value in rows}
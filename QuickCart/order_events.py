@@ -0,0 +1,159 @@
+import logging
+from collections import namedtuple
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from app import db
+from models import Order, OrderVersion
+
+# One order's status change; `order` is a snapshot dictionary of the row after the change
+# and `version` the order version stamp it was committed with
+StatusChange = namedtuple('StatusChange', ['order_id', 'old_status', 'new_status', 'order', 'version'],
+                          defaults=(None,))
+
+_SESSION_KEY = 'order_status_changes'
+
+
+def order_snapshot(order):
+    """Plain-dictionary copy of an Order, in the shape used by the optimizers"""
+    return {
+        'order_id': order.order_id,
+        'user_id': order.user_id,
+        'address': order.address,
+        'premium_member': order.premium_member,
+        'delivery_type': order.delivery_type,
+        'total_price': order.total_price,
+        'total_weight': order.total_weight,
+        'status': order.status,
+        'created_at': order.created_at.isoformat() if order.created_at else None,
+        'lat': order.lat,
+        'lng': order.lng,
+    }
+
+
+class OrderEvents:
+    """
+    Change hook on Order.status
+
+    Status changes (including new orders) are collected as the session
+    flushes and delivered to subscribers only once the transaction commits,
+    so process-wide state never sees a change that was rolled back.
+    Subscribers are called with a list of StatusChange tuples; their errors
+    are logged and don't affect the request.
+
+    Every commit with status changes then bumps the shared order_version
+    row, so any worker can tell with one primary-key read whether orders
+    changed since a given version (see current_version). The bump runs in
+    its own short transaction after the commit: doing it inside checkout
+    transactions would hold the row lock until they commit and serialize
+    every checkout on it.
+
+    Bulk UPDATE statements bypass the ORM, so code issuing them reports
+    its changes with publish_committed() once it has committed.
+    """
+
+    def __init__(self):
+        self._subscribers = []
+        self._installed = False
+
+    def subscribe(self, callback):
+        """Call callback(changes) after every commit that changed order statuses"""
+        if callback not in self._subscribers:
+            self._subscribers.append(callback)
+        return callback
+
+    def unsubscribe(self, callback):
+        if callback in self._subscribers:
+            self._subscribers.remove(callback)
+
+    def install(self):
+        """Register the session listeners (once per process)"""
+        if self._installed:
+            return
+        event.listen(Session, 'after_flush', self._after_flush)
+        event.listen(Session, 'after_commit', self._after_commit)
+        event.listen(Session, 'after_rollback', self._after_rollback)
+        self._installed = True
+
+    def bump_version(self):
+        """
+        Advance the order version stamp in a transaction of its own
+
+        Returns:
+            The new version, or None if the version row doesn't exist yet (run init-db)
+        """
+        statement = db.update(OrderVersion).where(OrderVersion.id == 1)\
+                      .values(version=OrderVersion.version + 1)\
+                      .returning(OrderVersion.version)
+        with db.engine.begin() as connection:
+            return connection.execute(statement).scalar()
+
+    def current_version(self, connection=None):
+        """The committed order version stamp, read from the database"""
+        return (connection or db.session).execute(
+            db.select(OrderVersion.version).where(OrderVersion.id == 1)
+        ).scalar()
+
+    def _after_flush(self, session, flush_context):
+        changes = []
+        for instance in session.new:
+            if isinstance(instance, Order):
+                changes.append(StatusChange(instance.order_id, None, instance.status,
+                                            order_snapshot(instance)))
+
+        for instance in session.dirty:
+            if not isinstance(instance, Order):
+                continue
+            history = inspect(instance).attrs.status.history
+            if not history.has_changes():
+                continue
+            old_status = history.deleted[0] if history.deleted else None
+            if old_status == instance.status:
+                continue
+            changes.append(StatusChange(instance.order_id, old_status, instance.status,
+                                        order_snapshot(instance)))
+
+        if changes:
+            session.info.setdefault(_SESSION_KEY, []).extend(changes)
+
+    def _after_commit(self, session):
+        changes = session.info.pop(_SESSION_KEY, None)
+        if changes:
+            self.publish_committed(changes)
+
+    def _after_rollback(self, session):
+        session.info.pop(_SESSION_KEY, None)
+
+    def publish_committed(self, changes):
+        """
+        Bump the order version for changes that have just committed, then publish them
+
+        Args:
+            changes: List of StatusChange tuples
+        """
+        try:
+            version = self.bump_version()
+        except Exception:
+            # Subscribers still get the changes; pollers catch up on the next bump
+            logging.exception("Could not advance the order version")
+            version = None
+        self.publish(changes, version)
+
+    def publish(self, changes, version=None):
+        """
+        Deliver committed status changes to every subscriber
+
+        Args:
+            changes: List of StatusChange tuples
+            version: Order version stamp the changes were committed with
+        """
+        if version is not None:
+            changes = [change._replace(version=version) for change in changes]
+        for callback in list(self._subscribers):
+            try:
+                callback(changes)
+            except Exception:
+                logging.exception("Order status subscriber %r failed", callback)
+
+
+# Shared hook; app.py installs it and subscribes the process-wide order state
+order_events = OrderEvents()
@@ -0,0 +1,217 @@
+import json
+import threading
+import time
+import uuid
+from collections import deque
+from itertools import islice
+from app import db
+from order_events import order_events
+
+# Events kept for streams that reconnect with Last-Event-ID
+DEFAULT_HISTORY = 1000
+
+# Seconds between reads of the order version stamp while streams are open
+DEFAULT_CHECK_INTERVAL = 5.0
+
+# Seconds between keep-alive comments on an idle stream
+DEFAULT_KEEPALIVE = 15.0
+
+# Seconds before a stream is closed and the browser reconnects
+DEFAULT_STREAM_SECONDS = 300
+
+# Open streams per process; further dashboards poll the version stamp
+DEFAULT_MAX_STREAMS = 2
+
+# Browser reconnect delay sent with every stream, in milliseconds
+RETRY_MILLISECONDS = 3000
+
+# Order fields needed to draw a dashboard card
+CARD_FIELDS = ('order_id', 'premium_member', 'delivery_type', 'total_weight', 'status', 'created_at')
+
+
+class OrderFeed:
+    """
+    Live order changes for the delivery dashboards, as Server-Sent Events
+
+    Committed status changes (new orders included) arrive from the order
+    status hook. Each batch is serialised once into a shared ring buffer and
+    every open stream in the process is woken to send it, so a room of
+    dispatchers costs one fan-out per change instead of a dashboard render
+    per dispatcher per reload. Event ids carry a per-process token, so a
+    stream reconnecting with Last-Event-ID resumes where it stopped, or gets
+    a 'resync' event when it can't (another worker, or events that have
+    left the buffer).
+
+    Changes committed by other workers never reach this process's hook.
+    While streams are open, the order version stamp is read at most once
+    per check interval for the whole process; versions this process didn't
+    commit itself send 'resync' to every stream. Browsers without
+    EventSource, or turned away at FEED_MAX_STREAMS, poll the same stamp.
+
+    Every open stream holds a request thread for up to FEED_STREAM_SECONDS,
+    after which the browser reconnects, so FEED_MAX_STREAMS should stay
+    well below the worker's thread count.
+    """
+
+    def __init__(self, history=DEFAULT_HISTORY, check_interval=DEFAULT_CHECK_INTERVAL,
+                 keepalive=DEFAULT_KEEPALIVE, stream_seconds=DEFAULT_STREAM_SECONDS,
+                 max_streams=DEFAULT_MAX_STREAMS):
+        self.check_interval = check_interval
+        self.keepalive = keepalive
+        self.stream_seconds = stream_seconds
+        self.max_streams = max_streams
+        self.version = None  # order version at the last check
+        self._local_versions = set()  # versions committed by this process since then
+        self._token = uuid.uuid4().hex[:8]
+        self._events = deque(maxlen=history)  # (sequence, formatted event)
+        self._sequence = 0
+        self._streams = 0
+        self._condition = threading.Condition()
+        self._check_lock = threading.Lock()
+        self._checked_at = 0.0
+
+    def init_app(self, app):
+        """Configure from the FEED_* settings"""
+        with self._condition:
+            self._events = deque(maxlen=int(app.config.get('FEED_HISTORY', DEFAULT_HISTORY)))
+        self.check_interval = float(app.config.get('FEED_CHECK_INTERVAL', DEFAULT_CHECK_INTERVAL))
+        self.keepalive = float(app.config.get('FEED_KEEPALIVE', DEFAULT_KEEPALIVE))
+        self.stream_seconds = float(app.config.get('FEED_STREAM_SECONDS', DEFAULT_STREAM_SECONDS))
+        self.max_streams = int(app.config.get('FEED_MAX_STREAMS', DEFAULT_MAX_STREAMS))
+
+    def handle_status_changes(self, changes):
+        """Queue committed status changes for every open stream (order_events subscriber)"""
+        versions = {change.version for change in changes if change.version is not None}
+        with self._check_lock:
+            self._local_versions.update(versions)
+        self._append('orders', {
+            'version': max(versions, default=None),
+            'changes': [{
+                'order_id': change.order_id,
+                'old_status': change.old_status,
+                'new_status': change.new_status,
+                'order': dict({field: change.order.get(field) for field in CARD_FIELDS},
+                              status=change.new_status),
+            } for change in changes],
+        })
+
+    def _append(self, kind, data):
+        with self._condition:
+            self._sequence += 1
+            self._events.append((self._sequence, self._format(self._sequence, kind, data)))
+            self._condition.notify_all()
+
+    def _format(self, sequence, kind, data):
+        return f'id: {self._token}:{sequence}\nevent: {kind}\ndata: {json.dumps(data)}\n\n'
+
+    def check_version(self, force=False):
+        """
+        Read the order version stamp, at most once per check interval per process
+
+        Versions between the previous check and this one that weren't
+        committed by this process mean another worker changed orders, and
+        every stream is told to resync.
+
+        Args:
+            force: Read even if the interval hasn't passed (a stream is starting)
+
+        Returns:
+            The version read, or None if the interval hasn't passed
+        """
+        with self._check_lock:
+            now = time.monotonic()
+            if not force and now - self._checked_at < self.check_interval:
+                return None
+            self._checked_at = now
+
+        with db.engine.connect() as connection:
+            version = order_events.current_version(connection)
+        if version is None:
+            return None
+
+        with self._check_lock:
+            previous = self.version
+            if previous is not None and version <= previous:
+                return version
+            foreign = previous is not None and any(
+                missed not in self._local_versions for missed in range(previous + 1, version + 1))
+            self.version = version
+            self._local_versions = {local for local in self._local_versions if local > version}
+        if foreign:
+            self._append('resync', {'version': version})
+        return version
+
+    def acquire(self):
+        """Reserve a stream slot; False when FEED_MAX_STREAMS streams are already open"""
+        with self._condition:
+            if self._streams >= self.max_streams:
+                return False
+            self._streams += 1
+            return True
+
+    def release(self):
+        with self._condition:
+            self._streams = max(0, self._streams - 1)
+
+    def _resume_point(self, last_event_id):
+        """Sequence to continue after, or None if the stream has to resync"""
+        token, _, sequence = (last_event_id or '').partition(':')
+        if token != self._token or not sequence.isdigit():
+            return None
+        sequence = int(sequence)
+        with self._condition:
+            oldest = self._events[0][0] if self._events else self._sequence + 1
+            if sequence > self._sequence or sequence < oldest - 1:
+                return None
+        return sequence
+
+    def stream(self, last_event_id=None, version=None):
+        """
+        Server-Sent Events for one dashboard, until FEED_STREAM_SECONDS pass
+
+        Args:
+            last_event_id: Last-Event-ID header of a reconnecting browser
+            version: Order version the dashboard was rendered at
+
+        Yields:
+            Formatted events and keep-alive comments
+        """
+        yield f'retry: {RETRY_MILLISECONDS}\n\n'
+
+        # Catch up with other workers first, so the cursor below starts after any resync this sends
+        current = self.check_version(force=True)
+        cursor = self._resume_point(last_event_id) if last_event_id else None
+        if cursor is None:
+            with self._condition:
+                cursor = self._sequence
+            if last_event_id or (version is not None and current is not None and current > version):
+                yield self._format(cursor, 'resync', {'version': current})
+
+        deadline = time.monotonic() + self.stream_seconds
+        last_sent = time.monotonic()
+        while time.monotonic() < deadline:
+            with self._condition:
+                self._condition.wait_for(lambda: self._sequence > cursor, timeout=self.check_interval)
+                oldest = self._events[0][0] if self._events else self._sequence + 1
+                if cursor < oldest - 1:
+                    # Too slow to keep up; the buffer has moved on
+                    cursor = self._sequence
+                    events = [(cursor, self._format(cursor, 'resync', {'version': self.version}))]
+                else:
+                    events = list(islice(self._events, max(0, cursor - oldest + 1), None))
+
+            if events:
+                for sequence, event in events:
+                    yield event
+                cursor = events[-1][0]
+                last_sent = time.monotonic()
+                continue
+
+            self.check_version()
+            if time.monotonic() - last_sent >= self.keepalive:
+                yield ': keepalive\n\n'
+                last_sent = time.monotonic()
+
+
+# Shared feed; app.py subscribes it to the order status hook
+order_feed = OrderFeed()
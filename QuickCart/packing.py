@@ -0,0 +1,171 @@
+import time
+from bisect import bisect_left, insort
+from collections import deque
+
+# Wall-clock budget for the value-aware improvement pass, in seconds
+DEFAULT_IMPROVE_BUDGET = 0.2
+
+STRATEGIES = ('first_fit', 'best_fit')
+
+
+def _value_density(order):
+    weight = order['weight']
+    return order['value'] / weight if weight > 0 else float('inf')
+
+
+def pack_fleet(orders, vehicles, strategy='best_fit', improve=True,
+               improve_budget=DEFAULT_IMPROVE_BUDGET):
+    """
+    Assign orders across a fleet of vehicles (multi-bin packing)
+
+    When the orders outweigh the fleet, the best value-per-kg orders that the
+    fleet could carry are packed first. Orders are placed heaviest first,
+    either into the first vehicle with room (first-fit decreasing) or into the
+    vehicle whose remaining room fits them most tightly (best-fit decreasing).
+    A value-aware pass then tries to load each unassigned order, directly or
+    by swapping out a cheaper one.
+
+    Args:
+        orders: List of order dictionaries with 'weight' and 'value' keys
+        vehicles: List of vehicle dictionaries with 'capacity' (kg)
+        strategy: 'first_fit' or 'best_fit'
+        improve: Run the value-aware improvement pass
+        improve_budget: Time budget for the improvement pass in seconds
+
+    Returns:
+        Dictionary with per-vehicle loads, unassigned orders and totals
+    """
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown packing strategy: {strategy}")
+
+    remaining = [float(vehicle['capacity']) for vehicle in vehicles]
+    assigned = [[] for _ in vehicles]
+    unassigned = []
+
+    # An oversubscribed fleet should carry the most valuable kilograms first
+    candidates = orders
+    fleet_room = sum(remaining)
+    if sum(order['weight'] for order in orders) > fleet_room:
+        candidates = []
+        load = 0.0
+        for order in sorted(orders, key=_value_density, reverse=True):
+            if load + order['weight'] <= fleet_room:
+                candidates.append(order)
+                load += order['weight']
+            else:
+                unassigned.append(order)
+
+    # Best fit keeps vehicles sorted by remaining room so each lookup is a bisect
+    by_room = sorted((room, v) for v, room in enumerate(remaining))
+
+    for order in sorted(candidates, key=lambda order: order['weight'], reverse=True):
+        weight = order['weight']
+        target = None
+
+        if strategy == 'first_fit':
+            for v, room in enumerate(remaining):
+                if weight <= room + 1e-9:
+                    target = v
+                    break
+        else:
+            position = bisect_left(by_room, (weight - 1e-9, -1))
+            if position < len(by_room):
+                _, target = by_room.pop(position)
+
+        if target is None:
+            unassigned.append(order)
+            continue
+
+        assigned[target].append(order)
+        remaining[target] -= weight
+        if strategy == 'best_fit':
+            insort(by_room, (remaining[target], target))
+
+    if improve and unassigned:
+        unassigned = _improve_by_value(assigned, remaining, unassigned,
+                                       time.perf_counter() + improve_budget)
+
+    loads = []
+    for vehicle, load, room in zip(vehicles, assigned, remaining):
+        capacity = float(vehicle['capacity'])
+        total_weight = capacity - room
+        loads.append({
+            'vehicle': vehicle,
+            'orders': load,
+            'total_weight': round(total_weight, 2),
+            'total_value': round(sum(order['value'] for order in load), 2),
+            'utilisation': total_weight / capacity if capacity > 0 else 0.0,
+        })
+
+    fleet_capacity = sum(float(vehicle['capacity']) for vehicle in vehicles)
+    fleet_weight = sum(load['total_weight'] for load in loads)
+    return {
+        'strategy': strategy,
+        'loads': loads,
+        'unassigned': unassigned,
+        'total_value': round(sum(load['total_value'] for load in loads), 2),
+        'total_weight': round(fleet_weight, 2),
+        'utilisation': fleet_weight / fleet_capacity if fleet_capacity > 0 else 0.0,
+    }
+
+
+def _improve_by_value(assigned, remaining, unassigned, deadline):
+    """
+    Load unassigned orders directly or by swapping out a cheaper assigned order
+
+    Unassigned orders are tried best value density first. For each vehicle
+    the cheapest assigned order that frees enough room is the swap candidate;
+    the swap with the largest value gain wins. Swapped-out orders join the
+    unassigned list and may be placed again later.
+
+    Returns:
+        The orders that are still unassigned
+    """
+    pending = deque(sorted(unassigned, key=_value_density, reverse=True))
+    still_unassigned = []
+
+    # Assigned orders per vehicle, cheapest first, so candidate scans stop early
+    for load in assigned:
+        load.sort(key=lambda order: order['value'])
+
+    while pending:
+        if time.perf_counter() >= deadline:
+            still_unassigned.extend(pending)
+            break
+
+        order = pending.popleft()
+        weight = order['weight']
+
+        # Plain insertion if any vehicle has room (e.g. room freed by an earlier swap)
+        fit = next((v for v, room in enumerate(remaining) if weight <= room + 1e-9), None)
+        if fit is not None:
+            insort(assigned[fit], order, key=lambda order: order['value'])
+            remaining[fit] -= weight
+            continue
+
+        best_gain = 0.0
+        best = None
+        for v, load in enumerate(assigned):
+            for position, candidate in enumerate(load):
+                if candidate['value'] >= order['value']:
+                    break
+                if weight <= remaining[v] + candidate['weight'] + 1e-9:
+                    gain = order['value'] - candidate['value']
+                    if gain > best_gain:
+                        best_gain = gain
+                        best = (v, position)
+                    break
+
+        if best is None:
+            still_unassigned.append(order)
+            continue
+
+        v, position = best
+        removed = assigned[v].pop(position)
+        remaining[v] += removed['weight'] - weight
+        insort(assigned[v], order, key=lambda order: order['value'])
+
+        # The swapped-out order is cheaper, so it goes to the back of the queue
+        pending.append(removed)
+
+    return still_unassigned
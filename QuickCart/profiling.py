@@ -0,0 +1,255 @@
+import cProfile
+import heapq
+import hmac
+import io
+import itertools
+import marshal
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from flask import Response, abort, g, jsonify, request
+from flask_login import current_user
+
+# Slowest profiles kept per process
+DEFAULT_KEEP = 20
+
+# Seconds between stack samples in 'sampling' mode
+DEFAULT_SAMPLE_INTERVAL = 0.005
+
+MODES = ('cprofile', 'sampling')
+
+
+class StackSampler:
+    """
+    Samples one thread's Python stack at a fixed interval from a helper thread
+
+    Much cheaper than cProfile on deep call trees: the profiled thread runs
+    untouched and only pays for the GIL handoffs. Stacks are counted in the
+    collapsed format used by flamegraph tools.
+    """
+
+    def __init__(self, thread_id, interval=DEFAULT_SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self.stacks
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(names))] += 1
+
+
+class RequestProfile:
+    """One profiled request with its cProfile statistics or sampled stacks"""
+
+    def __init__(self, method, path, mode, duration, pstats_data=None, stacks=None):
+        self.profile_id = uuid.uuid4().hex
+        self.method = method
+        self.path = path
+        self.mode = mode
+        self.duration = duration
+        self.recorded_at = time.time()
+        self.pstats_data = pstats_data
+        self.stacks = stacks
+
+    def collapsed(self):
+        """Sampled stacks as 'frame;frame;frame count' lines for flamegraph.pl / speedscope"""
+        return ''.join(f'{stack} {count}\n' for stack, count in self.stacks.most_common())
+
+    def summary(self, limit=25):
+        """Top functions by cumulative time (cProfile) or by samples (sampling)"""
+        if self.pstats_data is not None:
+            stats = pstats.Stats(_MarshalledStats(self.pstats_data), stream=io.StringIO())
+            stats.sort_stats('cumulative').print_stats(limit)
+            return stats.stream.getvalue()
+
+        totals = Counter()
+        for stack, count in self.stacks.items():
+            for name in set(stack.split(';')):
+                totals[name] += count
+        samples = sum(self.stacks.values()) or 1
+        return ''.join(f'{count / samples:7.1%}  {name}\n' for name, count in totals.most_common(limit))
+
+    def to_dict(self):
+        return {
+            'profile_id': self.profile_id,
+            'method': self.method,
+            'path': self.path,
+            'mode': self.mode,
+            'duration': self.duration,
+            'recorded_at': self.recorded_at,
+            'formats': ['pstats', 'txt'] if self.pstats_data is not None else ['collapsed', 'txt'],
+        }
+
+
+class _MarshalledStats:
+    """Adapter so pstats.Stats can load statistics kept in memory"""
+
+    def __init__(self, data):
+        self.stats = marshal.loads(data)
+
+    def create_stats(self):
+        pass
+
+
+class RequestProfiler:
+    """
+    Opt-in per-request profiling that keeps the slowest profiles
+
+    A request is profiled when it is picked by PROFILE_SAMPLE_RATE (0 by
+    default, i.e. never) or sends an X-Profile header and is authorised: the
+    header value matches PROFILE_TOKEN, or, without a token, the user is a
+    logged-in delivery user. PROFILE_MODE picks cProfile (exact call counts,
+    higher overhead) or the stack sampler (collapsed stacks for
+    flamegraphs). The PROFILE_KEEP slowest profiles are kept in memory and
+    can be listed and downloaded under /delivery/profiles.
+
+    Profiles live in the worker process that served the request.
+    """
+
+    def __init__(self, sample_rate=0.0, mode='cprofile', keep=DEFAULT_KEEP,
+                 sample_interval=DEFAULT_SAMPLE_INTERVAL, token=None):
+        self.sample_rate = sample_rate
+        self.mode = mode
+        self.keep = keep
+        self.sample_interval = sample_interval
+        self.token = token
+        self._slowest = []  # min-heap of (duration, sequence, profile)
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """Configure from the PROFILE_* settings and register the hooks and download views"""
+        self.sample_rate = float(app.config.get('PROFILE_SAMPLE_RATE', 0.0))
+        self.mode = app.config.get('PROFILE_MODE', 'cprofile')
+        if self.mode not in MODES:
+            raise ValueError(f"Unknown profile mode: {self.mode}")
+        self.keep = int(app.config.get('PROFILE_KEEP', DEFAULT_KEEP))
+        self.sample_interval = float(app.config.get('PROFILE_SAMPLE_INTERVAL', DEFAULT_SAMPLE_INTERVAL))
+        self.token = app.config.get('PROFILE_TOKEN')
+
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+        app.add_url_rule('/delivery/profiles', 'profiles', self.list_view)
+        app.add_url_rule('/delivery/profiles/<profile_id>.<fmt>', 'profile_download', self.download_view)
+
+    def _authorised(self, header=None):
+        if self.token:
+            return header is not None and hmac.compare_digest(header, self.token)
+        return current_user.is_authenticated and current_user.role == 'delivery'
+
+    def _wanted(self):
+        header = request.headers.get('X-Profile')
+        if header and self._authorised(header):
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def _before_request(self):
+        if request.endpoint in ('static', 'profiles', 'profile_download') or not self._wanted():
+            return
+        if self.mode == 'sampling':
+            profiler = StackSampler(threading.get_ident(), self.sample_interval)
+            profiler.start()
+        else:
+            profiler = cProfile.Profile()
+            profiler.enable()
+        g.profiler = profiler
+        g.profile_started = time.perf_counter()
+
+    def _after_request(self, response):
+        profile = self._stop()
+        if profile is not None:
+            response.headers['X-Profile-Id'] = profile.profile_id
+        return response
+
+    def _teardown_request(self, error=None):
+        # A view that raised skips after_request; stop the profiler here so it
+        # doesn't stay enabled on this thread (or leave the sampler running)
+        self._stop()
+
+    def _stop(self):
+        """Stop and record the request's profiler, if one is running; returns the profile"""
+        profiler = g.pop('profiler', None)
+        if profiler is None:
+            return None
+        duration = time.perf_counter() - g.pop('profile_started')
+
+        if isinstance(profiler, StackSampler):
+            profile = RequestProfile(request.method, request.full_path, 'sampling', duration,
+                                     stacks=profiler.stop())
+        else:
+            profiler.disable()
+            profiler.create_stats()
+            profile = RequestProfile(request.method, request.full_path, 'cprofile', duration,
+                                     pstats_data=marshal.dumps(profiler.stats))
+        self.record(profile)
+        return profile
+
+    def record(self, profile):
+        """Keep the profile if it is among the slowest"""
+        entry = (profile.duration, next(self._sequence), profile)
+        with self._lock:
+            if len(self._slowest) < self.keep:
+                heapq.heappush(self._slowest, entry)
+            elif profile.duration > self._slowest[0][0]:
+                heapq.heapreplace(self._slowest, entry)
+
+    def profiles(self):
+        """Kept profiles, slowest first"""
+        with self._lock:
+            entries = sorted(self._slowest, reverse=True)
+        return [profile for _, _, profile in entries]
+
+    def get(self, profile_id):
+        return next((profile for profile in self.profiles() if profile.profile_id == profile_id), None)
+
+    def list_view(self):
+        if not self._authorised(request.headers.get('X-Profile')):
+            return jsonify({'success': False, 'message': 'Access denied'}), 403
+        return jsonify({'success': True, 'profiles': [profile.to_dict() for profile in self.profiles()]})
+
+    def download_view(self, profile_id, fmt):
+        if not self._authorised(request.headers.get('X-Profile')):
+            return jsonify({'success': False, 'message': 'Access denied'}), 403
+        profile = self.get(profile_id)
+        if profile is None or fmt not in profile.to_dict()['formats']:
+            abort(404)
+
+        filename = f'profile-{profile_id}.{fmt}'
+        if fmt == 'pstats':
+            # Load with pstats.Stats(filename) or view with snakeviz
+            body, mimetype = profile.pstats_data, 'application/octet-stream'
+        elif fmt == 'collapsed':
+            # Input for flamegraph.pl, speedscope or inferno
+            body, mimetype = profile.collapsed(), 'text/plain'
+        else:
+            body, mimetype = profile.summary(), 'text/plain'
+        return Response(body, mimetype=mimetype,
+                        headers={'Content-Disposition': f'attachment; filename={filename}'})
+
+
+# Shared profiler; app.py installs it
+profiler = RequestProfiler()
@@ -0,0 +1,148 @@
+import threading
+import time
+from metrics import metrics
+
+# Largest table (orders x capacity cells) built in the request for the incremental knapsack;
+# bigger first solves go to the job runner instead
+MAX_BUILD_CELLS = 50_000_000
+
+# Re-solve the route from scratch once its gap has grown this much since the last full solve
+MAX_GAP_GROWTH = 0.05
+
+# Stop changes a page visit may apply to the incremental route before a full re-solve
+MAX_ROUTE_CHANGES = 25
+
+
+def route_location_id(order_id):
+    """Location ID of an order's stop, as built by the route view"""
+    return f'order-{order_id}'
+
+
+class Reoptimizer:
+    """
+    Incremental packing and routing state, kept in step with order status changes
+
+    Subscribed to the Order.status change hook: an order entering or leaving
+    'pending' is added to or removed from the single-truck knapsack, and one
+    entering or leaving 'processing' is inserted into or spliced out of the
+    current route, each in about O(n) (O(capacity) for the knapsack). The
+    views reconcile the state with the database on every visit, so changes
+    committed by other worker processes are applied incrementally as well.
+    """
+
+    def __init__(self, max_build_cells=MAX_BUILD_CELLS, max_gap_growth=MAX_GAP_GROWTH,
+                 max_route_changes=MAX_ROUTE_CHANGES):
+        self.max_build_cells = max_build_cells
+        self.max_gap_growth = max_gap_growth
+        self.max_route_changes = max_route_changes
+        self.knapsack = None
+        self.route = None  # IncrementalRoute, created by the first full solve
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        """Drop all state; the next page visits solve from scratch"""
+        with self._lock:
+            self.knapsack = None
+            if self.route is not None:
+                self.route.clear()
+
+    def handle_status_changes(self, changes):
+        """Apply committed status changes (order_events subscriber)"""
+        with self._lock:
+            for change in changes:
+                order = change.order
+
+                if self.knapsack is not None:
+                    if change.new_status == 'pending':
+                        self.knapsack.add(change.order_id, order['total_weight'], order['total_price'])
+                    elif change.old_status == 'pending':
+                        self.knapsack.remove(change.order_id)
+
+                if self.route is not None and self.route.loaded:
+                    location_id = route_location_id(change.order_id)
+                    if change.new_status == 'processing':
+                        if order['lat'] is not None and order['lng'] is not None:
+                            self.route.insert(location_id, order['lat'], order['lng'])
+                    elif change.old_status == 'processing':
+                        self.route.remove(location_id)
+
+    def packing_solution(self, orders, max_capacity):
+        """
+        Single-truck selection from the incremental knapsack
+
+        Args:
+            orders: Pending orders with 'order_id', 'weight' and 'value'
+            max_capacity: Truck capacity in kg
+
+        Returns:
+            Dictionary shaped like jobs.run_packing's result, or None when
+            there is no state yet and the first solve is too big to build here
+        """
+        from algorithms import IncrementalKnapsack
+
+        started = time.perf_counter()
+        with self._lock:
+            if self.knapsack is None or self.knapsack.max_capacity != max_capacity:
+                cells = len(orders) * (int(max_capacity * IncrementalKnapsack.SCALE) + 1)
+                if cells > self.max_build_cells:
+                    return None
+                self.knapsack = IncrementalKnapsack(max_capacity)
+
+            # Reconcile with the database (changes from other workers, or the first build)
+            wanted = {order['order_id']: order for order in orders}
+            for order_id in [order_id for order_id in self.knapsack.keys() if order_id not in wanted]:
+                self.knapsack.remove(order_id)
+            for order_id, order in wanted.items():
+                if order_id not in self.knapsack:
+                    self.knapsack.add(order_id, order['weight'], order['value'])
+
+            selected, total_value = self.knapsack.solution()
+
+        metrics.observe_solver('packing_incremental', time.perf_counter() - started,
+                               size=len(orders), capacity=max_capacity)
+
+        return {
+            'selected_order_ids': selected,
+            'total_value': total_value,
+            'total_weight': sum(wanted[order_id]['weight'] for order_id in selected),
+            'max_capacity': max_capacity,
+            'engine': 'dp',
+            'upper_bound': total_value,
+            'gap': 0.0,
+            'optimal': True,
+        }
+
+    def route_solution(self, locations):
+        """
+        Current route from the incremental state
+
+        Args:
+            locations: Route locations, warehouse first
+
+        Returns:
+            Route result shaped like solve_route's, or None when a full solve
+            is needed (no state, too many changes or the gap grew too much)
+        """
+        started = time.perf_counter()
+        with self._lock:
+            if self.route is None or not self.route.sync(locations, self.max_route_changes):
+                return None
+            if self.route.gap - self.route.base_gap > self.max_gap_growth:
+                return None
+            result = self.route.result(locations)
+        result['elapsed'] = time.perf_counter() - started
+        metrics.observe_solver('routing_incremental', result['elapsed'], size=len(locations))
+        return result
+
+    def route_solved(self, locations, route_result, distances):
+        """Seed the incremental route with a full solve"""
+        from routing import IncrementalRoute
+
+        with self._lock:
+            if self.route is None:
+                self.route = IncrementalRoute()
+            self.route.load(locations, route_result, distances)
+
+
+# Shared state used by the delivery views
+reoptimizer = Reoptimizer()
@@ -0,0 +1,286 @@
+import base64
+import json
+from datetime import datetime
+from sqlalchemy.orm import selectinload
+from app import db
+from models import Order
+from cache import order_cache
+from order_events import order_events, order_snapshot, StatusChange
+
+# Default and largest page sizes for paginated lists
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+# Order statuses in delivery order; each may only move to the next one
+ORDER_STATUSES = ('pending', 'processing', 'shipped', 'delivered')
+PREVIOUS_STATUS = dict(zip(ORDER_STATUSES[1:], ORDER_STATUSES))
+
+# Columns needed to render order cards and lists
+DASHBOARD_COLUMNS = (
+    Order.order_id,
+    Order.user_id,
+    Order.address,
+    Order.premium_member,
+    Order.delivery_type,
+    Order.total_price,
+    Order.total_weight,
+    Order.status,
+    Order.created_at,
+)
+
+# Columns needed to build a delivery route (weights for capacitated vehicle routing)
+ROUTE_COLUMNS = (
+    Order.order_id,
+    Order.address,
+    Order.premium_member,
+    Order.delivery_type,
+    Order.total_weight,
+    Order.status,
+    Order.lat,
+    Order.lng,
+)
+
+
+def order_rows(status, columns=DASHBOARD_COLUMNS):
+    """
+    Orders with a given status as plain dictionaries, with one column-only query
+
+    No ORM objects are built, so there is no identity-map or attribute
+    instrumentation cost and nothing to lazy-load later.
+
+    Args:
+        status: Order status to filter on
+        columns: Order columns to select
+
+    Returns:
+        List of dictionaries keyed by column name, oldest order first
+    """
+    result = db.session.execute(
+        db.select(*columns)
+        .where(Order.status == status)
+        .order_by(Order.order_id)
+    )
+    return [dict(row) for row in result.mappings()]
+
+
+def optimizer_orders(status='pending'):
+    """Order dictionaries in the shape used by the optimizers (ISO created_at)"""
+    orders = order_rows(status)
+    for order in orders:
+        order['created_at'] = order['created_at'].isoformat()
+    return orders
+
+
+def packing_orders():
+    """Pending orders with 'weight' and 'value' keys for the knapsack and fleet packing"""
+    orders = optimizer_orders('pending')
+    for order in orders:
+        order['weight'] = order['total_weight']
+        order['value'] = order['total_price']  # Using price as value for knapsack
+    return orders
+
+
+def route_orders():
+    """
+    Processing orders with coordinates for route optimization
+
+    Orders without stored coordinates (e.g. the geocoder failed when they
+    were placed) are geocoded now and saved, loading only those rows as ORM
+    objects.
+
+    Returns:
+        List of order dictionaries including 'lat' and 'lng'
+    """
+    from geocoding import ensure_coordinates
+    from spatial import order_index
+
+    orders = order_rows('processing', ROUTE_COLUMNS)
+    missing = {order['order_id']: order for order in orders
+               if order['lat'] is None or order['lng'] is None}
+
+    if missing:
+        stored = Order.query.filter(Order.order_id.in_(missing)).all()
+        if ensure_coordinates(stored):
+            db.session.commit()
+            order_index.invalidate()
+            for order in stored:
+                missing[order.order_id]['lat'] = order.lat
+                missing[order.order_id]['lng'] = order.lng
+
+    return orders
+
+
+def recent_orders_with_items(user_id, limit=5):
+    """
+    A customer's latest orders with their items loaded in one extra query
+
+    Returns:
+        List of Order objects with `items` already populated
+    """
+    return Order.query.options(selectinload(Order.items))\
+                      .filter_by(user_id=user_id)\
+                      .order_by(Order.created_at.desc())\
+                      .limit(limit).all()
+
+
+def encode_cursor(created_at, order_id):
+    """Opaque keyset cursor for the position after an order"""
+    raw = json.dumps([created_at.isoformat(), order_id]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Position encoded by encode_cursor
+
+    Returns:
+        (created_at, order_id) tuple, or None for an empty or malformed cursor
+    """
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        created_at, order_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(order_id)
+    except (ValueError, TypeError):
+        return None
+
+
+def clamp_page_size(limit):
+    """Page size within 1..MAX_PAGE_SIZE, DEFAULT_PAGE_SIZE if not given"""
+    if not limit:
+        return DEFAULT_PAGE_SIZE
+    return max(1, min(int(limit), MAX_PAGE_SIZE))
+
+
+def order_page(status, cursor=None, limit=DEFAULT_PAGE_SIZE, columns=DASHBOARD_COLUMNS):
+    """
+    One page of orders with a status, oldest first, using keyset pagination
+
+    The (created_at, order_id) position of the last row is the cursor for the
+    next page, so every page is an index range scan of `limit` rows however
+    deep into the backlog it is (unlike OFFSET).
+
+    Args:
+        status: Order status to filter on
+        cursor: Cursor from a previous page, or None for the first page
+        limit: Page size
+        columns: Order columns to select
+
+    Returns:
+        (orders, next_cursor) where next_cursor is None on the last page
+    """
+    query = db.select(*columns).where(Order.status == status)
+
+    position = decode_cursor(cursor)
+    if position is not None:
+        created_at, order_id = position
+        query = query.where(db.or_(
+            Order.created_at > created_at,
+            db.and_(Order.created_at == created_at, Order.order_id > order_id)
+        ))
+
+    result = db.session.execute(
+        query.order_by(Order.created_at, Order.order_id).limit(limit + 1)
+    )
+    orders = [dict(row) for row in result.mappings()]
+
+    next_cursor = None
+    if len(orders) > limit:
+        orders = orders[:limit]
+        next_cursor = encode_cursor(orders[-1]['created_at'], orders[-1]['order_id'])
+    return orders, next_cursor
+
+
+def order_stats(statuses=('pending', 'processing')):
+    """
+    Counts and weights of active orders with one grouped query
+
+    Returns:
+        Dictionary with per-status counts, express/standard/premium counts and total weight
+    """
+    rows = db.session.execute(
+        db.select(Order.status, Order.delivery_type, Order.premium_member,
+                  db.func.count(), db.func.coalesce(db.func.sum(Order.total_weight), 0))
+        .where(Order.status.in_(statuses))
+        .group_by(Order.status, Order.delivery_type, Order.premium_member)
+    ).all()
+
+    stats = {'by_status': {status: 0 for status in statuses},
+             'express': 0, 'standard': 0, 'premium': 0, 'total_weight': 0.0}
+    for status, delivery_type, premium_member, count, weight in rows:
+        stats['by_status'][status] += count
+        if delivery_type in ('express', 'standard'):
+            stats[delivery_type] += count
+        if premium_member:
+            stats['premium'] += count
+        stats['total_weight'] += weight
+    return stats
+
+
+def update_order_statuses(order_ids, new_status):
+    """
+    Move several orders to a new status with one UPDATE and one commit
+
+    Only the next step of pending -> processing -> shipped -> delivered is
+    allowed. The UPDATE also re-checks the previous status, so an order
+    that another request moved in the meantime is reported rather than
+    overwritten. Cached order details are refreshed in one batch in the
+    same transaction. After the commit the order version stamp is bumped
+    in a short transaction of its own and the changes are published to the
+    order status subscribers.
+
+    Args:
+        order_ids: Order IDs to update
+        new_status: Target status
+
+    Returns:
+        Dictionary of order_id -> {'success': bool, 'status': current status, 'message': str}
+    """
+    order_ids = list(dict.fromkeys(int(order_id) for order_id in order_ids))
+    previous_status = PREVIOUS_STATUS.get(new_status)
+
+    orders = {order.order_id: order for order in Order.query.filter(Order.order_id.in_(order_ids))}
+    results = {}
+    movable = []
+    for order_id in order_ids:
+        order = orders.get(order_id)
+        if order is None:
+            results[order_id] = {'success': False, 'status': None, 'message': 'Order not found'}
+        elif order.status != previous_status:
+            results[order_id] = {'success': False, 'status': order.status,
+                                 'message': f'Cannot change a {order.status} order to {new_status}'}
+        else:
+            movable.append(order_id)
+
+    updated = []
+    if movable:
+        updated = db.session.execute(
+            db.update(Order)
+            .where(Order.order_id.in_(movable), Order.status == previous_status)
+            .values(status=new_status)
+            .returning(Order.order_id)
+        ).scalars().all()
+        order_cache.update_many(updated, status=new_status)
+
+    # Snapshot before committing: commit expires the instances, and reading
+    # them afterwards would cost one SELECT per order
+    changes = []
+    for order_id in updated:
+        snapshot = order_snapshot(orders[order_id])
+        snapshot['status'] = new_status
+        changes.append(StatusChange(order_id, previous_status, new_status, snapshot))
+    db.session.commit()
+
+    updated = set(updated)
+    for order_id in movable:
+        if order_id in updated:
+            results[order_id] = {'success': True, 'status': new_status,
+                                 'message': f'Order status updated to {new_status}'}
+        else:
+            results[order_id] = {'success': False, 'status': None,
+                                 'message': 'Order was changed by another request'}
+
+    if changes:
+        order_events.publish_committed(changes)
+    return {order_id: results[order_id] for order_id in order_ids}
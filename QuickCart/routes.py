@@ -1,41 +1,95 @@
 import json
 import logging
 import datetime
-from flask import render_template, request, redirect, url_for, flash, session, jsonify
+import time
+from flask import render_template, request, redirect, url_for, flash, jsonify, current_app, Response, stream_with_context
+from markupsafe import Markup
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
-from app import app, db
-from models import User, Product, Order, OrderItem, HashTable
+from app import db
+from models import User, Order, Vehicle
 from forms import LoginForm, RegisterForm, OrderForm, AddToCartForm, UpdateCartForm
-from algorithms import merge_sort, knapsack, tsp_dynamic_programming
+from packing import STRATEGIES
+from geocoding import geocode_address, WAREHOUSE_LAT, WAREHOUSE_LNG
+from spatial import order_index
+from dispatch import dispatch_queue
+from cache import order_cache
+from jobs import job_runner, input_key
+from reoptimize import reoptimizer
+from catalog import catalog
+from cart import cart_store
+from checkout import checkout_cart, CheckoutError
+from order_events import order_events
+from order_feed import order_feed
+from repository import (order_page, order_stats, clamp_page_size, optimizer_orders, packing_orders,
+                        route_orders, recent_orders_with_items, update_order_statuses, ORDER_STATUSES)
+
+# Views, context processors and error handlers, added to the app by register_routes
+_routes = []
+_context_processors = []
+_error_handlers = []
+
+def route(rule, **options):
+    """Like app.route, for registering on the app built by create_app"""
+    def decorator(view):
+        _routes.append((rule, view, options))
+        return view
+    return decorator
+
+def context_processor(function):
+    _context_processors.append(function)
+    return function
+
+def errorhandler(code):
+    def decorator(handler):
+        _error_handlers.append((code, handler))
+        return handler
+    return decorator
+
+def register_routes(app):
+    """Add every view of this module to the app, keeping the endpoint names used by url_for"""
+    login_manager.init_app(app)
+    for rule, view, options in _routes:
+        app.add_url_rule(rule, view.__name__, view, **options)
+    for function in _context_processors:
+        app.context_processor(function)
+    for code, handler in _error_handlers:
+        app.register_error_handler(code, handler)
 
 # Add the current year to all template contexts
-@app.context_processor
+@context_processor
 def inject_year():
     return {'current_year': datetime.datetime.now().year}
 
+# Page sizes for the order lists and the product catalog
+ORDER_PAGE_SIZE = 20
+PRODUCT_PAGE_SIZE = 24
+
+# Most orders one bulk status request may change
+MAX_BULK_ORDERS = 500
+
 # Initialize Flask-Login
 login_manager = LoginManager()
-login_manager.init_app(app)
 login_manager.login_view = 'login'
 
 @login_manager.user_loader
 def load_user(user_id):
     return User.query.get(int(user_id))
 
-# Initialize cart in session
-@app.before_request
-def before_request():
-    if 'cart' not in session:
-        session['cart'] = {}
+# Cart badge count for customer pages; carts are stored server-side, keyed by user
+@context_processor
+def inject_cart_count():
+    if current_user.is_authenticated and current_user.role == 'customer':
+        return {'cart_count': len(cart_store.get(current_user.user_id))}
+    return {'cart_count': 0}
 
 # Error handler
-@app.errorhandler(404)
+@errorhandler(404)
 def page_not_found(e):
     return render_template('404.html'), 404
 
 # Routes for authentication and common pages
-@app.route('/')
+@route('/')
 def index():
     if current_user.is_authenticated:
         if current_user.role == 'customer':
@@ -44,7 +98,7 @@ def index():
             return redirect(url_for('delivery_dashboard'))
     return redirect(url_for('login'))
 
-@app.route('/login', methods=['GET', 'POST'])
+@route('/login', methods=['GET', 'POST'])
 def login():
     form = LoginForm()
     if form.validate_on_submit():
@@ -59,7 +113,7 @@ def login():
             flash('Invalid email, password, or role', 'danger')
     return render_template('login.html', form=form)
 
-@app.route('/register', methods=['GET', 'POST'])
+@route('/register', methods=['GET', 'POST'])
 def register():
     form = RegisterForm()
     if form.validate_on_submit():
@@ -77,42 +131,70 @@ def register():
     
     return render_template('login.html', form=form, register=True)
 
-@app.route('/logout')
+@route('/logout')
 @login_required
 def logout():
     logout_user()
-    session.pop('cart', None)
     flash('You have been logged out', 'info')
     return redirect(url_for('login'))
 
 # Customer routes
-@app.route('/customer/dashboard')
+@route('/customer/dashboard')
 @login_required
 def customer_dashboard():
     if current_user.role != 'customer':
         flash('Access denied: You must be a customer to view this page', 'danger')
         return redirect(url_for('index'))
     
-    # Get recent orders
-    recent_orders = Order.query.filter_by(user_id=current_user.user_id)\
-                              .order_by(Order.created_at.desc())\
-                              .limit(5).all()
+    # Get recent orders, with their items loaded up front for the item counts
+    recent_orders = recent_orders_with_items(current_user.user_id)
     
     return render_template('customer/dashboard.html', recent_orders=recent_orders)
 
-@app.route('/customer/products')
+@route('/customer/products')
 @login_required
 def customer_products():
     if current_user.role != 'customer':
         flash('Access denied: You must be a customer to view this page', 'danger')
         return redirect(url_for('index'))
     
-    products = Product.query.all()
-    add_to_cart_form = AddToCartForm()
+    # One page of the catalog at a time, continuing after the last product_id shown;
+    # the grid HTML comes pre-rendered from the catalog snapshot
+    after = request.args.get('after', type=int)
+    snapshot = catalog.snapshot()
+    _, next_after = snapshot.page(after, PRODUCT_PAGE_SIZE)
+    product_grid = snapshot.fragment(after, PRODUCT_PAGE_SIZE, _render_product_grid)
+    
+    return render_template('customer/products.html', product_grid=product_grid,
+                          after=after, next_after=next_after)
+
+def _render_product_grid(products):
+    # Rendered without the request context processors so the fragment stays user-independent
+    return Markup(current_app.jinja_env.get_template('customer/product_grid.html').render(products=products))
+
+@route('/customer/api/products')
+@login_required
+def products_api():
+    if current_user.role != 'customer':
+        return jsonify({'success': False, 'message': 'Access denied'}), 403
     
-    return render_template('customer/products.html', products=products, form=add_to_cart_form)
+    after = request.args.get('after', type=int)
+    limit = clamp_page_size(request.args.get('limit', type=int))
+    products, next_after = catalog.page(after, limit)
+    
+    return jsonify({
+        'success': True,
+        'products': [{
+            'product_id': product.product_id,
+            'name': product.name,
+            'description': product.description,
+            'price': product.price,
+            'weight': product.weight
+        } for product in products],
+        'next_after': next_after
+    })
 
-@app.route('/customer/add_to_cart', methods=['POST'])
+@route('/customer/add_to_cart', methods=['POST'])
 @login_required
 def add_to_cart():
     if current_user.role != 'customer':
@@ -120,60 +202,47 @@ def add_to_cart():
     
     form = AddToCartForm()
     if form.validate_on_submit():
-        product_id = form.product_id.data
         quantity = int(form.quantity.data)
         
-        # Get product info
-        product = Product.query.get(product_id)
+        # Get product info from the cached catalog
+        try:
+            product = catalog.get(int(form.product_id.data))
+        except ValueError:
+            product = None
         
         if not product:
             return jsonify({'success': False, 'message': 'Product not found'}), 404
         
-        # Update cart in session
-        cart = session.get('cart', {})
-        
-        if product_id in cart:
-            cart[product_id]['quantity'] += quantity
-        else:
-            cart[product_id] = {
-                'id': product_id,
-                'name': product.name,
-                'price': product.price,
-                'weight': product.weight,
-                'quantity': quantity
-            }
-        
-        session['cart'] = cart
+        # Update the stored cart
+        cart = cart_store.get(current_user.user_id)
+        cart.add(product, quantity)
+        cart_store.save(cart)
         
         flash(f'Added {quantity} {product.name} to cart', 'success')
         return jsonify({'success': True, 'message': 'Item added to cart', 'cart_count': len(cart)})
     
     return jsonify({'success': False, 'message': 'Invalid form submission'}), 400
 
-@app.route('/customer/cart')
+@route('/customer/cart')
 @login_required
 def customer_cart():
     if current_user.role != 'customer':
         flash('Access denied: You must be a customer to view this page', 'danger')
         return redirect(url_for('index'))
     
-    # Get cart from session
-    cart = session.get('cart', {})
-    
-    # Calculate totals
-    total_price = sum(item['price'] * item['quantity'] for item in cart.values())
-    total_weight = sum(item['weight'] * item['quantity'] for item in cart.values())
+    # Totals are kept up to date by the cart itself, and repriced when the catalog changes
+    cart = cart_store.get(current_user.user_id)
     
     # Initialize order form
     order_form = OrderForm()
     
     return render_template('customer/cart.html', 
-                          cart=cart, 
-                          total_price=total_price, 
-                          total_weight=total_weight,
+                          cart_items=cart.items(catalog), 
+                          total_price=cart.total_price, 
+                          total_weight=cart.total_weight,
                           order_form=order_form)
 
-@app.route('/customer/update_cart', methods=['POST'])
+@route('/customer/update_cart', methods=['POST'])
 @login_required
 def update_cart():
     if current_user.role != 'customer':
@@ -181,39 +250,38 @@ def update_cart():
     
     form = UpdateCartForm()
     if form.validate_on_submit():
-        product_id = form.product_id.data
         quantity = int(form.quantity.data)
         
-        # Update cart in session
-        cart = session.get('cart', {})
+        try:
+            product_id = int(form.product_id.data)
+        except ValueError:
+            product_id = None
+        
+        cart = cart_store.get(current_user.user_id)
+        product = catalog.get(product_id)
         
-        if product_id in cart:
+        if product and cart.quantity(product_id):
+            cart.set_quantity(product, quantity)
             if quantity > 0:
-                cart[product_id]['quantity'] = quantity
                 message = f'Updated quantity to {quantity}'
             else:
-                del cart[product_id]
                 message = 'Item removed from cart'
             
-            session['cart'] = cart
-            
-            # Calculate new totals
-            total_price = sum(item['price'] * item['quantity'] for item in cart.values())
-            total_weight = sum(item['weight'] * item['quantity'] for item in cart.values())
+            cart_store.save(cart)
             
             return jsonify({
                 'success': True, 
                 'message': message, 
                 'cart_count': len(cart),
-                'total_price': total_price,
-                'total_weight': total_weight
+                'total_price': cart.total_price,
+                'total_weight': cart.total_weight
             })
         
         return jsonify({'success': False, 'message': 'Item not found in cart'}), 404
     
     return jsonify({'success': False, 'message': 'Invalid form submission'}), 400
 
-@app.route('/customer/place_order', methods=['POST'])
+@route('/customer/place_order', methods=['POST'])
 @login_required
 def place_order():
     if current_user.role != 'customer':
@@ -222,68 +290,23 @@ def place_order():
     
     form = OrderForm()
     if form.validate_on_submit():
-        # Get cart from session
-        cart = session.get('cart', {})
+        cart = cart_store.get(current_user.user_id)
         
         if not cart:
             flash('Your cart is empty', 'warning')
             return redirect(url_for('customer_cart'))
         
-        # Calculate totals
-        total_price = sum(item['price'] * item['quantity'] for item in cart.values())
-        total_weight = sum(item['weight'] * item['quantity'] for item in cart.values())
-        
-        # Create new order
-        order = Order(
-            user_id=current_user.user_id,
-            address=form.address.data,
-            premium_member=form.premium_member.data,
-            delivery_type=form.delivery_type.data,
-            total_price=total_price,
-            total_weight=total_weight,
-            status='pending'
-        )
-        
-        db.session.add(order)
-        db.session.flush()  # To get the order ID
-        
-        # Add order items
-        for item_id, item_data in cart.items():
-            order_item = OrderItem(
-                order_id=order.order_id,
-                product_id=item_data['id'],
-                quantity=item_data['quantity'],
-                price=item_data['price']
-            )
-            db.session.add(order_item)
-        
-        # Store order details in hash table for O(1) lookup
-        order_details = {
-            'order_id': order.order_id,
-            'user_id': order.user_id,
-            'address': order.address,
-            'premium_member': order.premium_member,
-            'delivery_type': order.delivery_type,
-            'total_price': order.total_price,
-            'total_weight': order.total_weight,
-            'status': order.status,
-            'created_at': order.created_at.isoformat(),
-            'items': [
-                {
-                    'product_id': item_data['id'],
-                    'name': item_data['name'],
-                    'quantity': item_data['quantity'],
-                    'price': item_data['price']
-                } for item_id, item_data in cart.items()
-            ]
-        }
+        # Geocode once here so route building can reuse the stored coordinates
+        coordinates = geocode_address(form.address.data) or (None, None)
         
-        HashTable.insert(order.order_id, order_details)
-        
-        db.session.commit()
-        
-        # Clear cart
-        session['cart'] = {}
+        # Stock check, order, items, stock decrement, cache entry and emptying the cart in one transaction
+        try:
+            checkout_cart(current_user.user_id, cart.lines, form.address.data,
+                          form.premium_member.data, form.delivery_type.data, coordinates)
+        except CheckoutError as e:
+            for problem in e.problems:
+                flash(problem, 'warning')
+            return redirect(url_for('customer_cart'))
         
         flash('Order placed successfully!', 'success')
         return redirect(url_for('customer_dashboard'))
@@ -292,149 +315,329 @@ def place_order():
     return redirect(url_for('customer_cart'))
 
 # Delivery routes
-@app.route('/delivery/dashboard')
+@route('/delivery/dashboard')
 @login_required
 def delivery_dashboard():
     if current_user.role != 'delivery':
         flash('Access denied: You must be a delivery person to view this page', 'danger')
         return redirect(url_for('index'))
     
-    # Get pending orders
-    pending_orders = Order.query.filter_by(status='pending').all()
+    # One page of pending and processing orders each (keyset cursors, oldest first)
+    pending_cursor = request.args.get('pending_cursor')
+    processing_cursor = request.args.get('processing_cursor')
+    pending_orders, pending_next = order_page('pending', pending_cursor, ORDER_PAGE_SIZE)
+    processing_orders, processing_next = order_page('processing', processing_cursor, ORDER_PAGE_SIZE)
     
-    # Get processing orders
-    processing_orders = Order.query.filter_by(status='processing').all()
+    # Totals for the stats modal come from one aggregate query, not the page contents
+    stats = order_stats()
     
+    # The live feed patches the page from here on, starting at this version
     return render_template('delivery/dashboard.html', 
                           pending_orders=pending_orders,
-                          processing_orders=processing_orders)
+                          processing_orders=processing_orders,
+                          pending_cursor=pending_cursor,
+                          processing_cursor=processing_cursor,
+                          pending_next=pending_next,
+                          processing_next=processing_next,
+                          stats=stats,
+                          order_version=order_events.current_version(),
+                          page_size=ORDER_PAGE_SIZE)
 
-@app.route('/delivery/order_optimization')
+@route('/delivery/api/orders')
+@login_required
+def orders_api():
+    if current_user.role != 'delivery':
+        return jsonify({'success': False, 'message': 'Access denied'}), 403
+    
+    status = request.args.get('status', 'pending')
+    if status not in ORDER_STATUSES:
+        return jsonify({'success': False, 'message': 'Unknown order status'}), 400
+    
+    limit = clamp_page_size(request.args.get('limit', type=int))
+    orders, next_cursor = order_page(status, request.args.get('cursor'), limit)
+    for order in orders:
+        order['created_at'] = order['created_at'].isoformat()
+    
+    response = {'success': True, 'orders': orders, 'next_cursor': next_cursor}
+    if request.args.get('count') == '1':
+        response['total'] = order_stats((status,))['by_status'][status]
+    return jsonify(response)
+
+@route('/delivery/events')
+@login_required
+def order_event_stream():
+    if current_user.role != 'delivery':
+        return jsonify({'success': False, 'message': 'Access denied'}), 403
+    
+    # Each stream holds a request thread; past the limit dashboards poll the version instead
+    if not order_feed.acquire():
+        return jsonify({'success': False, 'message': 'Too many live connections, poll /delivery/orders/version'}), 503
+    
+    # Don't keep a pooled connection checked out for the life of the stream
+    db.session.close()
+    
+    stream = order_feed.stream(request.headers.get('Last-Event-ID'), request.args.get('version', type=int))
+    response = Response(stream_with_context(stream), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    response.call_on_close(order_feed.release)
+    return response
+
+@route('/delivery/orders/version')
+@login_required
+def order_feed_version():
+    if current_user.role != 'delivery':
+        return jsonify({'success': False, 'message': 'Access denied'}), 403
+    
+    # A single-row read; dashboards without a live stream poll this and resync when it moves
+    return jsonify({'success': True, 'version': order_events.current_version()})
+
+@route('/delivery/order_optimization')
 @login_required
 def order_optimization():
     if current_user.role != 'delivery':
         flash('Access denied: You must be a delivery person to view this page', 'danger')
         return redirect(url_for('index'))
     
-    # Get pending orders
-    pending_orders = Order.query.filter_by(status='pending').all()
-    
-    # Convert to list of dictionaries for the algorithm
-    orders = []
-    for order in pending_orders:
-        orders.append({
-            'order_id': order.order_id,
-            'user_id': order.user_id,
-            'address': order.address,
-            'premium_member': order.premium_member,
-            'delivery_type': order.delivery_type,
-            'total_price': order.total_price,
-            'total_weight': order.total_weight,
-            'created_at': order.created_at.isoformat()
-        })
-    
-    # Sort orders using merge sort
-    sorted_orders = merge_sort(orders, 'urgency')
+    # Pending orders in urgency order, maintained by the dispatch priority queue
+    sorted_orders = dispatch_queue.snapshot()
     
     return render_template('delivery/order_optimization.html', 
-                          pending_orders=pending_orders,
                           sorted_orders=sorted_orders)
 
-@app.route('/delivery/packing_optimization')
+def _active_vehicles():
+    """Vehicle definitions from the vehicles table, largest first"""
+    return Vehicle.query.filter_by(active=True).order_by(Vehicle.capacity.desc()).all()
+
+def _packing_job(orders, max_capacity, engine='dp', epsilon=None):
+    return job_runner.submit('packing', input_key(orders, max_capacity, engine, epsilon),
+                             orders, max_capacity, engine, epsilon, size=len(orders))
+
+def _knapsack_settings(args, orders, max_capacity):
+    """Knapsack engine and FPTAS epsilon from request arguments; 'auto' picks by order count and capacity"""
+    from algorithms import KNAPSACK_ENGINES, DEFAULT_FPTAS_EPSILON, choose_knapsack_engine
+    engine = args.get('engine', 'auto')
+    if engine not in KNAPSACK_ENGINES:
+        engine = choose_knapsack_engine(orders, max_capacity)
+    epsilon = None
+    if engine == 'fptas':
+        epsilon = min(max(args.get('epsilon', DEFAULT_FPTAS_EPSILON, type=float), 0.001), 0.5)
+    return engine, epsilon
+
+def _fleet_job(orders, vehicles, strategy):
+    return job_runner.submit('fleet', input_key(orders, vehicles, strategy),
+                             orders, vehicles, strategy, size=len(orders))
+
+def _route_inputs():
+    """Processing orders, route locations (warehouse first) and their distance matrix"""
+    # Get processing orders with stored coordinates
+    processing_orders = route_orders()
+    
+    # Create locations list - always include the warehouse
+    locations = [
+        {'id': 'warehouse', 'name': 'Warehouse (Karur)', 'lat': WAREHOUSE_LAT, 'lng': WAREHOUSE_LNG},  # Karur, Tamil Nadu
+    ]
+    
+    for order in processing_orders:
+        if order['lat'] is None or order['lng'] is None:
+            continue
+        
+        locations.append({
+            'id': f"order-{order['order_id']}",
+            'name': f"Order #{order['order_id']}",
+            'lat': order['lat'],
+            'lng': order['lng'],
+            'order_id': order['order_id']
+        })
+    
+    # Create distance matrix (haversine km, reusing cached rows for known locations);
+    # numpy-backed modules are imported on first use to keep worker start-up light
+    from distance import distance_cache
+    distances = distance_cache.matrix(locations)
+    return processing_orders, locations, distances
+
+def _route_job(locations, distances, solver):
+    return job_runner.submit('routing', input_key([location['id'] for location in locations], distances, solver),
+                             distances, solver, size=len(locations))
+
+def _zoned_route_job(locations, distances, zone_count, drivers, zoning):
+    """Zones solved side by side on the job pool, then stitched into one route per driver"""
+    from zones import partition_zones, zone_matrix, combine_zones
+    zones = []
+    started = []
+    
+    def make_parts():
+        started.append(time.perf_counter())
+        zones.extend(partition_zones(locations, zone_count, zoning))
+        return [(zone_matrix(distances, zone), 'auto') for zone in zones]
+    
+    def combine(results):
+        result = combine_zones(zones, results, distances, drivers)
+        result.update(zoning=zoning, elapsed=time.perf_counter() - started[0])
+        return result
+    
+    key = input_key([location['id'] for location in locations], distances, zone_count, drivers, zoning)
+    return job_runner.submit_parts('zoned_routing', key, 'routing', make_parts, combine,
+                                   size=len(locations) - 1)
+
+def _vrp_inputs(processing_orders, locations):
+    """Weight and delivery type of every routed order, in location order (warehouse excluded)"""
+    orders = {order['order_id']: order for order in processing_orders}
+    return [{
+        'order_id': location['order_id'],
+        'weight': orders[location['order_id']]['total_weight'],
+        'delivery_type': orders[location['order_id']]['delivery_type'],
+    } for location in locations[1:]]
+
+def _vrp_job(orders, vehicles, distances, time_windows):
+    return job_runner.submit('vehicle_routing', input_key(orders, vehicles, distances, time_windows),
+                             orders, vehicles, distances, time_windows, size=len(orders))
+
+def _zone_settings(args, stops):
+    """Zoning method, zone count and driver count from request arguments"""
+    from zones import ZONINGS, DEFAULT_ZONE_STOPS
+    zoning = args.get('zoning', 'kmeans')
+    if zoning not in ZONINGS:
+        zoning = 'kmeans'
+    # One route per active vehicle unless asked otherwise
+    drivers = args.get('drivers', type=int) or len(_active_vehicles()) or None
+    # Small zones solve exactly; every driver gets at least one
+    zone_count = args.get('zones', type=int) or max(-(-stops // DEFAULT_ZONE_STOPS), drivers or 1)
+    zone_count = min(max(zone_count, 1), max(stops, 1))
+    return zoning, zone_count, drivers
+
+def _job_pending_page(job, title, icon, size):
+    """Placeholder page that polls the job and reloads when its result is ready"""
+    status_code = 200 if job.finished else 202
+    return render_template('delivery/optimization_pending.html',
+                          job=job, title=title, icon=icon, size=size), status_code
+
+@route('/delivery/packing_optimization')
 @login_required
 def packing_optimization():
     if current_user.role != 'delivery':
         flash('Access denied: You must be a delivery person to view this page', 'danger')
         return redirect(url_for('index'))
     
-    # Get pending orders
-    pending_orders = Order.query.filter_by(status='pending').all()
-    
-    # Convert to list of dictionaries for the algorithm
-    orders = []
-    for order in pending_orders:
-        orders.append({
-            'order_id': order.order_id,
-            'user_id': order.user_id,
-            'address': order.address,
-            'premium_member': order.premium_member,
-            'delivery_type': order.delivery_type,
-            'weight': order.total_weight,
-            'value': order.total_price,  # Using price as value for knapsack
-            'created_at': order.created_at.isoformat()
-        })
-    
-    # Maximum capacity for the truck (example value)
-    max_capacity = 100  # kg
+    # Get pending orders as optimizer inputs (column-only projection)
+    orders = packing_orders()
+    pending_orders = orders
     
-    # Apply knapsack algorithm
-    selected_indices, total_value = knapsack(orders, max_capacity)
+    vehicles = _active_vehicles()
     
-    # Get selected orders
-    selected_orders = [orders[i] for i in selected_indices]
+    # Single-truck mode loads the largest vehicle (100 kg if no fleet is configured)
+    max_capacity = vehicles[0].capacity if vehicles else 100  # kg
     
-    # Total weight of selected orders
-    total_weight = sum(order['weight'] for order in selected_orders)
+    mode = request.args.get('mode', 'single')
+    if mode == 'fleet':
+        strategy = request.args.get('strategy', 'best_fit')
+        if strategy not in STRATEGIES:
+            strategy = 'best_fit'
+        
+        # Assign all pending orders across the whole fleet (solved off the request thread)
+        job = _fleet_job(orders, [vehicle.to_dict() for vehicle in vehicles], strategy)
+        if job.status != 'done':
+            return _job_pending_page(job, 'Packing Optimization', 'fa-box-open', len(orders))
+        
+        return render_template('delivery/packing_optimization.html',
+                              mode=mode,
+                              pending_orders=pending_orders,
+                              fleet_result=job.result,
+                              strategies=STRATEGIES,
+                              max_capacity=max_capacity)
+    
+    # Exact DP while its table stays small, anytime branch-and-bound (or FPTAS on request) beyond
+    engine, epsilon = _knapsack_settings(request.args, orders, max_capacity)
+    
+    # Apply knapsack algorithm: the incremental table follows single order changes in
+    # O(capacity); a first solve too big to build here runs off the request thread
+    result = reoptimizer.packing_solution(orders, max_capacity) if engine == 'dp' else None
+    if result is None:
+        job = _packing_job(orders, max_capacity, engine, epsilon)
+        if job.status != 'done':
+            return _job_pending_page(job, 'Packing Optimization', 'fa-box-open', len(orders))
+        result = job.result
+    
+    # Get selected orders (in pending order)
+    selected_ids = set(result['selected_order_ids'])
+    selected_orders = [order for order in orders if order['order_id'] in selected_ids]
     
     return render_template('delivery/packing_optimization.html', 
+                          mode='single',
                           pending_orders=pending_orders,
                           selected_orders=selected_orders,
-                          total_value=total_value,
-                          total_weight=total_weight,
-                          max_capacity=max_capacity)
+                          total_value=result['total_value'],
+                          total_weight=result['total_weight'],
+                          max_capacity=max_capacity,
+                          packing_result=result)
 
-@app.route('/delivery/route_optimization')
+@route('/delivery/route_optimization')
 @login_required
 def route_optimization():
     if current_user.role != 'delivery':
         flash('Access denied: You must be a delivery person to view this page', 'danger')
         return redirect(url_for('index'))
     
-    # Get processing orders
-    processing_orders = Order.query.filter_by(status='processing').all()
+    processing_orders, locations, distances = _route_inputs()
+    
+    mode = request.args.get('mode')
+    if mode not in ('zones', 'fleet'):
+        mode = 'single'
     
     # Default values (for when there are no orders)
     route = []
     route_locations = []
     total_distance = 0
-    
-    # Create locations list - always include the warehouse
-    locations = [
-        {'name': 'Warehouse (Karur)', 'lat': 10.9601, 'lng': 78.0766},  # Karur, Tamil Nadu
-    ]
+    route_result = None
+    zoned_result = None
+    fleet_result = None
+    time_windows = request.args.get('windows', '1') != '0'
     
     # Only proceed with route optimization if we have orders to process
     if processing_orders:
-        for order in processing_orders:
-            # Generate locations for demonstration
-            import random
-            lat_offset = random.uniform(-0.1, 0.1)
-            lng_offset = random.uniform(-0.1, 0.1)
+        if len(locations) > 1 and mode == 'zones':
+            # Zones around the warehouse are routed in parallel, then split among the drivers
+            zoning, zone_count, drivers = _zone_settings(request.args, len(locations) - 1)
+            job = _zoned_route_job(locations, distances, zone_count, drivers, zoning)
+            if job.status != 'done':
+                return _job_pending_page(job, 'Zoned Route Optimization', 'fa-route', len(locations) - 1)
             
-            # Generate locations around Karur
-            locations.append({
-                'name': f'Order #{order.order_id}',
-                'lat': 10.9601 + lat_offset,
-                'lng': 78.0766 + lng_offset,
-                'order_id': order.order_id
-            })
-        
-        # Create distance matrix
-        n = len(locations)
-        distances = [[0 for _ in range(n)] for _ in range(n)]
-        
-        # Calculate Euclidean distances between locations
-        for i in range(n):
-            for j in range(n):
-                if i != j:
-                    # Simple Euclidean distance for demonstration
-                    distances[i][j] = ((locations[i]['lat'] - locations[j]['lat'])**2 + 
-                                     (locations[i]['lng'] - locations[j]['lng'])**2)**0.5
-        
+            zoned_result = job.result
+            route = [index for driver in zoned_result['drivers'] for index in driver['route']]
+            total_distance = zoned_result['distance']
+        elif len(locations) > 1 and mode == 'fleet':
+            # Loads and trips for the whole fleet at once, respecting capacities
+            vehicles = [vehicle.to_dict() for vehicle in _active_vehicles()]
+            if not vehicles:
+                flash('Add an active vehicle to plan fleet trips', 'warning')
+                return redirect(url_for('route_optimization'))
+            job = _vrp_job(_vrp_inputs(processing_orders, locations), vehicles, distances, time_windows)
+            if job.status != 'done':
+                return _job_pending_page(job, 'Fleet Trip Planning', 'fa-truck-moving', len(locations) - 1)
+            
+            fleet_result = job.result
+            route = [index for vehicle in fleet_result['vehicles']
+                     for trip in vehicle['trips'] for index in trip['route']]
+            total_distance = fleet_result['distance']
         # Only apply TSP if we have more than just the warehouse
-        if n > 1:
-            # Apply TSP to find optimal route
-            route, total_distance = tsp_dynamic_programming(distances)
+        elif len(locations) > 1:
+            # Exact for small runs, heuristic with a time budget for large ones
+            solver = request.args.get('solver', 'auto')
+            from routing import SOLVERS
+            if solver not in SOLVERS:
+                solver = 'auto'
+            
+            # Stops added or removed since the last full solve are inserted/spliced in O(n)
+            route_result = reoptimizer.route_solution(locations) if solver == 'auto' else None
+            if route_result is None:
+                job = _route_job(locations, distances, solver)
+                if job.status != 'done':
+                    return _job_pending_page(job, 'Route Optimization', 'fa-route', len(locations) - 1)
+                
+                route_result = job.result
+                reoptimizer.route_solved(locations, route_result, distances)
+            
+            route = route_result['route']
+            total_distance = route_result['distance']
             
             # Get locations in route order
             route_locations = [locations[i] for i in route]
@@ -444,13 +647,126 @@ def route_optimization():
             route_locations = [locations[0]]
     
     return render_template('delivery/route_optimization.html', 
+                          mode=mode,
                           processing_orders=processing_orders,
                           locations=locations,
                           route=route,
                           route_locations=route_locations,
-                          total_distance=total_distance)
+                          total_distance=total_distance,
+                          route_result=route_result,
+                          zoned_result=zoned_result,
+                          fleet_result=fleet_result,
+                          time_windows=time_windows)
+
+@route('/delivery/jobs', methods=['POST'])
+@login_required
+def submit_optimization_job():
+    if current_user.role != 'delivery':
+        return jsonify({'success': False, 'message': 'Access denied'}), 403
+    
+    kind = request.form.get('kind')
+    
+    # Inputs are always read from the current backlog, never from the client
+    if kind == 'packing':
+        vehicles = _active_vehicles()
+        orders = packing_orders()
+        max_capacity = vehicles[0].capacity if vehicles else 100
+        job = _packing_job(orders, max_capacity, *_knapsack_settings(request.form, orders, max_capacity))
+    elif kind == 'fleet':
+        strategy = request.form.get('strategy', 'best_fit')
+        if strategy not in STRATEGIES:
+            return jsonify({'success': False, 'message': 'Unknown packing strategy'}), 400
+        job = _fleet_job(packing_orders(), [vehicle.to_dict() for vehicle in _active_vehicles()], strategy)
+    elif kind == 'routing':
+        solver = request.form.get('solver', 'auto')
+        from routing import SOLVERS
+        if solver != 'auto' and solver not in SOLVERS:
+            return jsonify({'success': False, 'message': 'Unknown route solver'}), 400
+        _, locations, distances = _route_inputs()
+        if len(locations) < 2:
+            return jsonify({'success': False, 'message': 'No processing orders to route'}), 400
+        job = _route_job(locations, distances, solver)
+    elif kind == 'zoned_routing':
+        _, locations, distances = _route_inputs()
+        if len(locations) < 2:
+            return jsonify({'success': False, 'message': 'No processing orders to route'}), 400
+        zoning, zone_count, drivers = _zone_settings(request.form, len(locations) - 1)
+        job = _zoned_route_job(locations, distances, zone_count, drivers, zoning)
+    elif kind == 'vehicle_routing':
+        processing_orders, locations, distances = _route_inputs()
+        vehicles = [vehicle.to_dict() for vehicle in _active_vehicles()]
+        if len(locations) < 2 or not vehicles:
+            return jsonify({'success': False, 'message': 'No processing orders or active vehicles to route'}), 400
+        job = _vrp_job(_vrp_inputs(processing_orders, locations), vehicles, distances,
+                       request.form.get('windows', '1') != '0')
+    elif kind == 'prioritisation':
+        orders = optimizer_orders('pending')
+        job = job_runner.submit('prioritisation', input_key(orders), orders, size=len(orders))
+    else:
+        return jsonify({'success': False, 'message': 'Unknown job kind'}), 400
+    
+    return jsonify({'success': True, 'job': job.to_dict(include_result=False)}), 202
 
-@app.route('/delivery/update_order_status', methods=['POST'])
+@route('/delivery/jobs/<job_id>')
+@login_required
+def optimization_job(job_id):
+    if current_user.role != 'delivery':
+        return jsonify({'success': False, 'message': 'Access denied'}), 403
+    
+    job = job_runner.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'message': 'Job not found'}), 404
+    
+    include_result = request.args.get('result', '1') != '0'
+    return jsonify({'success': True, 'job': job.to_dict(include_result=include_result)})
+
+@route('/delivery/jobs/<job_id>/cancel', methods=['POST'])
+@login_required
+def cancel_optimization_job(job_id):
+    if current_user.role != 'delivery':
+        return jsonify({'success': False, 'message': 'Access denied'}), 403
+    
+    cancelled = job_runner.cancel(job_id)
+    if cancelled is None:
+        return jsonify({'success': False, 'message': 'Job not found'}), 404
+    if not cancelled:
+        return jsonify({'success': False, 'message': 'Job has already started'}), 409
+    
+    return jsonify({'success': True, 'message': 'Job cancelled'})
+
+@route('/delivery/nearby_orders')
+@login_required
+def nearby_orders():
+    if current_user.role != 'delivery':
+        return jsonify({'success': False, 'message': 'Access denied'}), 403
+    
+    lat = request.args.get('lat', WAREHOUSE_LAT, type=float)
+    lng = request.args.get('lng', WAREHOUSE_LNG, type=float)
+    k = min(max(request.args.get('k', 5, type=int), 1), 50)
+    status = request.args.get('status')
+    
+    if status and status not in order_index.ACTIVE_STATUSES:
+        return jsonify({'success': False, 'message': 'Status must be pending or processing'}), 400
+    
+    # Nearest-neighbour lookup over stored coordinates via the grid index
+    orders = order_index.nearest(lat, lng, k=k, status=status)
+    
+    return jsonify({'success': True, 'orders': orders})
+
+@route('/delivery/order_details/<int:order_id>')
+@login_required
+def order_details(order_id):
+    if current_user.role != 'delivery':
+        return jsonify({'success': False, 'message': 'Access denied'}), 403
+    
+    details = order_cache.get(order_id)
+    
+    if not details:
+        return jsonify({'success': False, 'message': 'Order not found'}), 404
+    
+    return jsonify({'success': True, 'order': details})
+
+@route('/delivery/update_order_status', methods=['POST'])
 @login_required
 def update_order_status():
     if current_user.role != 'delivery':
@@ -480,14 +796,48 @@ def update_order_status():
     if not order:
         return jsonify({'success': False, 'message': 'Order not found'}), 404
     
-    # Update status
+    # Update status and the cached order details in one transaction
     order.status = new_status
+    order_cache.update(order.order_id, status=new_status)
+    # The dispatch queue, spatial index and optimizers follow via the status change hook
     db.session.commit()
     
-    # Update hash table
-    order_details = HashTable.get(order_id)
-    if order_details:
-        order_details['status'] = new_status
-        HashTable.insert(order_id, order_details)
-    
     return jsonify({'success': True, 'message': f'Order status updated to {new_status}'})
+
+@route('/delivery/orders/status', methods=['POST'])
+@login_required
+def bulk_update_order_status():
+    if current_user.role != 'delivery':
+        return jsonify({'success': False, 'message': 'Access denied'}), 403
+    
+    # JSON {"order_ids": [...], "status": ...} or form fields order_ids (repeated) and status;
+    # the CSRF token comes from the form or the X-CSRFToken header
+    data = request.get_json(silent=True)
+    if data is not None and not isinstance(data, dict):
+        return jsonify({'success': False, 'message': 'Expected a JSON object'}), 400
+    order_ids = data.get('order_ids') if data else request.form.getlist('order_ids')
+    new_status = data.get('status') if data else request.form.get('status')
+    
+    if not order_ids or not new_status:
+        return jsonify({'success': False, 'message': 'Missing order IDs or status'}), 400
+    if not isinstance(order_ids, list) or not all(
+            isinstance(order_id, (int, str)) and not isinstance(order_id, bool) for order_id in order_ids):
+        return jsonify({'success': False, 'message': 'order_ids must be a list of order IDs'}), 400
+    if new_status not in ORDER_STATUSES[1:]:
+        return jsonify({'success': False, 'message': 'Unknown order status'}), 400
+    if len(order_ids) > MAX_BULK_ORDERS:
+        return jsonify({'success': False, 'message': f'At most {MAX_BULK_ORDERS} orders per request'}), 400
+    try:
+        order_ids = [int(order_id) for order_id in order_ids]
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Invalid order ID'}), 400
+    
+    results = update_order_statuses(order_ids, new_status)
+    updated = sum(1 for result in results.values() if result['success'])
+    
+    return jsonify({
+        'success': updated > 0,
+        'message': f'{updated} of {len(results)} orders updated to {new_status}',
+        'updated': updated,
+        'results': [{'order_id': order_id, **result} for order_id, result in results.items()]
+    })
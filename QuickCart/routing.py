@@ -0,0 +1,483 @@
+import time
+import numpy as np
+from algorithms import tsp_dynamic_programming
+from distance import METRICS
+
+# Largest run (warehouse included) that is solved exactly with Held-Karp
+EXACT_MAX_LOCATIONS = 13
+
+# Default wall-clock budget for the local search, in seconds
+DEFAULT_TIME_BUDGET = 0.5
+
+# Subgradient iterations used to tighten the 1-tree lower bound
+BOUND_ITERATIONS = 30
+
+
+def route_length(route, distances):
+    """
+    Total length of a closed route
+
+    Args:
+        route: List of location indices, starting and ending at the warehouse
+        distances: Matrix of distances between locations
+
+    Returns:
+        Sum of the distances along the route
+    """
+    return sum(distances[route[i]][route[i + 1]] for i in range(len(route) - 1))
+
+
+def nearest_neighbor_route(distances, start=0):
+    """
+    Build a starting route by always driving to the closest unvisited location
+
+    Args:
+        distances: Matrix of distances between locations
+        start: Index of the warehouse
+
+    Returns:
+        Closed route starting and ending at the warehouse
+    """
+    n = len(distances)
+    unvisited = set(range(n))
+    unvisited.discard(start)
+    route = [start]
+    pos = start
+
+    while unvisited:
+        row = distances[pos]
+        pos = min(unvisited, key=row.__getitem__)
+        unvisited.remove(pos)
+        route.append(pos)
+
+    route.append(start)
+    return route
+
+
+def two_opt(route, distances, deadline):
+    """
+    Remove crossing edges by reversing route segments (in place)
+
+    Args:
+        route: Closed route to improve
+        distances: Matrix of distances between locations
+        deadline: time.perf_counter() value after which the search stops
+
+    Returns:
+        True if the route was improved
+    """
+    size = len(route)
+    changed = False
+    improved = True
+
+    while improved and time.perf_counter() < deadline:
+        improved = False
+        for i in range(1, size - 2):
+            a = route[i - 1]
+            b = route[i]
+            row_a = distances[a]
+            row_b = distances[b]
+            d_ab = row_a[b]
+            for j in range(i + 1, size - 1):
+                c = route[j]
+                d = route[j + 1]
+                delta = row_a[c] + row_b[d] - d_ab - distances[c][d]
+                if delta < -1e-9:
+                    route[i:j + 1] = route[i:j + 1][::-1]
+                    b = route[i]
+                    row_b = distances[b]
+                    d_ab = row_a[b]
+                    improved = changed = True
+            if time.perf_counter() >= deadline:
+                break
+
+    return changed
+
+
+def or_opt(route, distances, deadline, max_segment=3):
+    """
+    Move short segments of consecutive stops to a cheaper position (in place)
+
+    Args:
+        route: Closed route to improve
+        distances: Matrix of distances between locations
+        deadline: time.perf_counter() value after which the search stops
+        max_segment: Longest segment that is relocated
+
+    Returns:
+        True if the route was improved
+    """
+    changed = False
+    improved = True
+
+    while improved and time.perf_counter() < deadline:
+        improved = False
+        for length in range(1, max_segment + 1):
+            i = 1
+            while i + length < len(route):
+                first = route[i]
+                last = route[i + length - 1]
+                prev = route[i - 1]
+                nxt = route[i + length]
+                removal_gain = distances[prev][first] + distances[last][nxt] - distances[prev][nxt]
+
+                # Find the cheapest gap outside the segment, trying both orientations
+                best_delta = -1e-9
+                best = None
+                for j in range(len(route) - 1):
+                    if i - 1 <= j <= i + length - 1:
+                        continue
+                    c = route[j]
+                    d = route[j + 1]
+                    d_cd = distances[c][d]
+                    forward = distances[c][first] + distances[last][d] - d_cd - removal_gain
+                    backward = distances[c][last] + distances[first][d] - d_cd - removal_gain
+                    if forward < best_delta:
+                        best_delta = forward
+                        best = (j, False)
+                    if backward < best_delta:
+                        best_delta = backward
+                        best = (j, True)
+
+                if best is not None:
+                    j, reverse = best
+                    segment = route[i:i + length]
+                    if reverse:
+                        segment.reverse()
+                    del route[i:i + length]
+                    if j > i:
+                        j -= length
+                    route[j + 1:j + 1] = segment
+                    improved = changed = True
+
+                i += 1
+                if time.perf_counter() >= deadline:
+                    return changed
+
+    return changed
+
+
+def one_tree_lower_bound(distances, upper_bound=None, iterations=BOUND_ITERATIONS, deadline=None):
+    """
+    Held-Karp 1-tree lower bound on the optimal tour length
+
+    A minimum spanning tree over every location except the warehouse, plus the
+    two cheapest warehouse edges, is never longer than the optimal tour. Node
+    penalties from a few subgradient steps tighten the bound.
+
+    Args:
+        distances: Symmetric matrix of distances between locations
+        upper_bound: Length of a known route, used to size the subgradient steps
+        iterations: Number of subgradient steps
+        deadline: Optional time.perf_counter() value after which no more steps run
+
+    Returns:
+        Lower bound on the length of any closed route
+    """
+    n = len(distances)
+    if n <= 1:
+        return 0
+    if n == 2:
+        return distances[0][1] + distances[1][0]
+
+    inf = float('inf')
+    penalty = [0.0] * n
+    best_bound = 0.0
+    scale = 2.0
+
+    for _ in range(max(iterations, 1)):
+        # Prim's algorithm over locations 1..n-1 with penalised edge costs
+        in_tree = [False] * n
+        key = [inf] * n
+        degree = [0] * n
+        key[1] = 0.0
+        parent = [-1] * n
+        tree_cost = 0.0
+
+        for _ in range(n - 1):
+            u = -1
+            u_key = inf
+            for v in range(1, n):
+                if not in_tree[v] and key[v] < u_key:
+                    u = v
+                    u_key = key[v]
+            in_tree[u] = True
+            tree_cost += u_key
+            if parent[u] != -1:
+                degree[u] += 1
+                degree[parent[u]] += 1
+            row = distances[u]
+            pu = penalty[u]
+            for v in range(1, n):
+                if not in_tree[v]:
+                    cost = row[v] + pu + penalty[v]
+                    if cost < key[v]:
+                        key[v] = cost
+                        parent[v] = u
+
+        # Connect the warehouse with its two cheapest penalised edges
+        warehouse_edges = sorted(
+            (distances[0][v] + penalty[0] + penalty[v], v) for v in range(1, n)
+        )[:2]
+        for cost, v in warehouse_edges:
+            tree_cost += cost
+            degree[v] += 1
+        degree[0] = 2
+
+        bound = tree_cost - 2 * sum(penalty)
+        if bound > best_bound:
+            best_bound = bound
+        else:
+            scale /= 2
+
+        # A 1-tree where every degree is 2 is itself an optimal tour
+        subgradient = [d - 2 for d in degree]
+        norm = sum(g * g for g in subgradient)
+        if norm == 0:
+            break
+        if deadline is not None and time.perf_counter() >= deadline:
+            break
+
+        # Polyak step towards the known route length
+        target = upper_bound if upper_bound is not None else bound * 1.05
+        step = scale * max(target - bound, 1e-9) / norm
+        for v in range(n):
+            penalty[v] += step * subgradient[v]
+
+    return best_bound
+
+
+def solve_exact(distances, time_budget=None):
+    """Exact Held-Karp solve; the result is optimal so the bound is the distance itself"""
+    route, total_distance = tsp_dynamic_programming(distances)
+    return route, total_distance, total_distance
+
+
+def solve_heuristic(distances, time_budget=DEFAULT_TIME_BUDGET):
+    """Nearest-neighbour construction followed by 2-opt and Or-opt within the time budget"""
+    started = time.perf_counter()
+    deadline = started + time_budget
+    route = nearest_neighbor_route(distances)
+
+    if len(route) > 4:
+        improved = True
+        while improved and time.perf_counter() < deadline:
+            improved = two_opt(route, distances, deadline)
+            improved = or_opt(route, distances, deadline) or improved
+
+    # The bound gets whatever is left of the budget, but always at least one 1-tree
+    total_distance = route_length(route, distances)
+    lower_bound = one_tree_lower_bound(distances, total_distance, deadline=deadline)
+    return route, total_distance, lower_bound
+
+
+# Registry of available route solvers, keyed by the name reported with each route
+SOLVERS = {
+    'exact': solve_exact,
+    'heuristic': solve_heuristic,
+}
+
+
+def register_solver(name, solver):
+    """
+    Register an additional route solver
+
+    Args:
+        name: Name used to select the solver and reported with its routes
+        solver: Callable taking (distances, time_budget) and returning
+                (route, total_distance, lower_bound)
+    """
+    SOLVERS[name] = solver
+
+
+def solve_route(distances, method='auto', time_budget=DEFAULT_TIME_BUDGET):
+    """
+    Solve a delivery route with the most suitable solver
+
+    Args:
+        distances: Matrix of distances between locations, warehouse at index 0
+        method: Solver name from SOLVERS, or 'auto' to pick exact for small
+                runs and the heuristic otherwise
+        time_budget: Wall-clock budget in seconds for heuristic solvers
+
+    Returns:
+        Dictionary with the route, its distance, the solver used, a lower bound
+        on the optimal distance and the resulting optimality gap
+    """
+    # Row lookups on nested lists are much faster than on array types
+    if hasattr(distances, 'tolist'):
+        distances = distances.tolist()
+
+    n = len(distances)
+    if method == 'auto':
+        method = 'exact' if n <= EXACT_MAX_LOCATIONS else 'heuristic'
+
+    if method not in SOLVERS:
+        raise ValueError(f"Unknown route solver: {method}")
+
+    started = time.perf_counter()
+    route, total_distance, lower_bound = SOLVERS[method](distances, time_budget)
+    elapsed = time.perf_counter() - started
+
+    lower_bound = min(lower_bound, total_distance)
+    gap = (total_distance - lower_bound) / total_distance if total_distance > 0 else 0.0
+
+    return {
+        'route': route,
+        'distance': total_distance,
+        'solver': method,
+        'lower_bound': lower_bound,
+        'gap': gap,
+        'optimal': gap <= 1e-9,
+        'elapsed': elapsed,
+    }
+
+
+class IncrementalRoute:
+    """
+    Closed route over a changing set of stops, kept up to date without re-solving
+
+    A new stop goes where it lengthens the route least (cheapest insertion)
+    and a removed stop is spliced out; both are O(n). The lower bound from
+    the last full solve stays valid when stops are added (with a metric
+    distance, an extra stop can't shorten the optimal tour) and drops by
+    twice the removed stop's distance to its nearest neighbour when one is
+    removed, so the reported gap stays honest as the route drifts.
+    """
+
+    def __init__(self, metric='haversine'):
+        self.metric = METRICS[metric]
+        self.clear()
+
+    def clear(self):
+        """Forget the route; it must be loaded from a full solve again"""
+        self.ids = []
+        self._lats = np.empty(0, dtype=np.float64)
+        self._lngs = np.empty(0, dtype=np.float64)
+        self._edges = np.empty(0, dtype=np.float64)  # edge i runs from stop i to stop i + 1 (wrapping)
+        self.lower_bound = 0.0
+        self.base_gap = 0.0
+        self.edits = 0
+
+    @property
+    def loaded(self):
+        return bool(self.ids)
+
+    @property
+    def distance(self):
+        return float(self._edges.sum())
+
+    @property
+    def gap(self):
+        distance = self.distance
+        return (distance - min(self.lower_bound, distance)) / distance if distance > 0 else 0.0
+
+    def load(self, locations, route_result, distances):
+        """
+        Start from a full solve
+
+        Args:
+            locations: Location dictionaries with 'id', 'lat' and 'lng', warehouse first
+            route_result: Result of solve_route over these locations
+            distances: The distance matrix the route was solved on
+        """
+        route = route_result['route'][:-1] or [0]
+        self.ids = [locations[i]['id'] for i in route]
+        self._lats = np.array([locations[i]['lat'] for i in route], dtype=np.float64)
+        self._lngs = np.array([locations[i]['lng'] for i in route], dtype=np.float64)
+        self._edges = np.array([distances[route[k]][route[(k + 1) % len(route)]] for k in range(len(route))],
+                               dtype=np.float64) if len(route) > 1 else np.zeros(1)
+        self.lower_bound = float(route_result['lower_bound'])
+        self.base_gap = self.gap
+        self.edits = 0
+
+    def _row(self, lat, lng):
+        return self.metric([lat], [lng], self._lats, self._lngs)[0].astype(np.float64)
+
+    def insert(self, location_id, lat, lng):
+        """Add a stop at its cheapest position"""
+        if location_id in self.ids:
+            self.remove(location_id)
+
+        row = self._row(lat, lng)
+        if len(self.ids) == 1:
+            position = 1
+            self._edges = np.array([row[0], row[0]])
+        else:
+            # Replacing edge i (stop i -> i + 1) by stop i -> new -> i + 1
+            costs = row + np.roll(row, -1) - self._edges
+            i = int(np.argmin(costs))
+            position = i + 1
+            self._edges = np.concatenate((self._edges[:i], [row[i], row[(i + 1) % len(row)]], self._edges[i + 1:]))
+
+        self.ids.insert(position, location_id)
+        self._lats = np.insert(self._lats, position, lat)
+        self._lngs = np.insert(self._lngs, position, lng)
+        self.edits += 1
+
+    def remove(self, location_id):
+        """Splice a stop out of the route; the warehouse (first stop) stays"""
+        try:
+            i = self.ids.index(location_id)
+        except ValueError:
+            return
+        if i == 0:
+            return
+
+        lat, lng = self._lats[i], self._lngs[i]
+        del self.ids[i]
+        self._lats = np.delete(self._lats, i)
+        self._lngs = np.delete(self._lngs, i)
+
+        n = len(self.ids)
+        if n == 1:
+            self._edges = np.zeros(1)
+            self.lower_bound = 0.0
+        else:
+            previous, following = i - 1, i % n
+            bridge = float(self.metric([self._lats[previous]], [self._lngs[previous]],
+                                       [self._lats[following]], [self._lngs[following]])[0][0])
+            self._edges = np.delete(self._edges, i)
+            self._edges[previous] = bridge
+            nearest = float(self._row(lat, lng).min())
+            self.lower_bound = max(0.0, self.lower_bound - 2 * nearest)
+        self.edits += 1
+
+    def sync(self, locations, max_changes):
+        """
+        Bring the route in line with a location list by inserting and removing stops
+
+        Returns:
+            False (leaving the route unchanged) if it isn't loaded, the
+            warehouse differs or more than max_changes stops changed
+        """
+        if not self.loaded or locations[0]['id'] != self.ids[0]:
+            return False
+
+        wanted = {location['id']: location for location in locations[1:]}
+        current = set(self.ids[1:])
+        removed = current - wanted.keys()
+        added = [location_id for location_id in wanted if location_id not in current]
+        if len(removed) + len(added) > max_changes:
+            return False
+
+        for location_id in removed:
+            self.remove(location_id)
+        for location_id in added:
+            self.insert(location_id, wanted[location_id]['lat'], wanted[location_id]['lng'])
+        return True
+
+    def result(self, locations):
+        """Route over a location list in the shape returned by solve_route"""
+        index = {location['id']: i for i, location in enumerate(locations)}
+        distance = self.distance
+        lower_bound = min(self.lower_bound, distance)
+        return {
+            'route': [index[location_id] for location_id in self.ids] + [0],
+            'distance': distance,
+            'solver': 'incremental',
+            'lower_bound': lower_bound,
+            'gap': self.gap,
+            'optimal': self.gap <= 1e-9,
+            'elapsed': 0.0,
+        }
@@ -0,0 +1,216 @@
+import math
+import threading
+import time
+from geocoding import WAREHOUSE_LAT
+
+# Kilometres per degree of latitude
+KM_PER_DEGREE = 111.32
+
+
+class GridIndex:
+    """
+    Uniform grid spatial index for nearest-neighbour lookups
+
+    Points are projected to kilometres around a reference latitude and
+    bucketed into square cells. Lookups walk outwards ring by ring and stop as
+    soon as no unvisited cell can hold a closer point, so a query only touches
+    the cells around the query location.
+    """
+
+    def __init__(self, cell_size_km=2.0, reference_lat=WAREHOUSE_LAT):
+        self.cell_size_km = cell_size_km
+        self._lng_scale = KM_PER_DEGREE * math.cos(math.radians(reference_lat))
+        self._cells = {}
+        self._points = {}
+        self._bounds = None
+
+    def __len__(self):
+        return len(self._points)
+
+    def __contains__(self, key):
+        return key in self._points
+
+    def _project(self, lat, lng):
+        return lng * self._lng_scale, lat * KM_PER_DEGREE
+
+    def _cell(self, x, y):
+        return int(math.floor(x / self.cell_size_km)), int(math.floor(y / self.cell_size_km))
+
+    def insert(self, key, lat, lng, data=None):
+        """Add or move a point; `data` is returned with lookup results"""
+        self.remove(key)
+        x, y = self._project(lat, lng)
+        cell = self._cell(x, y)
+        self._points[key] = (x, y, cell, data)
+        self._cells.setdefault(cell, set()).add(key)
+
+        # Bounding box of occupied cells; only ever grows until clear()
+        if self._bounds is None:
+            self._bounds = [cell[0], cell[1], cell[0], cell[1]]
+        else:
+            bounds = self._bounds
+            bounds[0] = min(bounds[0], cell[0])
+            bounds[1] = min(bounds[1], cell[1])
+            bounds[2] = max(bounds[2], cell[0])
+            bounds[3] = max(bounds[3], cell[1])
+
+    def get(self, key):
+        """Data stored with a point, or None"""
+        point = self._points.get(key)
+        return point[3] if point is not None else None
+
+    def remove(self, key):
+        """Remove a point if present"""
+        point = self._points.pop(key, None)
+        if point is None:
+            return
+        bucket = self._cells.get(point[2])
+        if bucket is not None:
+            bucket.discard(key)
+            if not bucket:
+                del self._cells[point[2]]
+
+    def clear(self):
+        self._cells.clear()
+        self._points.clear()
+        self._bounds = None
+
+    def nearest(self, lat, lng, k=1, predicate=None, max_distance_km=None):
+        """
+        The k closest points to a location
+
+        Args:
+            lat, lng: Query location in degrees
+            k: Number of points to return
+            predicate: Optional callable on a point's data; points failing it are skipped
+            max_distance_km: Optional search radius
+
+        Returns:
+            List of (distance_km, key, data) tuples, closest first
+        """
+        if not self._points or k <= 0:
+            return []
+
+        x, y = self._project(lat, lng)
+        cx, cy = self._cell(x, y)
+        found = []
+
+        # No point can be further than this many rings from the query cell
+        min_x, min_y, max_x, max_y = self._bounds
+        max_ring = max(cx - min_x, max_x - cx, cy - min_y, max_y - cy, 0)
+        if max_distance_km is not None:
+            max_ring = min(max_ring, int(max_distance_km // self.cell_size_km) + 1)
+
+        for ring in range(max_ring + 1):
+            for cell in self._ring_cells(cx, cy, ring):
+                for key in self._cells.get(cell, ()):
+                    px, py, _, data = self._points[key]
+                    if predicate is not None and not predicate(data):
+                        continue
+                    distance = math.hypot(px - x, py - y)
+                    if max_distance_km is None or distance <= max_distance_km:
+                        found.append((distance, key, data))
+
+            # Cells beyond this ring are at least ring * cell_size away
+            if len(found) >= k:
+                found.sort(key=lambda item: item[0])
+                if found[k - 1][0] <= ring * self.cell_size_km:
+                    break
+
+        found.sort(key=lambda item: item[0])
+        return found[:k]
+
+    def within(self, lat, lng, radius_km, predicate=None):
+        """All points within a radius, closest first"""
+        return self.nearest(lat, lng, k=len(self._points), predicate=predicate,
+                            max_distance_km=radius_km)
+
+    @staticmethod
+    def _ring_cells(cx, cy, ring):
+        if ring == 0:
+            yield cx, cy
+            return
+        for dx in range(-ring, ring + 1):
+            yield cx + dx, cy - ring
+            yield cx + dx, cy + ring
+        for dy in range(-ring + 1, ring):
+            yield cx - ring, cy + dy
+            yield cx + ring, cy + dy
+
+
+class OrderIndex:
+    """
+    Spatial index over pending and processing orders
+
+    Loaded from stored order coordinates on first use and kept in step by
+    the Order.status change hook. Changes made by other worker processes are
+    picked up by a periodic reload.
+    """
+
+    ACTIVE_STATUSES = ('pending', 'processing')
+
+    def __init__(self, refresh_interval=60, cell_size_km=2.0):
+        self.refresh_interval = refresh_interval
+        self._grid = GridIndex(cell_size_km)
+        self._loaded_at = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        from models import Order
+
+        rows = Order.query.with_entities(Order.order_id, Order.lat, Order.lng, Order.status)\
+                          .filter(Order.status.in_(self.ACTIVE_STATUSES),
+                                  Order.lat.isnot(None), Order.lng.isnot(None))\
+                          .all()
+        self._grid.clear()
+        for order_id, lat, lng, status in rows:
+            self._grid.insert(order_id, lat, lng, {'order_id': order_id, 'lat': lat,
+                                                   'lng': lng, 'status': status})
+        self._loaded_at = time.monotonic()
+
+    def _ensure_loaded(self):
+        if self._loaded_at is None or time.monotonic() - self._loaded_at > self.refresh_interval:
+            self._load()
+
+    def invalidate(self):
+        """Force a reload from the database on next use"""
+        with self._lock:
+            self._loaded_at = None
+
+    def update(self, order_id, status, lat=None, lng=None):
+        """Record a new or changed order; orders leaving the active statuses are dropped"""
+        with self._lock:
+            if self._loaded_at is None:
+                return
+            if status not in self.ACTIVE_STATUSES:
+                self._grid.remove(order_id)
+                return
+            if lat is None or lng is None:
+                data = self._grid.get(order_id)
+                if data is None:
+                    return
+                lat, lng = data['lat'], data['lng']
+            self._grid.insert(order_id, lat, lng, {'order_id': order_id, 'lat': lat,
+                                                   'lng': lng, 'status': status})
+
+    def handle_status_changes(self, changes):
+        """Apply committed status changes (order_events subscriber)"""
+        for change in changes:
+            self.update(change.order_id, change.new_status, change.order['lat'], change.order['lng'])
+
+    def nearest(self, lat, lng, k=5, status=None, max_distance_km=None):
+        """
+        Closest active orders to a location
+
+        Returns:
+            List of dictionaries with order_id, lat, lng, status and distance_km
+        """
+        with self._lock:
+            self._ensure_loaded()
+            predicate = (lambda data: data['status'] == status) if status else None
+            results = self._grid.nearest(lat, lng, k, predicate, max_distance_km)
+        return [dict(data, distance_km=round(distance, 3)) for distance, _, data in results]
+
+
+# Shared index used by the delivery views
+order_index = OrderIndex()
@@ -1,6 +1,9 @@
 // Delivery dashboard functionality for QuickCart
 
 document.addEventListener('DOMContentLoaded', function() {
+    // Set once the live order feed is connected; its events then keep the lists current
+    let orderFeedLive = false;
+    
     // Function to attach event listener to status buttons
     function attachStatusButtonListener(button) {
         button.addEventListener('click', function() {
@@ -106,7 +109,7 @@ document.addEventListener('DOMContentLoaded', function() {
                 console.error('Error:', error);
             });
         });
-    });
+    }
     
     // Attach event listeners to all status buttons
     const statusButtons = document.querySelectorAll('.update-status-btn');
@@ -114,6 +117,287 @@ document.addEventListener('DOMContentLoaded', function() {
         attachStatusButtonListener(button);
     });
     
+    // Multi-select: change the status of every checked order in a list with one request
+    document.querySelectorAll('.bulk-actions').forEach(bulkActions => {
+        const list = bulkActions.closest('.card');
+        const selectAll = bulkActions.querySelector('.select-all-orders');
+        const bulkButton = bulkActions.querySelector('.bulk-status-btn');
+        const selectedOrderIds = () => Array.from(list.querySelectorAll('.order-select:checked')).map(box => box.value);
+        
+        list.addEventListener('change', function(e) {
+            if (e.target === selectAll) {
+                list.querySelectorAll('.order-select').forEach(box => {
+                    box.checked = selectAll.checked;
+                });
+            }
+            bulkButton.disabled = selectedOrderIds().length === 0;
+        });
+        
+        bulkButton.addEventListener('click', function() {
+            const formData = new FormData();
+            selectedOrderIds().forEach(orderId => formData.append('order_ids', orderId));
+            formData.append('status', this.getAttribute('data-status'));
+            formData.append('csrf_token', document.querySelector('meta[name="csrf-token"]').getAttribute('content'));
+            bulkButton.disabled = true;
+            
+            fetch('/delivery/orders/status', {
+                method: 'POST',
+                body: formData,
+                headers: {
+                    'X-Requested-With': 'XMLHttpRequest'
+                }
+            })
+            .then(response => response.json())
+            .then(data => {
+                if (data.updated > 0 && !orderFeedLive) {
+                    // The lists, counts and pages all change; show them fresh
+                    window.location.reload();
+                } else {
+                    // No reload with the live feed: its events move the updated cards
+                    if (data.updated > 0 && selectAll) {
+                        selectAll.checked = false;
+                    }
+                    const toast = new bootstrap.Toast(document.getElementById('statusToast'));
+                    document.getElementById('statusToastBody').textContent = data.message;
+                    toast.show();
+                    bulkButton.disabled = false;
+                }
+            })
+            .catch(error => {
+                console.error('Error updating statuses:', error);
+                bulkButton.disabled = false;
+            });
+        });
+    });
+    
+    // Live order feed: patch the order lists from server-sent events, or poll the version stamp
+    const deliveryDashboard = document.getElementById('deliveryDashboard');
+    if (deliveryDashboard) {
+        const orderLists = {};
+        deliveryDashboard.querySelectorAll('.order-list').forEach(list => {
+            orderLists[list.getAttribute('data-status')] = list;
+        });
+        const pageSize = parseInt(deliveryDashboard.getAttribute('data-page-size'), 10) || 20;
+        let orderVersion = parseInt(deliveryDashboard.getAttribute('data-order-version'), 10) || 0;
+        const orderActions = {
+            pending: { status: 'processing', buttonClass: 'btn-primary', label: 'Process Order' },
+            processing: { status: 'shipped', buttonClass: 'btn-success', label: 'Mark as Shipped' }
+        };
+        const capitalize = text => text.charAt(0).toUpperCase() + text.slice(1);
+        
+        // Same markup as the order cards in dashboard.html
+        const buildOrderCard = function(order) {
+            const action = orderActions[order.status];
+            const card = document.createElement('div');
+            card.className = 'order-card p-3 mb-3 border rounded';
+            card.id = `order-${order.order_id}`;
+            card.setAttribute('data-created', order.created_at);
+            card.innerHTML = `
+                <div class="d-flex justify-content-between align-items-center mb-2">
+                    <div class="form-check mb-0">
+                        <input class="form-check-input order-select" type="checkbox" value="${order.order_id}" id="select-order-${order.order_id}">
+                        <label class="form-check-label h6 mb-0" for="select-order-${order.order_id}">Order #${order.order_id}</label>
+                    </div>
+                    <span class="order-status status-${order.status}">${capitalize(order.status)}</span>
+                </div>
+                <div class="row mb-2">
+                    <div class="col-6">
+                        <small class="text-muted">Ordered:</small>
+                        <div>${order.created_at.slice(0, 16).replace('T', ' ')}</div>
+                    </div>
+                    <div class="col-6">
+                        <small class="text-muted">Customer Type:</small>
+                        <div>${order.premium_member ? 'Premium Member' : 'Regular Customer'}</div>
+                    </div>
+                </div>
+                <div class="row mb-2">
+                    <div class="col-6">
+                        <small class="text-muted">Delivery Type:</small>
+                        <div>${capitalize(order.delivery_type)}</div>
+                    </div>
+                    <div class="col-6">
+                        <small class="text-muted">Total Weight:</small>
+                        <div>${order.total_weight} kg</div>
+                    </div>
+                </div>
+                <div class="d-flex justify-content-end order-actions">
+                    <button class="btn btn-sm ${action.buttonClass} update-status-btn" 
+                            data-order-id="${order.order_id}" 
+                            data-status="${action.status}">
+                        ${action.label}
+                    </button>
+                </div>
+            `;
+            attachStatusButtonListener(card.querySelector('.update-status-btn'));
+            return card;
+        };
+        
+        // Lists are ordered oldest first by (created_at, order_id), like the keyset pages
+        const cardKey = card => ({ created: card.getAttribute('data-created'), id: parseInt(card.id.slice(6), 10) });
+        const comesBefore = (a, b) => a.created < b.created || (a.created === b.created && a.id < b.id);
+        
+        const refreshListState = function(list) {
+            const card = list.closest('.card');
+            const empty = list.querySelector('.order-card') === null;
+            card.querySelector('.order-list-empty').classList.toggle('d-none', !empty);
+            card.querySelector('.bulk-actions').classList.toggle('d-none', empty);
+            card.querySelector('.bulk-status-btn').disabled = list.querySelector('.order-select:checked') === null;
+        };
+        
+        const setCount = function(status, count) {
+            const badge = deliveryDashboard.querySelector(`.order-count[data-status="${status}"]`);
+            if (badge) {
+                badge.textContent = Math.max(0, count);
+            }
+        };
+        const adjustCount = function(status, delta) {
+            const badge = deliveryDashboard.querySelector(`.order-count[data-status="${status}"]`);
+            if (badge) {
+                setCount(status, (parseInt(badge.textContent, 10) || 0) + delta);
+            }
+        };
+        
+        // Insert a card only if it belongs on the page being shown
+        const placeOrderCard = function(list, order) {
+            const key = { created: order.created_at, id: order.order_id };
+            const cards = Array.from(list.querySelectorAll('.order-card'));
+            const following = cards.find(card => comesBefore(key, cardKey(card)));
+            if (following) {
+                if (following !== cards[0] || !list.getAttribute('data-cursor')) {
+                    list.insertBefore(buildOrderCard(order), following);
+                }
+            } else if (list.getAttribute('data-has-next') !== 'true') {
+                list.appendChild(buildOrderCard(order));
+            }
+        };
+        
+        const applyOrderChanges = function(changes) {
+            changes.forEach(change => {
+                const existing = document.getElementById(`order-${change.order_id}`);
+                if (existing) {
+                    existing.remove();
+                }
+                if (change.old_status) {
+                    adjustCount(change.old_status, -1);
+                }
+                adjustCount(change.new_status, 1);
+                if (orderLists[change.new_status]) {
+                    placeOrderCard(orderLists[change.new_status], change.order);
+                }
+            });
+            Object.values(orderLists).forEach(refreshListState);
+        };
+        
+        // Reload the shown pages as JSON after changes this page missed (other workers, lost events)
+        const resyncOrders = function() {
+            Object.entries(orderLists).forEach(([status, list]) => {
+                const params = new URLSearchParams({ status: status, limit: pageSize, count: 1 });
+                if (list.getAttribute('data-cursor')) {
+                    params.set('cursor', list.getAttribute('data-cursor'));
+                }
+                fetch(`/delivery/api/orders?${params}`, {
+                    headers: {
+                        'X-Requested-With': 'XMLHttpRequest'
+                    }
+                })
+                .then(response => response.json())
+                .then(data => {
+                    list.replaceChildren(...data.orders.map(buildOrderCard));
+                    list.setAttribute('data-has-next', data.next_cursor ? 'true' : 'false');
+                    setCount(status, data.total);
+                    refreshListState(list);
+                })
+                .catch(error => {
+                    console.error('Error refreshing orders:', error);
+                });
+            });
+        };
+        
+        const noteVersion = function(data) {
+            if (data.version) {
+                orderVersion = Math.max(orderVersion, data.version);
+            }
+        };
+        
+        // Fallback: one single-row read every few seconds, and a resync when it moves
+        const pollOrderVersion = function() {
+            fetch('/delivery/orders/version', {
+                headers: {
+                    'X-Requested-With': 'XMLHttpRequest'
+                }
+            })
+            .then(response => response.json())
+            .then(data => {
+                if (data.version && data.version !== orderVersion) {
+                    orderVersion = data.version;
+                    resyncOrders();
+                }
+                setTimeout(pollOrderVersion, 10000);
+            })
+            .catch(error => {
+                console.error('Error polling order version:', error);
+                setTimeout(pollOrderVersion, 30000);
+            });
+        };
+        
+        if (window.EventSource) {
+            const orderFeed = new EventSource(`/delivery/events?version=${orderVersion}`);
+            orderFeed.addEventListener('open', () => {
+                orderFeedLive = true;
+            });
+            orderFeed.addEventListener('orders', event => {
+                const data = JSON.parse(event.data);
+                noteVersion(data);
+                applyOrderChanges(data.changes);
+            });
+            orderFeed.addEventListener('resync', event => {
+                noteVersion(JSON.parse(event.data));
+                resyncOrders();
+            });
+            orderFeed.addEventListener('error', () => {
+                // Refused for good (e.g. the server's stream limit); dropped streams reconnect on their own
+                if (orderFeed.readyState === EventSource.CLOSED) {
+                    orderFeedLive = false;
+                    setTimeout(pollOrderVersion, 10000);
+                }
+            });
+        } else {
+            setTimeout(pollOrderVersion, 10000);
+        }
+    }
+    
+    // Poll a running optimization job and reload once its result is ready
+    const optimizationJob = document.getElementById('optimizationJob');
+    if (optimizationJob && optimizationJob.getAttribute('data-job-id')) {
+        const jobId = optimizationJob.getAttribute('data-job-id');
+        
+        const pollJob = function() {
+            fetch(`/delivery/jobs/${jobId}?result=0`, {
+                headers: {
+                    'X-Requested-With': 'XMLHttpRequest'
+                }
+            })
+            .then(response => response.json().then(data => ({ status: response.status, data: data })))
+            .then(({ status, data }) => {
+                // Unknown (e.g. another worker's) or superseded jobs are resubmitted by the reload
+                if (status === 404 || data.job.status === 'done' || data.job.status === 'cancelled') {
+                    window.location.reload();
+                } else if (data.job.status === 'failed') {
+                    optimizationJob.querySelector('.job-progress').innerHTML = 
+                        '<div class="alert alert-danger">Optimization failed. Please try again.</div>';
+                } else {
+                    setTimeout(pollJob, 1000);
+                }
+            })
+            .catch(error => {
+                console.error('Error polling optimization job:', error);
+                setTimeout(pollJob, 3000);
+            });
+        };
+        
+        setTimeout(pollJob, 500);
+    }
+    
     // Order priority visualization
     const orderPriorityChart = document.getElementById('orderPriorityChart');
     if (orderPriorityChart) {
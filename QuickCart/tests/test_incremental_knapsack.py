@@ -0,0 +1,64 @@
+import random
+from itertools import combinations
+from algorithms import IncrementalKnapsack
+
+
+def best_value(items, max_capacity):
+    """Brute-force optimum over {key: (weight, value)}"""
+    capacity = int(round(max_capacity * IncrementalKnapsack.SCALE))
+    best = 0
+    keys = list(items)
+    for size in range(len(keys) + 1):
+        for chosen in combinations(keys, size):
+            weight = sum(int(round(items[key][0] * IncrementalKnapsack.SCALE)) for key in chosen)
+            if weight <= capacity:
+                best = max(best, sum(items[key][1] for key in chosen))
+    return best
+
+
+def check(knapsack, items, max_capacity):
+    selected, total = knapsack.solution()
+    assert len(selected) == len(set(selected))
+    assert set(selected) <= set(items)
+    assert sum(items[key][0] for key in selected) <= max_capacity + 1e-9
+    assert abs(total - best_value(items, max_capacity)) < 1e-9
+
+
+def test_remove_and_readd_then_rebuild():
+    knapsack = IncrementalKnapsack(10)
+    knapsack.add(1, 2, 5)
+    knapsack.add(2, 3, 7)
+    knapsack.solution()
+    knapsack.remove(1)
+    knapsack.add(1, 2, 5)
+    knapsack.rebuild()
+    check(knapsack, {1: (2, 5), 2: (3, 7)}, 10)
+
+
+def test_replacing_an_item_keeps_only_its_current_row():
+    knapsack = IncrementalKnapsack(5)
+    knapsack.add('a', 4, 10)
+    knapsack.add('b', 3, 6)
+    knapsack.solution()
+    knapsack.add('a', 1, 2)  # replace: removes and re-adds
+    knapsack.rebuild()
+    check(knapsack, {'a': (1, 2), 'b': (3, 6)}, 5)
+
+
+def test_random_add_remove_readd_matches_brute_force():
+    rng = random.Random(7)
+    for _ in range(50):
+        max_capacity = rng.randint(5, 30)
+        knapsack = IncrementalKnapsack(max_capacity)
+        items = {}
+        for _ in range(60):
+            key = rng.randint(0, 9)
+            if key in items and rng.random() < 0.4:
+                knapsack.remove(key)
+                del items[key]
+            else:
+                items[key] = (round(rng.uniform(0, 12), 2), rng.randint(0, 20))
+                knapsack.add(key, *items[key])
+            if rng.random() < 0.2:
+                knapsack.rebuild()
+            check(knapsack, {key: item for key, item in items.items() if item[1] > 0}, max_capacity)
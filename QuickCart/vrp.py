@@ -0,0 +1,352 @@
+import math
+import time
+import numpy as np
+from routing import two_opt, or_opt
+
+# Average road speed used to turn distances into driving times, in km/h
+DEFAULT_SPEED_KMH = 40.0
+
+# Minutes spent at each stop handing over the order
+SERVICE_MINUTES = 5.0
+
+# Minutes to reload a vehicle at the warehouse before its next trip
+RELOAD_MINUTES = 15.0
+
+# Express orders are due this many minutes after the fleet is dispatched
+EXPRESS_WINDOW_MINUTES = 120.0
+
+# Wall-clock budget for the local search after the savings construction, in seconds
+DEFAULT_TIME_BUDGET = 1.0
+
+# Nearest stops considered when relocating a stop into another trip
+NEIGHBOURS = 10
+
+# Nearest stops each stop is considered for joining to in the savings construction
+SAVINGS_NEIGHBOURS = 40
+
+
+class _Instance:
+    """Distances, demands and due times of one routing problem; stop 0 is the warehouse"""
+
+    def __init__(self, distances, demands, due, speed_kmh, service_minutes):
+        self.distances = distances
+        self.demands = demands
+        self.due = due
+        self.minutes_per_km = 60.0 / speed_kmh
+        self.service = service_minutes
+
+    def length(self, trip):
+        """Distance of a trip (stops only) from the warehouse and back"""
+        distances = self.distances
+        total = distances[0][trip[0]] + distances[trip[-1]][0]
+        for a, b in zip(trip, trip[1:]):
+            total += distances[a][b]
+        return total
+
+    def arrivals(self, trip):
+        """Minutes after departure at which each stop of a trip is reached"""
+        distances = self.distances
+        clock = 0.0
+        previous = 0
+        arrivals = []
+        for stop in trip:
+            clock += distances[previous][stop] * self.minutes_per_km
+            arrivals.append(clock)
+            clock += self.service
+            previous = stop
+        return arrivals
+
+    def duration(self, trip):
+        """Minutes from departure until the vehicle is back at the warehouse"""
+        return self.length(trip) * self.minutes_per_km + self.service * len(trip)
+
+    def on_time(self, trip):
+        """True if every stop of the trip is reached by its due time, departing at once"""
+        due = self.due
+        return all(arrival <= due[stop] + 1e-9 for stop, arrival in zip(trip, self.arrivals(trip)))
+
+
+def clarke_wright(instance, stops, capacity):
+    """
+    Build trips with the parallel Clarke-Wright savings algorithm
+
+    Every stop starts on its own out-and-back trip. Pairs of trip ends are
+    then joined in order of the distance saved by driving between them
+    instead of via the warehouse, s(i, j) = d(0, i) + d(0, j) - d(i, j),
+    whenever the joined trip stays within the capacity and on time. Only
+    pairs among each stop's SAVINGS_NEIGHBOURS nearest stops are ranked;
+    joining distant stops rarely saves anything, and the full pair list
+    grows quadratically.
+
+    Args:
+        instance: The problem's _Instance
+        stops: Stop indices to route
+        capacity: Largest load of one trip, in kg
+
+    Returns:
+        List of trips, each a list of stop indices
+    """
+    trips = {stop: [stop] for stop in stops}  # keyed by the trip's first stop
+    owner = {stop: stop for stop in stops}    # stop -> key of the trip it ends
+    loads = {stop: instance.demands[stop] for stop in stops}
+    if len(stops) < 2:
+        return list(trips.values())
+
+    index = np.array(stops)
+    matrix = np.asarray(instance.distances, dtype=np.float64)[np.ix_(index, index)]
+    depot = np.asarray(instance.distances[0], dtype=np.float64)[index]
+
+    # Candidate pairs (i < j) among nearest neighbours, each pair once
+    count = min(SAVINGS_NEIGHBOURS, len(stops) - 1)
+    nearest = np.argpartition(matrix, count, axis=1)[:, :count + 1]
+    first = np.repeat(np.arange(len(stops)), count + 1)
+    second = nearest.ravel()
+    first, second = np.minimum(first, second), np.maximum(first, second)
+    pairs = np.unique(first[first != second] * len(stops) + second[first != second])
+    first, second = pairs // len(stops), pairs % len(stops)
+
+    values = depot[first] + depot[second] - matrix[first, second]
+    keep = values > 1e-9
+    first, second, values = first[keep], second[keep], values[keep]
+    order = np.argsort(-values, kind='stable')
+
+    # Stops with a due time per trip; trips without any need no timing check
+    timed = {stop: int(instance.due[stop] < math.inf) for stop in stops}
+
+    for i, j in zip(index[first[order]].tolist(), index[second[order]].tolist()):
+        key_i, key_j = owner.get(i), owner.get(j)
+        if key_i is None or key_j is None or key_i == key_j:
+            continue  # interior stop, or both already on the same trip
+        if loads[key_i] + loads[key_j] > capacity + 1e-9:
+            continue
+
+        trip_i, trip_j = trips[key_i], trips[key_j]
+        # Join so that i is followed directly by j
+        left = trip_i if trip_i[-1] == i else trip_i[::-1]
+        right = trip_j if trip_j[0] == j else trip_j[::-1]
+        joined = left + right
+        if (timed[key_i] or timed[key_j]) and not instance.on_time(joined):
+            joined = joined[::-1]  # the same pair driven the other way round
+            if not instance.on_time(joined):
+                continue
+
+        del trips[key_i], trips[key_j]
+        load = loads.pop(key_i) + loads.pop(key_j)
+        express = timed.pop(key_i) + timed.pop(key_j)
+        for end in (trip_i[0], trip_i[-1], trip_j[0], trip_j[-1]):
+            owner.pop(end, None)
+        key = joined[0]
+        trips[key] = joined
+        loads[key] = load
+        timed[key] = express
+        owner[joined[0]] = owner[joined[-1]] = key
+
+    return list(trips.values())
+
+
+def _improve_trip(instance, trip, deadline):
+    """2-opt and Or-opt within one trip, kept only if every stop stays on time"""
+    if len(trip) < 3:
+        return trip
+    route = [0] + trip + [0]
+    improved = True
+    while improved and time.perf_counter() < deadline:
+        improved = two_opt(route, instance.distances, deadline)
+        improved = or_opt(route, instance.distances, deadline) or improved
+    candidate = route[1:-1]
+    if instance.length(candidate) < instance.length(trip) - 1e-9 and instance.on_time(candidate):
+        return candidate
+    return trip
+
+
+def _relocate(instance, trips, capacity, neighbours, deadline):
+    """
+    Move single stops next to a near neighbour on another trip where that shortens the total
+
+    Returns:
+        True if any stop was moved
+    """
+    distances = instance.distances
+    demands = instance.demands
+    trip_of = {stop: t for t, trip in enumerate(trips) for stop in trip}
+    loads = [sum(demands[stop] for stop in trip) for trip in trips]
+    moved = False
+
+    for stop in list(trip_of):
+        if time.perf_counter() >= deadline:
+            break
+        source = trip_of[stop]
+        trip = trips[source]
+        position = trip.index(stop)
+        before = trip[position - 1] if position > 0 else 0
+        after = trip[position + 1] if position + 1 < len(trip) else 0
+        gain = distances[before][stop] + distances[stop][after] - distances[before][after]
+
+        best = None
+        for neighbour in neighbours[stop]:
+            target = trip_of.get(neighbour)
+            if target is None or target == source or loads[target] + demands[stop] > capacity + 1e-9:
+                continue
+            other = trips[target]
+            at = other.index(neighbour)
+            for insert in (at, at + 1):
+                a = other[insert - 1] if insert > 0 else 0
+                b = other[insert] if insert < len(other) else 0
+                cost = distances[a][stop] + distances[stop][b] - distances[a][b]
+                if cost < gain - 1e-9 and (best is None or cost < best[0]):
+                    candidate = other[:insert] + [stop] + other[insert:]
+                    if instance.on_time(candidate):
+                        best = (cost, target, candidate)
+
+        if best is None:
+            continue
+        _, target, candidate = best
+        trips[target] = candidate
+        trip.pop(position)
+        loads[target] += demands[stop]
+        loads[source] -= demands[stop]
+        trip_of[stop] = target
+        moved = True
+
+    trips[:] = [trip for trip in trips if trip]
+    return moved
+
+
+def _schedule(instance, trips, vehicles, reload_minutes):
+    """
+    Hand trips to vehicles, several trips per vehicle where needed
+
+    Trips carrying express orders leave first, tightest first; the rest go
+    longest first. Each trip goes to the vehicle that can carry its load and
+    is back at the warehouse soonest (the smaller one on a tie).
+
+    Returns:
+        List of (vehicle index, departure minute, trip) in departure order
+    """
+    demands = instance.demands
+    due = instance.due
+
+    def slack(trip):
+        return min((due[stop] - arrival for stop, arrival in zip(trip, instance.arrivals(trip))),
+                   default=math.inf)
+
+    express = sorted((trip for trip in trips if slack(trip) < math.inf), key=slack)
+    standard = sorted((trip for trip in trips if slack(trip) == math.inf), key=instance.duration, reverse=True)
+
+    free_at = [0.0] * len(vehicles)
+    used = [False] * len(vehicles)
+    schedule = []
+    for trip in express + standard:
+        load = sum(demands[stop] for stop in trip)
+        eligible = [v for v, vehicle in enumerate(vehicles) if float(vehicle['capacity']) >= load - 1e-9]
+        v = min(eligible, key=lambda v: (free_at[v] + (reload_minutes if used[v] else 0.0),
+                                          float(vehicles[v]['capacity'])))
+        departure = free_at[v] + (reload_minutes if used[v] else 0.0)
+        free_at[v] = departure + instance.duration(trip)
+        used[v] = True
+        schedule.append((v, departure, trip))
+
+    schedule.sort(key=lambda entry: (entry[1], entry[0]))
+    return schedule
+
+
+def solve_vrp(orders, vehicles, distances, time_windows=True, speed_kmh=DEFAULT_SPEED_KMH,
+              service_minutes=SERVICE_MINUTES, reload_minutes=RELOAD_MINUTES,
+              express_window=EXPRESS_WINDOW_MINUTES, time_budget=DEFAULT_TIME_BUDGET):
+    """
+    Capacitated vehicle routing: which orders each vehicle carries and in what order
+
+    Loads and routes are decided together. Clarke-Wright savings builds
+    trips no heavier than the largest vehicle, and local search then
+    shortens each trip (2-opt, Or-opt) and moves stops between trips
+    within the time budget. Trips are finally handed to vehicles; a vehicle
+    with several trips reloads at the warehouse in between.
+
+    With time_windows, express orders are due express_window minutes after
+    dispatch. Trips never make an express order later than driving straight
+    to it would, and express trips leave first; orders that still arrive
+    after their window are reported as late.
+
+    Args:
+        orders: Order dictionaries with 'order_id', 'weight' and 'delivery_type',
+                in the same order as the stops of the distance matrix
+        vehicles: Vehicle dictionaries with 'capacity' (kg)
+        distances: Matrix of distances in km, warehouse at index 0 and
+                   order i at index i + 1
+        time_windows: Give express orders a due time
+        speed_kmh: Average driving speed
+        service_minutes: Minutes spent at each stop
+        reload_minutes: Minutes at the warehouse between two trips of a vehicle
+        express_window: Minutes after dispatch that express orders are due
+        time_budget: Wall-clock budget for the local search, in seconds
+
+    Returns:
+        Dictionary with per-vehicle trips (route indices, order IDs, load,
+        distance, departure and return minute), orders no vehicle can carry,
+        late express order IDs and totals
+    """
+    started = time.perf_counter()
+    deadline = started + time_budget
+
+    # Row lookups on nested lists are much faster than on array types
+    if hasattr(distances, 'tolist'):
+        distances = distances.tolist()
+
+    capacity = max((float(vehicle['capacity']) for vehicle in vehicles), default=0.0)
+    demands = [0.0] + [float(order['weight']) for order in orders]
+    minutes_per_km = 60.0 / speed_kmh
+    due = [math.inf]
+    for stop, order in enumerate(orders, start=1):
+        if time_windows and order.get('delivery_type') == 'express':
+            # An order too far to reach in time is due as soon as it can be reached
+            due.append(max(express_window, distances[0][stop] * minutes_per_km))
+        else:
+            due.append(math.inf)
+    instance = _Instance(distances, demands, due, speed_kmh, service_minutes)
+
+    stops = [stop for stop in range(1, len(demands)) if demands[stop] <= capacity + 1e-9]
+    unassigned = [orders[stop - 1] for stop in range(1, len(demands)) if demands[stop] > capacity + 1e-9]
+
+    trips = clarke_wright(instance, stops, capacity)
+
+    if len(stops) > 1:
+        matrix = np.asarray(distances)[np.ix_(stops, stops)]
+        nearest = np.argsort(matrix, axis=1, kind='stable')[:, 1:NEIGHBOURS + 1]
+        neighbours = {stop: [stops[i] for i in row] for stop, row in zip(stops, nearest.tolist())}
+        improved = True
+        while improved and time.perf_counter() < deadline:
+            trips = [_improve_trip(instance, trip, deadline) for trip in trips]
+            improved = _relocate(instance, trips, capacity, neighbours, deadline)
+
+    vehicle_routes = [{'vehicle': vehicle, 'trips': [], 'distance': 0.0, 'finish': 0.0} for vehicle in vehicles]
+    late = []
+    for v, departure, trip in _schedule(instance, trips, vehicles, reload_minutes):
+        for stop, arrival in zip(trip, instance.arrivals(trip)):
+            if orders[stop - 1].get('delivery_type') == 'express' and time_windows \
+                    and departure + arrival > express_window + 1e-9:
+                late.append(orders[stop - 1]['order_id'])
+        load = sum(demands[stop] for stop in trip)
+        distance = instance.length(trip)
+        entry = vehicle_routes[v]
+        entry['trips'].append({
+            'route': [0] + trip + [0],
+            'order_ids': [orders[stop - 1]['order_id'] for stop in trip],
+            'load': round(load, 2),
+            'utilisation': load / float(entry['vehicle']['capacity']),
+            'distance': distance,
+            'departure': departure,
+            'return': departure + instance.duration(trip),
+        })
+        entry['distance'] += distance
+        entry['finish'] = departure + instance.duration(trip)
+
+    return {
+        'vehicles': vehicle_routes,
+        'trips': len(trips),
+        'distance': sum(entry['distance'] for entry in vehicle_routes),
+        'finish': max((entry['finish'] for entry in vehicle_routes), default=0.0),
+        'unassigned': unassigned,
+        'late_order_ids': late,
+        'time_windows': time_windows,
+        'elapsed': time.perf_counter() - started,
+    }
@@ -0,0 +1,250 @@
+import math
+import numpy as np
+from routing import route_length
+from spatial import KM_PER_DEGREE
+
+# Stops per zone, so a zone plus the warehouse is still solved exactly (see EXACT_MAX_LOCATIONS)
+DEFAULT_ZONE_STOPS = 12
+
+# Lloyd iterations for k-means zoning; assignments usually settle well before this
+KMEANS_ITERATIONS = 25
+
+ZONINGS = ('kmeans', 'sweep')
+
+
+def _plane(locations):
+    """Stops (everything after the warehouse) as km offsets east and north of the warehouse"""
+    warehouse = locations[0]
+    lats = np.array([location['lat'] for location in locations[1:]], dtype=np.float64)
+    lngs = np.array([location['lng'] for location in locations[1:]], dtype=np.float64)
+    x = (lngs - warehouse['lng']) * math.cos(math.radians(warehouse['lat'])) * KM_PER_DEGREE
+    y = (lats - warehouse['lat']) * KM_PER_DEGREE
+    return np.column_stack((x, y))
+
+
+def _sweep_order(points):
+    """
+    Point indices by bearing from the warehouse, starting after the widest empty sector
+
+    Starting there keeps a zone or a driver's run from straddling the gap.
+    """
+    angles = np.arctan2(points[:, 1], points[:, 0])
+    order = np.argsort(angles, kind='stable')
+    if len(order) > 1:
+        sorted_angles = angles[order]
+        gaps = np.diff(np.append(sorted_angles, sorted_angles[0] + 2 * math.pi))
+        order = np.roll(order, -(int(np.argmax(gaps)) + 1))
+    return order
+
+
+def sweep_zones(locations, zone_count):
+    """
+    Zones as equal-sized sectors swept around the warehouse
+
+    Args:
+        locations: Warehouse first, then the stops, each with 'lat' and 'lng'
+        zone_count: Number of zones
+
+    Returns:
+        List of zones, each a list of location indices (the warehouse excluded)
+    """
+    points = _plane(locations)
+    if not len(points):
+        return []
+    zone_count = max(1, min(zone_count, len(points)))
+    order = _sweep_order(points) + 1
+    return [zone.tolist() for zone in np.array_split(order, zone_count)]
+
+
+def kmeans_zones(locations, zone_count, iterations=KMEANS_ITERATIONS):
+    """
+    Zones as k-means clusters of the stops, seeded with the sweep sectors
+
+    Seeding from the sweep keeps the result deterministic and starts every
+    centre among its own stops. Zones can come out uneven; one larger than
+    DEFAULT_ZONE_STOPS is routed with the heuristic instead of exactly.
+
+    Args:
+        locations: Warehouse first, then the stops, each with 'lat' and 'lng'
+        zone_count: Number of zones
+        iterations: Maximum Lloyd iterations
+
+    Returns:
+        List of non-empty zones, each a list of location indices (the warehouse excluded)
+    """
+    points = _plane(locations)
+    if not len(points):
+        return []
+
+    labels = np.empty(len(points), dtype=np.int64)
+    for label, zone in enumerate(sweep_zones(locations, zone_count)):
+        labels[np.array(zone) - 1] = label
+    centres = np.array([points[labels == label].mean(axis=0) for label in range(labels.max() + 1)])
+
+    for _ in range(iterations):
+        squared = ((points[:, None, :] - centres[None, :, :]) ** 2).sum(axis=2)
+        new_labels = squared.argmin(axis=1)
+        if np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+        for label in range(len(centres)):
+            members = points[labels == label]
+            if len(members):
+                centres[label] = members.mean(axis=0)
+
+    zones = [np.flatnonzero(labels == label) + 1 for label in range(len(centres))]
+    return [zone.tolist() for zone in zones if len(zone)]
+
+
+ZONING_FUNCTIONS = {
+    'kmeans': kmeans_zones,
+    'sweep': sweep_zones,
+}
+
+
+def partition_zones(locations, zone_count=None, zoning='kmeans'):
+    """
+    Split the stops of a run into geographic zones, in sweep order around the warehouse
+
+    Args:
+        locations: Warehouse first, then the stops, each with 'lat' and 'lng'
+        zone_count: Number of zones (default: one per DEFAULT_ZONE_STOPS stops)
+        zoning: 'kmeans' or 'sweep'
+
+    Returns:
+        List of zones, each a list of location indices (the warehouse excluded)
+    """
+    if zoning not in ZONING_FUNCTIONS:
+        raise ValueError(f"Unknown zoning method: {zoning}")
+    stops = len(locations) - 1
+    if zone_count is None:
+        zone_count = math.ceil(stops / DEFAULT_ZONE_STOPS)
+    zones = ZONING_FUNCTIONS[zoning](locations, zone_count)
+
+    # Neighbouring zones next to each other, so a driver's zones are adjacent
+    if len(zones) > 1:
+        points = _plane(locations)
+        centroids = np.array([points[np.array(zone) - 1].mean(axis=0) for zone in zones])
+        zones = [zones[i] for i in _sweep_order(centroids)]
+    return zones
+
+
+def zone_matrix(distances, zone):
+    """Distance matrix of one zone, warehouse at index 0 and the zone's stops in order"""
+    indices = [0] + list(zone)
+    return np.asarray(distances)[np.ix_(indices, indices)]
+
+
+def _split_among_drivers(lengths, drivers):
+    """
+    Split zones (in sweep order) into contiguous runs, one per driver
+
+    Minimises the longest run's total tour length by dynamic programming
+    over the split points.
+
+    Returns:
+        List of (start, end) zone index ranges
+    """
+    count = len(lengths)
+    if not count:
+        return []
+    drivers = max(1, min(drivers, count))
+    prefix = [0.0]
+    for length in lengths:
+        prefix.append(prefix[-1] + length)
+
+    # best[d][i]: longest run when the first i zones go to d drivers
+    best = [[math.inf] * (count + 1) for _ in range(drivers + 1)]
+    split = [[0] * (count + 1) for _ in range(drivers + 1)]
+    best[0][0] = 0.0
+    for d in range(1, drivers + 1):
+        for i in range(d, count + 1):
+            for j in range(d - 1, i):
+                longest = max(best[d - 1][j], prefix[i] - prefix[j])
+                if longest < best[d][i]:
+                    best[d][i], split[d][i] = longest, j
+
+    ranges = []
+    end = count
+    for d in range(drivers, 0, -1):
+        start = split[d][end]
+        ranges.append((start, end))
+        end = start
+    return ranges[::-1]
+
+
+def stitch_routes(zone_routes, distances):
+    """
+    Join closed zone tours into one closed route
+
+    Instead of returning to the warehouse between zones, the driver goes
+    from the last stop of one zone straight to whichever end of the next
+    zone's tour is nearer.
+
+    Args:
+        zone_routes: Closed routes over global location indices
+        distances: Matrix of distances between all locations
+
+    Returns:
+        The stitched route, starting and ending at the warehouse
+    """
+    route = [0]
+    for zone_route in zone_routes:
+        stops = zone_route[1:-1]
+        if not stops:
+            continue
+        if len(route) > 1 and distances[route[-1]][stops[-1]] < distances[route[-1]][stops[0]]:
+            stops = stops[::-1]
+        route.extend(stops)
+    route.append(0)
+    return route
+
+
+def combine_zones(zones, zone_results, distances, drivers=None):
+    """
+    Per-driver routes from separately solved zone tours
+
+    Args:
+        zones: Zones in sweep order, from partition_zones
+        zone_results: (solve_route result, job stats) per zone, over the zone's matrix
+        distances: Matrix of distances between all locations
+        drivers: Number of drivers (default: one per zone)
+
+    Returns:
+        Dictionary with the 'drivers' routes and the 'zones' they are built
+        from, each with its distance and solve timings, plus the total
+        distance and the summed solver time
+    """
+    zone_data = []
+    for number, (zone, (result, stats)) in enumerate(zip(zones, zone_results), start=1):
+        indices = [0] + list(zone)
+        zone_data.append({
+            'zone': number,
+            'stops': len(zone),
+            'route': [indices[i] for i in result['route']],
+            'distance': result['distance'],
+            'solver': result['solver'],
+            'gap': result['gap'],
+            'elapsed': result['elapsed'],
+            'seconds': stats['seconds'],
+        })
+
+    driver_routes = []
+    ranges = _split_among_drivers([zone['distance'] for zone in zone_data], drivers or len(zone_data))
+    for number, (start, end) in enumerate(ranges, start=1):
+        assigned = zone_data[start:end]
+        route = stitch_routes([zone['route'] for zone in assigned], distances)
+        driver_routes.append({
+            'driver': number,
+            'zones': [zone['zone'] for zone in assigned],
+            'stops': len(route) - 2,
+            'route': route,
+            'distance': float(route_length(route, distances)),
+        })
+
+    return {
+        'drivers': driver_routes,
+        'zones': zone_data,
+        'distance': sum(driver['distance'] for driver in driver_routes),
+        'solve_seconds': sum(zone['seconds'] for zone in zone_data),
+    }